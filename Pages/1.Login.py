@@ -1,7 +1,21 @@
 import streamlit as st
 from db_manager import DatabaseManager
+from auth import AuthBusyError, AuthTimeoutError
+from ratelimit import LoginThrottledError
+from sessions import create_token, session_cache
 import os
 
+# Only trust X-Forwarded-For behind a reverse proxy that sets it
+TRUST_FORWARDED_FOR = os.environ.get("TRUST_FORWARDED_FOR") == "1"
+
+def client_address():
+    """The address login attempts are throttled by"""
+    if TRUST_FORWARDED_FOR:
+        forwarded = st.context.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return st.context.ip_address or "local"
+
 st.set_page_config(page_title="Login", layout="centered")
 
 # Check if user is already logged in
@@ -13,7 +27,7 @@ if 'logged_in' in st.session_state and st.session_state.logged_in:
 
 st.title("Login")
 
-# Initialize database
+# Initialize database (a pooled connection, returned when the run ends)
 db = DatabaseManager()
 
 # Create tabs
@@ -27,10 +41,17 @@ with tab1:
         submit = st.form_submit_button("Login")
         
         if submit:
-            if db.verify_user(username, password):
+            try:
+                valid = db.login(username, password, client_address())
+            except (AuthBusyError, AuthTimeoutError, LoginThrottledError) as e:
+                st.error(str(e))
+                st.stop()
+            
+            if valid:
                 st.session_state.logged_in = True
                 st.session_state.username = username
-                st.session_state.role = db.get_user_role(username)
+                st.session_state.token = create_token(username)
+                st.session_state.role = session_cache.get(username)[0]
                 st.success(f"Welcome {username}!")
                 st.rerun()
             else:
@@ -42,14 +63,21 @@ with tab2:
         new_username = st.text_input("New Username")
         new_password = st.text_input("New Password", type="password")
         confirm_password = st.text_input("Confirm Password", type="password")
-        role = st.selectbox("Role", ["user", "admin", "cybersecurity", "it_operations", "data_science"])
+        # Other roles are granted by an admin on the Admin page
+        st.caption("New accounts start with the 'user' role. Ask an admin for dashboard access.")
         submit = st.form_submit_button("Register")
         
         if submit:
             if new_password != confirm_password:
                 st.error("Passwords do not match")
             else:
-                if db.register_user(new_username, new_password, role):
+                try:
+                    created = db.register_user(new_username, new_password)
+                except (AuthBusyError, AuthTimeoutError) as e:
+                    st.error(str(e))
+                    st.stop()
+                
+                if created:
                     st.success(f"User {new_username} created!")
                 else:
                     st.error("Username already exists")
@@ -1,109 +1,197 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import os
+from charts import backlog_area, counts_bar, counts_pie, trend_line
+from correlation import WINDOW_HOURS, correlation_summary, top_correlated_incidents
+from db_manager import DatabaseManager
+from instrumentation import page_run, timed_chart, timed_dataframe
+from search import MAX_COUNT
+from sessions import authorize
+from timeseries import FREQUENCIES
 
 st.set_page_config(page_title="Cybersecurity Dashboard", layout="wide")
 
-# Check login
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("You must be logged in to access this page.")
-    if st.button("Go to Login"):
-        st.switch_page("pages/1.Login.py")
-    st.stop()
-
-st.title("Cybersecurity Dashboard")
-st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
-
-# Load CSV 
-@st.cache_data
-def load_data():
-    # Project root
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    csv_path = os.path.join(project_root, "DATA", "cyber_incidents.csv")
-
-    if not os.path.exists(csv_path):
-        st.error(f"CSV file not found at {csv_path}")
-        return pd.DataFrame()
-
-    try:
-        df = pd.read_csv(csv_path)
-        return df
-    except Exception as e:
-        st.error(f"Error reading CSV: {str(e)}")
-        return pd.DataFrame()
-
-df = load_data()
-
-if df.empty:
-    st.warning("No data available. Check DATA/cyber_incidents.csv")
-else:
-    st.write(f"**Loaded {len(df)} records**")
-    st.write(f"**Columns:** {list(df.columns)}")
-    
-    # Sidebar filters
-    with st.sidebar:
-        st.header("Filters")
-        severity_filter = st.multiselect("Severity", df['severity'].unique())
-        status_filter = st.multiselect("Status", df['status'].unique())
-        category_filter = st.multiselect("Category", df['category'].unique())
-    
-    # Apply filters
-    filtered_df = df.copy()
-    if severity_filter:
-        filtered_df = filtered_df[filtered_df['severity'].isin(severity_filter)]
-    if status_filter:
-        filtered_df = filtered_df[filtered_df['status'].isin(status_filter)]
-    if category_filter:
-        filtered_df = filtered_df[filtered_df['category'].isin(category_filter)]
-    
-    # Metrics
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Total Incidents", len(filtered_df))
-    with col2:
-        open_incidents = len(filtered_df[filtered_df['status'] == 'Open'])
-        st.metric("Open Incidents", open_incidents)
-    with col3:
-        critical_incidents = len(filtered_df[filtered_df['severity'] == 'Critical'])
-        st.metric("Critical Incidents", critical_incidents)
-    
-    # Charts
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Incidents by Category")
-        if 'category' in filtered_df.columns:
-            category_counts = filtered_df['category'].value_counts().reset_index()
-            category_counts.columns = ['category', 'count']
-            fig1 = px.bar(category_counts, x='category', y='count', title="Incidents by Category")
-            st.plotly_chart(fig1, use_container_width=True)
-    
-    with col2:
-        st.subheader("Incidents by Severity")
-        if 'severity' in filtered_df.columns:
-            severity_counts = filtered_df['severity'].value_counts().reset_index()
-            severity_counts.columns = ['severity', 'count']
-            fig2 = px.pie(severity_counts, values='count', names='severity', title="Incidents by Severity")
-            st.plotly_chart(fig2, use_container_width=True)
-    
-    # Phishing Analysis 
-    st.subheader("Phishing Analysis")
-    phishing_df = filtered_df[filtered_df['category'] == 'Phishing']
-    if not phishing_df.empty:
+# Time this run (and profile it if turned on from the Admin page); it ends
+# when the body does, including at st.stop()
+with page_run("Cybersecurity", st.session_state.get('profile_reruns', False)):
+    # Check login and role (cached, so no database query per rerun)
+    auth_result = authorize(st.session_state.get('token'), 'cybersecurity')
+    if auth_result is None:
+        st.error("You must be logged in to access this page.")
+        if st.button("Go to Login"):
+            st.switch_page("pages/1.Login.py")
+        st.stop()
+    if not auth_result[2]:
+        st.error("Your role does not have access to this page.")
+        st.stop()
+    st.session_state.role = auth_result[1]
+
+    st.title("Cybersecurity Dashboard")
+    st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
+
+    # Initialize database (a pooled connection, returned when the run ends)
+    db = DatabaseManager()
+
+    summary = db.get_incident_summary()
+
+    if summary["total"] == 0:
+        st.warning("No data available. Run 'python auth.py' to load DATA/cyber_incidents.csv")
+    else:
+        st.write(f"**Loaded {summary['total']} records**")
+
+        # Sidebar filters
+        options = db.get_incident_filter_options()
+        with st.sidebar:
+            st.header("Filters")
+            severity_filter = st.multiselect("Severity", options['severity'])
+            status_filter = st.multiselect("Status", options['status'])
+            category_filter = st.multiselect("Category", options['category'])
+
+        # Filters are applied in SQL
+        filters = {
+            'severity': severity_filter,
+            'status': status_filter,
+            'category': category_filter
+        }
+        summary = db.get_incident_summary(filters)
+
+        # Metrics
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Phishing", len(phishing_df))
+            st.metric("Total Incidents", summary['total'])
+        with col2:
+            st.metric("Open Incidents", summary['open'])
+        with col3:
+            st.metric("Critical Incidents", summary['critical'])
+
+        # Charts
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.subheader("Incidents by Category")
+            fig1 = counts_bar(db, "cyber_incidents", 'category', filters, "Incidents by Category")
+            timed_chart(fig1, use_container_width=True)
+
+        with col2:
+            st.subheader("Incidents by Severity")
+            fig2 = counts_pie(db, "cyber_incidents", 'severity', filters, "Incidents by Severity")
+            timed_chart(fig2, use_container_width=True)
+
+        # Trends over time
+        st.subheader("Incident Trends")
+        col1, col2 = st.columns(2)
+        with col1:
+            frequency = st.radio("Period", list(FREQUENCIES), index=1, horizontal=True)
+        with col2:
+            smoothing = st.slider("Rolling window (periods)", 1, 12, 1)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fig3 = trend_line(db, "cyber_incidents", frequency, "severity", filters,
+                              smoothing if smoothing > 1 else None, "Incidents by Severity over Time")
+            if fig3 is not None:
+                timed_chart(fig3, use_container_width=True)
+        with col2:
+            fig4 = backlog_area(db, "cyber_incidents", frequency, filters, "Open Incidents over Time")
+            if fig4 is not None:
+                timed_chart(fig4, use_container_width=True)
+
+        # Phishing Analysis 
+        st.subheader("Phishing Analysis")
+        if summary['phishing'] > 0:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Phishing", summary['phishing'])
+            with col2:
+                st.metric("Open Phishing", summary['phishing_open'])
+            with col3:
+                st.metric("2025 Phishing", summary['phishing_recent'])
+
+        # Tickets raised around incidents (time-window join with the IT tickets)
+        st.subheader("Related IT Tickets")
+        col1, col2 = st.columns(2)
+        with col1:
+            window_hours = st.select_slider("Window (hours either side)", WINDOW_HOURS, value=24)
+        with col2:
+            correlate_by = st.radio("Group by", list(options), horizontal=True, key="correlate_by")
+        correlation = correlation_summary(db, window_hours, correlate_by, filters)
+        if correlation is None:
+            st.info("Ticket correlations have not been computed yet. "
+                    "The background worker ('python worker.py') refreshes them every few minutes.")
+        elif not correlation.empty:
+            expected = correlation['expected'].iloc[0]
+            st.caption(f"A random {window_hours}h window has {expected:.1f} tickets on average; "
+                       f"lift above 1 means more tickets than usual follow these incidents.")
+            fig5 = px.bar(correlation, x=correlate_by, y=['avg_before', 'avg_after'], barmode='group',
+                          title=f"Tickets {window_hours}h Before/After Incidents")
+            timed_chart(fig5, use_container_width=True)
+            timed_dataframe(correlation.style.format({
+                'avg_before': '{:.2f}', 'avg_after': '{:.2f}', 'avg_minutes_to_ticket': '{:.0f}',
+                'expected': '{:.2f}', 'lift': '{:.2f}'
+            }), use_container_width=True)
+            st.write("**Incidents followed by the most tickets**")
+            timed_dataframe(top_correlated_incidents(db, window_hours, filters), use_container_width=True)
+
+        # Keyword/phrase search over descriptions
+        st.subheader("Search Incidents")
+        query = st.text_input("Search descriptions", placeholder='e.g. phishing "password reset"',
+                              key="incident_search")
+        if query:
+            # Matches are limited by the same filters as the charts
+            search_view = (query, str(filters))
+            if st.session_state.get('incident_search_view') != search_view:
+                st.session_state.incident_search_view = search_view
+                st.session_state.incident_search_page = 0
+            search_page = st.session_state.incident_search_page
+            results, total = db.search_incidents(query, limit=20, offset=search_page * 20,
+                                                 filters=filters)
+            st.caption(f"{total}{'+' if total >= MAX_COUNT else ''} matching incidents")
+            timed_dataframe(results, use_container_width=True)
+
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("← Previous results", disabled=search_page == 0):
+                    st.session_state.incident_search_page -= 1
+                    st.rerun()
+            with col3:
+                if st.button("Next results →", disabled=(search_page + 1) * 20 >= total):
+                    st.session_state.incident_search_page += 1
+                    st.rerun()
+
+        # Data table (keyset pagination, only the visible page is fetched)
+        st.subheader("Incident Details")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            sort_by = st.selectbox("Sort by", ["incident_id", "timestamp"])
+        with col2:
+            descending = st.checkbox("Descending")
+        with col3:
+            page_size = st.selectbox("Rows per page", [25, 50, 100], index=1)
+        with col4:
+            show_description = st.checkbox("Show descriptions")
+        columns = ['incident_id', 'timestamp', 'severity', 'category', 'status']
+        if show_description:
+            columns.append('description')
+
+        # Cursors of the pages seen so far, reset when the view changes
+        view = (sort_by, descending, page_size, str(filters))
+        if st.session_state.get('incident_view') != view:
+            st.session_state.incident_view = view
+            st.session_state.incident_cursors = [None]
+        cursors = st.session_state.incident_cursors
+
+        page_df, next_cursor = db.get_incidents_page(
+            filters, limit=page_size, after=cursors[-1], sort_by=sort_by,
+            descending=descending, columns=columns
+        )
+        timed_dataframe(page_df, use_container_width=True)
+
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("← Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
         with col2:
-            open_phishing = len(phishing_df[phishing_df['status'] == 'Open'])
-            st.metric("Open Phishing", open_phishing)
+            st.caption(f"Page {len(cursors)}")
         with col3:
-            recent_phishing = len(phishing_df[phishing_df['timestamp'] > '2025-01-01'])
-            st.metric("2025 Phishing", recent_phishing)
-    
-    # Data table
-    st.subheader("Incident Details")
-    st.dataframe(filtered_df, use_container_width=True)
+            st.button("Next →", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
 
 # Navigation
 st.markdown("---")
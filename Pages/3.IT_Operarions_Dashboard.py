@@ -1,119 +1,200 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import os
+from charts import backlog_area, counts_bar, counts_pie, resolution_histogram, trend_line
+from db_manager import DatabaseManager
+from instrumentation import page_run, timed_chart, timed_dataframe
+from search import MAX_COUNT
+from sessions import authorize
+from sla import SLA_TARGETS, open_ticket_ageing, resolution_percentiles
+from timeseries import FREQUENCIES
 
 st.set_page_config(page_title="IT Operations Dashboard", layout="wide")
 
-# Check login
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("You must be logged in to access this page.")
-    if st.button("Go to Login"):
-        st.switch_page("pages/1.Login.py")
-    st.stop()
-
-st.title("IT Operations Dashboard")
-st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
-
-# Load CSV 
-@st.cache_data
-def load_data():
-    # Project root
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    csv_path = os.path.join(project_root, "DATA", "it_tickets.csv")
-
-    if not os.path.exists(csv_path):
-        st.error(f"CSV file not found at {csv_path}")
-        return pd.DataFrame()
-
-    try:
-        df = pd.read_csv(csv_path)
-        return df
-    except pd.errors.EmptyDataError:
-        st.error("CSV file is empty or corrupted. Check DATA/it_tickets.csv")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error reading CSV: {str(e)}")
-        return pd.DataFrame()
-
-df = load_data()
-
-if df.empty:
-    st.warning("No data available. Please check:")
-    st.write("1. Make sure `DATA/it_tickets.csv` exists")
-    st.write("2. File should have this exact header line:")
-    st.code("ticket_id,priority,description,status,assigned_to,created_at,resolution_time_hours")
-    st.write("3. File should not be empty")
-    st.stop()
-
-# Show debug info
-st.write(f"**Loaded {len(df)} records**")
-st.write(f"**Columns:** {list(df.columns)}")
-
-# Sidebar filters
-with st.sidebar:
-    st.header("Filters")
-    priority_filter = st.multiselect("Priority", df['priority'].unique())
-    status_filter = st.multiselect("Status", df['status'].unique())
-    assigned_filter = st.multiselect("Assigned To", df['assigned_to'].unique())
-
-# Apply filters
-filtered_df = df.copy()
-if priority_filter:
-    filtered_df = filtered_df[filtered_df['priority'].isin(priority_filter)]
-if status_filter:
-    filtered_df = filtered_df[filtered_df['status'].isin(status_filter)]
-if assigned_filter:
-    filtered_df = filtered_df[filtered_df['assigned_to'].isin(assigned_filter)]
-
-# Metrics
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.metric("Total Tickets", len(filtered_df))
-with col2:
-    open_tickets = len(filtered_df[filtered_df['status'] == 'Open'])
-    st.metric("Open Tickets", open_tickets)
-with col3:
-    waiting_tickets = len(filtered_df[filtered_df['status'] == 'Waiting for User'])
-    st.metric("Waiting for User", waiting_tickets)
-
-# Charts
-col1, col2 = st.columns(2)
-
-with col1:
-    st.subheader("Tickets by Priority")
-    if 'priority' in filtered_df.columns:
-        priority_counts = filtered_df['priority'].value_counts().reset_index()
-        priority_counts.columns = ['priority', 'count']
-        fig1 = px.bar(priority_counts, x='priority', y='count', title="Tickets by Priority")
-        st.plotly_chart(fig1, use_container_width=True)
-
-with col2:
-    st.subheader("Tickets by Status")
-    if 'status' in filtered_df.columns:
-        status_counts = filtered_df['status'].value_counts().reset_index()
-        status_counts.columns = ['status', 'count']
-        fig2 = px.pie(status_counts, values='count', names='status', title="Tickets by Status")
-        st.plotly_chart(fig2, use_container_width=True)
-
-# Staff performance analysis
-st.subheader("Staff Performance Analysis")
-if 'assigned_to' in filtered_df.columns and 'resolution_time_hours' in filtered_df.columns:
-    staff_perf = filtered_df.groupby('assigned_to').agg({
-        'ticket_id': 'count',
-        'resolution_time_hours': 'mean'
-    }).reset_index()
-    staff_perf.columns = ['Staff', 'Ticket Count', 'Avg Resolution (hrs)']
-    
-    # Find staff with longest resolution time
-    slowest_staff = staff_perf.loc[staff_perf['Avg Resolution (hrs)'].idxmax()]
-    st.write(f"**Slowest Staff Member:** {slowest_staff['Staff']} (Avg: {slowest_staff['Avg Resolution (hrs)']:.1f} hours)")
-    
-    st.dataframe(staff_perf, use_container_width=True)
-
-# Data table
-st.subheader("Ticket Details")
-st.dataframe(filtered_df, use_container_width=True)
+# Time this run (and profile it if turned on from the Admin page); it ends
+# when the body does, including at st.stop()
+with page_run("IT Operations", st.session_state.get('profile_reruns', False)):
+    # Check login and role (cached, so no database query per rerun)
+    auth_result = authorize(st.session_state.get('token'), 'it_operations')
+    if auth_result is None:
+        st.error("You must be logged in to access this page.")
+        if st.button("Go to Login"):
+            st.switch_page("pages/1.Login.py")
+        st.stop()
+    if not auth_result[2]:
+        st.error("Your role does not have access to this page.")
+        st.stop()
+    st.session_state.role = auth_result[1]
+
+    st.title("IT Operations Dashboard")
+    st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
+
+    # Initialize database (a pooled connection, returned when the run ends)
+    db = DatabaseManager()
+
+    summary = db.get_ticket_summary()
+
+    if summary["total"] == 0:
+        st.warning("No data available. Please check:")
+        st.write("1. Make sure `DATA/it_tickets.csv` exists")
+        st.write("2. File should have this exact header line:")
+        st.code("ticket_id,priority,description,status,assigned_to,created_at,resolution_time_hours")
+        st.write("3. Run `python auth.py` to load it into the database")
+        st.stop()
+
+    st.write(f"**Loaded {summary['total']} records**")
+
+    # Sidebar filters
+    options = db.get_ticket_filter_options()
+    with st.sidebar:
+        st.header("Filters")
+        priority_filter = st.multiselect("Priority", options['priority'])
+        status_filter = st.multiselect("Status", options['status'])
+        assigned_filter = st.multiselect("Assigned To", options['assigned_to'])
+
+    # Filters are applied in SQL
+    filters = {
+        'priority': priority_filter,
+        'status': status_filter,
+        'assigned_to': assigned_filter
+    }
+    summary = db.get_ticket_summary(filters)
+
+    # Metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Tickets", summary['total'])
+    with col2:
+        st.metric("Open Tickets", summary['open'])
+    with col3:
+        st.metric("Waiting for User", summary['waiting'])
+
+    # Charts
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Tickets by Priority")
+        fig1 = counts_bar(db, "it_tickets", 'priority', filters, "Tickets by Priority")
+        timed_chart(fig1, use_container_width=True)
+
+    with col2:
+        st.subheader("Tickets by Status")
+        fig2 = counts_pie(db, "it_tickets", 'status', filters, "Tickets by Status")
+        timed_chart(fig2, use_container_width=True)
+
+    # Trends over time
+    st.subheader("Ticket Trends")
+    col1, col2 = st.columns(2)
+    with col1:
+        frequency = st.radio("Period", list(FREQUENCIES), index=1, horizontal=True)
+    with col2:
+        smoothing = st.slider("Rolling window (periods)", 1, 12, 1)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fig3 = trend_line(db, "it_tickets", frequency, "priority", filters,
+                          smoothing if smoothing > 1 else None, "Tickets by Priority over Time")
+        if fig3 is not None:
+            timed_chart(fig3, use_container_width=True)
+    with col2:
+        fig4 = backlog_area(db, "it_tickets", frequency, filters, "Open Tickets over Time")
+        if fig4 is not None:
+            timed_chart(fig4, use_container_width=True)
+
+    # Staff performance analysis
+    st.subheader("Staff Performance Analysis")
+    staff_perf = db.get_staff_performance(filters)
+    if not staff_perf.empty:
+        # Find staff with longest resolution time
+        slowest_staff = staff_perf.loc[staff_perf['Avg Resolution (hrs)'].idxmax()]
+        st.write(f"**Slowest Staff Member:** {slowest_staff['Staff']} (Avg: {slowest_staff['Avg Resolution (hrs)']:.1f} hours)")
+
+        timed_dataframe(staff_perf, use_container_width=True)
+
+    # SLA analytics from the resolution-time sketches
+    st.subheader("Resolution Time and SLA")
+    st.caption("SLA targets: " + ", ".join(f"{level} {hours}h" for level, hours in SLA_TARGETS.items()))
+    group_by = st.radio("Group by", ["Staff and priority", "Staff", "Priority"], horizontal=True)
+    by = {
+        "Staff and priority": ("assigned_to", "priority"),
+        "Staff": ("assigned_to",),
+        "Priority": ("priority",)
+    }[group_by]
+    percentiles = resolution_percentiles(db.conn, assigned_filter, priority_filter, by)
+    if not percentiles.empty:
+        timed_dataframe(percentiles.style.format({
+            'p50_hours': '{:.1f}', 'p90_hours': '{:.1f}', 'p99_hours': '{:.1f}',
+            'sla_breach_rate': '{:.1%}'
+        }), use_container_width=True)
+
+    fig5 = resolution_histogram(db, filters, "Resolution Time Distribution (hours)")
+    if fig5 is not None:
+        timed_chart(fig5, use_container_width=True)
+
+    st.write("**Open ticket ageing**")
+    ageing = open_ticket_ageing(db.conn, filters)
+    if not ageing.empty:
+        timed_dataframe(ageing, use_container_width=True)
+
+    # Keyword/phrase search over descriptions
+    st.subheader("Search Tickets")
+    query = st.text_input("Search descriptions", placeholder='e.g. phishing "password reset"',
+                          key="ticket_search")
+    if query:
+        # Matches are limited by the same filters as the charts
+        search_view = (query, str(filters))
+        if st.session_state.get('ticket_search_view') != search_view:
+            st.session_state.ticket_search_view = search_view
+            st.session_state.ticket_search_page = 0
+        search_page = st.session_state.ticket_search_page
+        results, total = db.search_tickets(query, limit=20, offset=search_page * 20,
+                                           filters=filters)
+        st.caption(f"{total}{'+' if total >= MAX_COUNT else ''} matching tickets")
+        timed_dataframe(results, use_container_width=True)
+
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("← Previous results", disabled=search_page == 0):
+                st.session_state.ticket_search_page -= 1
+                st.rerun()
+        with col3:
+            if st.button("Next results →", disabled=(search_page + 1) * 20 >= total):
+                st.session_state.ticket_search_page += 1
+                st.rerun()
+
+    # Data table (keyset pagination, only the visible page is fetched)
+    st.subheader("Ticket Details")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_by = st.selectbox("Sort by", ["ticket_id", "created_at"])
+    with col2:
+        descending = st.checkbox("Descending")
+    with col3:
+        page_size = st.selectbox("Rows per page", [25, 50, 100], index=1)
+    with col4:
+        show_description = st.checkbox("Show descriptions")
+    columns = ['ticket_id', 'created_at', 'priority', 'status', 'assigned_to', 'resolution_time_hours']
+    if show_description:
+        columns.append('description')
+
+    # Cursors of the pages seen so far, reset when the view changes
+    view = (sort_by, descending, page_size, str(filters))
+    if st.session_state.get('ticket_view') != view:
+        st.session_state.ticket_view = view
+        st.session_state.ticket_cursors = [None]
+    cursors = st.session_state.ticket_cursors
+
+    page_df, next_cursor = db.get_tickets_page(
+        filters, limit=page_size, after=cursors[-1], sort_by=sort_by,
+        descending=descending, columns=columns
+    )
+    timed_dataframe(page_df, use_container_width=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("← Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        st.button("Next →", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
 
 # Navigation
 st.markdown("---")
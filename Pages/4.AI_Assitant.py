@@ -1,74 +1,83 @@
 import streamlit as st
+from assistant import answer
+from db_manager import DatabaseManager
+from instrumentation import page_run
+from sessions import authorize
 
 st.set_page_config(page_title="AI Assistant", layout="wide")
 
-# Check login
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("Please login first")
-    st.stop()
+# Time this run (and profile it if turned on from the Admin page); it ends
+# when the body does, including at st.stop()
+with page_run("AI Assistant", st.session_state.get('profile_reruns', False)):
+    # Check login and role (cached, so no database query per rerun)
+    auth_result = authorize(st.session_state.get('token'), 'ai_assistant')
+    if auth_result is None:
+        st.error("Please login first")
+        st.stop()
+    if not auth_result[2]:
+        st.error("Your role does not have access to this page.")
+        st.stop()
+    st.session_state.role = auth_result[1]
 
-st.title("AI Assistant")
-st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
+    st.title("AI Assistant")
+    st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
 
-# Simple chat interface
-st.write("This is a simulated AI Assistant. For real implementation, add OpenAI API.")
+    # Initialize database (a pooled connection, returned when the run ends)
+    db = DatabaseManager()
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {"role": "assistant", "content": "Hello! I'm your AI Assistant. How can I help you today?"}
-    ]
+    # Simple chat interface
+    st.write("Ask about incidents and tickets, e.g. *open critical phishing incidents last month*, "
+             "*show high priority tickets for IT_Support_A* or *how long do critical tickets take to resolve*.")
 
-# Display chat messages
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
+    # Chat history lives in the database; only one window of it is loaded per run
+    CHAT_WINDOW = 20
+    username = st.session_state.username
+    messages, older = db.get_chat_messages(username, CHAT_WINDOW, st.session_state.get("chat_before"))
 
-# Chat input
-if prompt := st.chat_input("Type your question here..."):
-    # Add user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    
-    # Display user message
-    with st.chat_message("user"):
-        st.write(prompt)
-    
-    # Simulate AI response
-    with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            # Simple responses based on keywords
-            if "security" in prompt.lower() or "cyber" in prompt.lower():
-                response = """
-**Security Recommendation:**
-1. Regularly update your software
-2. Use strong, unique passwords
-3. Enable two-factor authentication
-4. Be cautious of suspicious emails
-5. Backup your data regularly
-                """
-            elif "it" in prompt.lower() or "ticket" in prompt.lower():
-                response = """
-**IT Support Tips:**
-1. Prioritize high-priority tickets
-2. Document all solutions
-3. Communicate clearly with users
-4. Follow up on unresolved issues
-5. Maintain knowledge base
-                """
-            else:
-                response = f"I understand you're asking about '{prompt}'. For detailed analysis, please integrate the OpenAI API."
-            
-            st.write(response)
-    
-    # Add AI response to history
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    # Page back through older messages
+    if older is not None:
+        if st.button("↑ Load older messages"):
+            st.session_state.chat_before = older
+            st.rerun()
+    if st.session_state.get("chat_before") is not None:
+        if st.button("↓ Back to latest"):
+            st.session_state.chat_before = None
+            st.rerun()
 
-# Clear chat button
-if st.button("Clear Chat"):
-    st.session_state.messages = [
-        {"role": "assistant", "content": "Chat cleared. How can I help you?"}
-    ]
-    st.rerun()
+    # Display chat messages
+    if not messages:
+        with st.chat_message("assistant"):
+            st.write("Hello! I'm your AI Assistant. Ask me about incidents or tickets.")
+    for message in messages:
+        with st.chat_message(message["role"]):
+            st.write(message["content"])
+
+    # Chat input
+    if prompt := st.chat_input("Type your question here..."):
+        # Add user message
+        db.add_chat_message(username, "user", prompt)
+
+        # Display user message
+        with st.chat_message("user"):
+            st.write(prompt)
+
+        # Assistant response
+        with st.chat_message("assistant"):
+            with st.spinner("Thinking..."):
+                # Answer from the indexed incident and ticket data (no network calls)
+                response = answer(db, prompt)
+
+                st.write(response)
+
+        # Add AI response to history and show the latest window next time
+        db.add_chat_message(username, "assistant", response)
+        st.session_state.chat_before = None
+
+    # Clear chat button
+    if st.button("Clear Chat"):
+        db.clear_chat_history(username)
+        st.session_state.chat_before = None
+        st.rerun()
 
 # Navigation
 st.markdown("---")
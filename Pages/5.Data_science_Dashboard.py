@@ -1,69 +1,113 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import os
+from catalog import recommendations
+from db_manager import DatabaseManager
+from instrumentation import page_run, timed_chart, timed_dataframe
+from sessions import authorize
+from worker import enqueue, worker_alive
 
 st.set_page_config(page_title="Data Science Dashboard", layout="wide")
 
-# Check login
-if 'logged_in' not in st.session_state or not st.session_state.logged_in:
-    st.error("You must be logged in to access this page.")
-    if st.button("Go to Login"):
-        st.switch_page("pages/1.Login.py")
-    st.stop()
-
-st.title("Data Science Dashboard")
-st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
-st.write("## Dataset Management")
-
-# Create sample data
-datasets = pd.DataFrame({
-    'dataset_name': ['Network Logs', 'User Activity', 'System Metrics', 'Security Events', 'Application Logs'],
-    'source_department': ['IT', 'IT', 'Operations', 'Security', 'Development'],
-    'file_size_mb': [250, 120, 85, 300, 75],
-    'row_count': [1000000, 500000, 250000, 1500000, 300000],
-    'quality_score': [85, 92, 78, 88, 95],
-    'is_archived': [0, 0, 1, 0, 1],
-    'last_accessed': ['2024-01-10', '2024-01-09', '2024-01-05', '2024-01-10', '2024-01-03']
-})
-
-# Analysis
-st.subheader("Dataset Analysis")
-
-col1, col2 = st.columns(2)
-
-with col1:
-    st.metric("Total Datasets", len(datasets))
-    st.metric("Total Data Size", f"{datasets['file_size_mb'].sum():.0f} MB")
-
-with col2:
-    st.metric("Average Quality Score", f"{datasets['quality_score'].mean():.1f}%")
-    st.metric("Archived Datasets", f"{datasets['is_archived'].sum()}")
-
-# Charts
-col1, col2 = st.columns(2)
-
-with col1:
-    st.subheader("Data by Department")
-    dept_counts = datasets['source_department'].value_counts().reset_index()
-    dept_counts.columns = ['source_department', 'count']
-    fig1 = px.bar(dept_counts, x='source_department', y='count')
-    st.plotly_chart(fig1, use_container_width=True)
-
-with col2:
-    st.subheader("Dataset Quality Distribution")
-    fig2 = px.histogram(datasets, x='quality_score', nbins=10)
-    st.plotly_chart(fig2, use_container_width=True)
-
-# Data table
-st.subheader("Dataset Details")
-st.dataframe(datasets, use_container_width=True)
-
-# Recommendations
-st.subheader("Recommendations")
-st.write("1. Archive System Metrics (lowest quality score: 78%)")
-st.write("2. Compress Network Logs (largest dataset: 250MB)")
-st.write("3. Backup Security Events (critical operational data)")
+# Time this run (and profile it if turned on from the Admin page); it ends
+# when the body does, including at st.stop()
+with page_run("Data Science", st.session_state.get('profile_reruns', False)):
+    # Check login and role (cached, so no database query per rerun)
+    auth_result = authorize(st.session_state.get('token'), 'data_science')
+    if auth_result is None:
+        st.error("You must be logged in to access this page.")
+        if st.button("Go to Login"):
+            st.switch_page("pages/1.Login.py")
+        st.stop()
+    if not auth_result[2]:
+        st.error("Your role does not have access to this page.")
+        st.stop()
+    st.session_state.role = auth_result[1]
+
+    st.title("Data Science Dashboard")
+    st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
+    st.write("## Dataset Management")
+
+    # Initialize database (a pooled connection, returned when the run ends)
+    db = DatabaseManager()
+
+    # Catalog from DATA/datasets_metadata.csv; only new or changed files are profiled,
+    # by the background worker when it is running, otherwise here
+    background = worker_alive(db.conn)
+    if background:
+        datasets = db.get_dataset_catalog(refresh=False)
+    else:
+        with st.spinner("Profiling datasets..."):
+            datasets = db.get_dataset_catalog()
+
+    if datasets.empty:
+        st.warning("No datasets registered. Add them to DATA/datasets_metadata.csv")
+        st.stop()
+
+    profiled = datasets[~datasets['estimated']]
+    datasets['size_mb'] = datasets['size_bytes'].fillna(0) / (1024 * 1024)
+
+    # Analysis
+    st.subheader("Dataset Analysis")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.metric("Total Datasets", len(datasets))
+        approx = "~" if datasets['estimated'].any() else ""
+        st.metric("Total Data Size", f"{approx}{datasets['size_mb'].sum():.0f} MB")
+
+    with col2:
+        average_quality = profiled['quality_score'].mean()
+        st.metric("Average Quality Score",
+                  f"{average_quality:.1f}%" if len(profiled) else "Not profiled")
+        st.metric("Profiled Datasets", f"{len(profiled)} of {len(datasets)}")
+
+    if len(profiled) < len(datasets):
+        st.caption("Sizes marked ~ are estimated from the metadata because the dataset file "
+                   "is not in DATA.")
+
+    # Charts
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Datasets by Uploader")
+        uploader_counts = datasets['uploaded_by'].value_counts().reset_index()
+        uploader_counts.columns = ['uploaded_by', 'count']
+        fig1 = px.bar(uploader_counts, x='uploaded_by', y='count')
+        timed_chart(fig1, use_container_width=True)
+
+    with col2:
+        if len(profiled):
+            st.subheader("Dataset Quality Distribution")
+            fig2 = px.histogram(profiled, x='quality_score', nbins=10)
+        else:
+            st.subheader("Dataset Size")
+            fig2 = px.bar(datasets, x='name', y='size_mb', labels={'size_mb': 'MB'})
+        timed_chart(fig2, use_container_width=True)
+
+    # Data table
+    st.subheader("Dataset Details")
+    timed_dataframe(
+        datasets[['name', 'uploaded_by', 'upload_date', 'rows', 'columns', 'size_mb',
+                  'null_rate', 'duplicate_rate', 'quality_score', 'estimated', 'profiled_at']],
+        use_container_width=True
+    )
+    if st.button("Re-profile all datasets"):
+        if background:
+            enqueue(db.conn, "reprofile")
+            st.info("Re-profiling queued for the background worker")
+        else:
+            with st.spinner("Profiling datasets..."):
+                db.reprofile_datasets()
+            st.rerun()
+
+    # Recommendations (derived from the profiles)
+    st.subheader("Recommendations")
+    suggestions = recommendations(datasets)
+    if not suggestions:
+        st.write("No actions needed.")
+    for number, suggestion in enumerate(suggestions, 1):
+        st.write(f"{number}. {suggestion}")
 
 # Navigation
 st.markdown("---")
@@ -0,0 +1,175 @@
+import streamlit as st
+import plotly.express as px
+from auth import get_auth_service
+from data_cache import data_cache
+from db_manager import DatabaseManager
+from instrumentation import SLOW_QUERY_SECONDS, metrics, page_run, timed_chart, timed_dataframe
+from ratelimit import get_login_limiter
+from sessions import ROLE_PERMISSIONS, authorize, session_cache
+from worker import TASKS, enqueue, job_durations, queue_stats, recent_jobs
+
+st.set_page_config(page_title="Admin", layout="wide")
+
+# Time this run (and profile it if turned on from the Admin page); it ends
+# when the body does, including at st.stop()
+with page_run("Admin", st.session_state.get('profile_reruns', False)):
+    # Check login and role (cached, so no database query per rerun)
+    auth_result = authorize(st.session_state.get('token'), 'admin')
+    if auth_result is None:
+        st.error("Please login first")
+        st.stop()
+    if not auth_result[2]:
+        st.error("Your role does not have access to this page.")
+        st.stop()
+    st.session_state.role = auth_result[1]
+
+    st.title("Admin")
+    st.write(f"User: {st.session_state.username} | Role: {st.session_state.role}")
+
+    # Initialize database (a pooled connection, returned when the run ends)
+    db = DatabaseManager()
+
+    # Background worker
+    st.subheader("Background Jobs")
+    stats = queue_stats(db.conn)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Worker", "Running" if stats['worker_alive'] else "Stopped")
+    with col2:
+        st.metric("Queued Jobs", stats['queued'])
+    with col3:
+        st.metric("Oldest Queued", f"{stats['oldest_queued_seconds']:.0f}s")
+    with col4:
+        st.metric("Running Jobs", stats['running'])
+    if not stats['worker_alive']:
+        st.warning("No worker is running. Start one with 'python worker.py'")
+
+    # Queue a task now
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        task = st.selectbox("Task", list(TASKS))
+    with col2:
+        st.write("")
+        if st.button("Run now"):
+            if enqueue(db.conn, task):
+                st.success(f"Queued {task}")
+            else:
+                st.info(f"{task} is already queued")
+
+    st.write("**Durations per task**")
+    timed_dataframe(job_durations(db.conn), use_container_width=True)
+
+    st.write("**Recent jobs**")
+    timed_dataframe(recent_jobs(db.conn), use_container_width=True)
+
+    # Roles (accounts register as 'user'; only admins grant anything more)
+    st.subheader("Users")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        role_user = st.text_input("Username", key='role_user')
+    with col2:
+        new_role = st.selectbox("Role", list(ROLE_PERMISSIONS), key='new_role')
+    with col3:
+        st.write("")
+        if st.button("Set role"):
+            if role_user == st.session_state.username and new_role != "admin":
+                st.error("You cannot remove your own admin role")
+            elif db.set_user_role(role_user, new_role):
+                st.success(f"{role_user} now has the {new_role} role")
+            else:
+                st.error(f"No user named {role_user}")
+    timed_dataframe(db.get_role_counts(), use_container_width=True)
+
+    # Where page runs spend their time (this app process only)
+    st.subheader("Performance")
+    st.checkbox("Profile my page runs with cProfile", key='profile_reruns')
+
+    spans = metrics.span_stats()
+    if spans.empty:
+        st.info("No timings recorded yet. Open a dashboard to collect some.")
+    else:
+        runs = spans[spans['span'].str.startswith("rerun.")]
+        st.write("**Page runs**")
+        timed_dataframe(runs, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Latency histogram**")
+            span_name = st.selectbox("Span", spans['span'].tolist())
+            fig = px.histogram(x=metrics.samples(span_name), nbins=30,
+                               labels={'x': "milliseconds"}, title=span_name)
+            timed_chart(fig, use_container_width=True)
+        with col2:
+            st.write("**Latest run breakdown**")
+            reruns = metrics.reruns()
+            page = st.selectbox("Page", sorted(reruns))
+            if page:
+                run = reruns[page]
+                st.caption(f"Total {run['seconds'] * 1000:.1f} ms")
+                timed_dataframe(
+                    [{"span": "    " * depth + name, "ms": None if seconds is None else seconds * 1000}
+                     for depth, name, seconds in run['spans']],
+                    use_container_width=True
+                )
+
+        st.write("**All spans**")
+        timed_dataframe(spans, use_container_width=True)
+
+    st.write(f"**Slowest queries** (over {SLOW_QUERY_SECONDS * 1000:.0f} ms, with their query plan)")
+    slow = metrics.slow_queries()
+    if not slow:
+        st.write("No slow queries recorded.")
+    for entry in slow[:10]:
+        with st.expander(f"{entry['seconds'] * 1000:.1f} ms: {entry['statement'][:100]}"):
+            st.code(entry['statement'], language="sql")
+            st.caption(f"Parameters: {entry['params']}")
+            if entry['plan']:
+                st.code(entry['plan'])
+
+    st.write("**Result cache**")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("This process (memory)")
+        st.json(data_cache.stats())
+    with col2:
+        st.caption("All processes on this host (result_cache.db)")
+        st.json(data_cache.shared.stats() if data_cache.shared is not None else {"enabled": False})
+
+    st.write("**Connections and logins** (this process)")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.caption("Connection pool")
+        st.json(db.pool.stats())
+    with col2:
+        st.caption("Password checks (bcrypt pool)")
+        st.json(get_auth_service().stats())
+    with col3:
+        st.caption("Session role cache")
+        st.json(session_cache.stats())
+    with col4:
+        st.caption("Login rate limiter")
+        st.json(get_login_limiter().stats())
+
+    st.write("**Statements by total time**")
+    timed_dataframe(metrics.statement_stats(), use_container_width=True)
+
+    profiles = metrics.profiles()
+    if profiles:
+        st.write("**Profiled runs**")
+        for profile in profiles:
+            with st.expander(f"{profile['page']}: {profile['seconds'] * 1000:.0f} ms"):
+                st.code(profile['stats'])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Refresh"):
+            st.rerun()
+    with col2:
+        if st.button("Reset timings"):
+            metrics.reset()
+            st.rerun()
+
+# Navigation
+st.markdown("---")
+if st.button("← Back to Home"):
+    st.switch_page("app.py")
@@ -0,0 +1,272 @@
+import re
+
+import pandas as pd
+
+from instrumentation import timed
+from search import MAX_COUNT
+from sla import resolution_percentiles
+
+# Local question answering for the AI Assistant page
+# Questions are parsed into the same filters the dashboards use (values
+# come from the rollup tables, time phrases become timestamp ranges) and
+# answered from indexed data: counts from the rollups, ranked matches from
+# the FTS5 description indexes and resolution times from the t-digest
+# sketches. Both indexes live in the database file and are kept current
+# by triggers, so new rows are searchable without a rebuild and nothing
+# leaves the machine.
+
+DOMAINS = {
+    "cyber_incidents": {
+        "label": "incidents",
+        "key": "incident_id",
+        "time_column": "timestamp",
+        "columns": ("severity", "category", "status"),
+        "words": {"incident", "incidents", "security", "cyber", "cybersecurity",
+                  "attack", "attacks", "threat", "threats"},
+    },
+    "it_tickets": {
+        "label": "tickets",
+        "key": "ticket_id",
+        "time_column": "created_at",
+        "columns": ("priority", "status", "assigned_to"),
+        "words": {"ticket", "tickets", "support", "helpdesk", "request", "requests"},
+    },
+}
+
+# Filter columns whose values only exist in one domain
+DOMAIN_COLUMNS = {
+    "category": "cyber_incidents",
+    "assigned_to": "it_tickets",
+}
+
+INTENT_WORDS = {
+    "resolution": {"resolution", "resolve", "sla", "breach", "breaches", "long"},
+    "list": {"show", "list", "which", "latest", "recent", "find", "display"},
+    "count": {"how", "many", "count", "number", "total"},
+}
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "for", "to", "from", "by", "with", "and",
+    "or", "is", "are", "was", "were", "be", "been", "do", "does", "did", "have", "has",
+    "had", "i", "me", "my", "we", "our", "you", "your", "it", "its", "this", "that",
+    "these", "those", "there", "what", "whats", "when", "where", "who", "why", "all",
+    "any", "some", "about", "please", "can", "could", "would", "give", "tell", "get",
+    "much", "most", "more", "than", "per", "each", "since", "between", "last", "past",
+    "month", "months", "week", "weeks", "day", "days", "year", "years", "today",
+    "yesterday", "time", "times", "take", "takes", "operations", "ops", "hours",
+    # Words that describe the data rather than filter or search it
+    "priority", "priorities", "severity", "category", "categories", "status", "assigned",
+    "staff", "mention", "mentions", "mentioning", "containing", "contain", "contains",
+    "summary", "overview", "stats", "statistics", "report", "level", "currently", "now",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+def normalize(text):
+    """Lowercase and turn underscores into spaces so 'IT_Support_A' matches 'it support a'"""
+    return " " + re.sub(r"\s+", " ", (text or "").lower().replace("_", " ")) + " "
+
+def _consume(text, pattern):
+    """Find a pattern and blank out the match so later steps skip it"""
+    match = re.search(pattern, text)
+    if match is None:
+        return None, text
+    return match, text[:match.start()] + " " + text[match.end():]
+
+def parse_time_range(text, now=None):
+    """Turn a time phrase into a (start, end) range, returning (range, remaining text)"""
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+    today = now.normalize()
+    week = today - pd.Timedelta(days=today.weekday())
+    month = today.replace(day=1)
+    year = today.replace(month=1, day=1)
+    fixed = [
+        (r"\btoday\b", (today, today + pd.Timedelta(days=1))),
+        (r"\byesterday\b", (today - pd.Timedelta(days=1), today)),
+        (r"\bthis week\b", (week, week + pd.Timedelta(weeks=1))),
+        (r"\blast week\b", (week - pd.Timedelta(weeks=1), week)),
+        (r"\bthis month\b", (month, month + pd.DateOffset(months=1))),
+        (r"\blast month\b", (month - pd.DateOffset(months=1), month)),
+        (r"\bthis year\b", (year, year + pd.DateOffset(years=1))),
+        (r"\blast year\b", (year - pd.DateOffset(years=1), year)),
+    ]
+    for pattern, period in fixed:
+        match, text = _consume(text, pattern)
+        if match:
+            return period, text
+
+    match, text = _consume(text, r"\b(?:last|past) (\d+) (day|week|month|year)s?\b")
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        offset = pd.Timedelta(days=amount) if unit == "day" else (
+            pd.Timedelta(weeks=amount) if unit == "week" else pd.DateOffset(**{unit + "s": amount}))
+        return (now - offset, None), text
+
+    match, text = _consume(text, r"\bsince (\d{4}-\d{2}-\d{2}|\d{4})\b")
+    if match:
+        return (pd.Timestamp(match.group(1)), None), text
+
+    match, text = _consume(text, r"\b(?:in |during )?(20\d{2})\b")
+    if match:
+        start = pd.Timestamp(year=int(match.group(1)), month=1, day=1)
+        return (start, start + pd.DateOffset(years=1)), text
+    return None, text
+
+def parse_question(question, options, now=None):
+    """Parse a question into domains, filters, intent and free-text keywords
+
+    options maps each domain table to its {column: values} filter options.
+    Returns {"domains", "filters": {table: filters}, "period", "intent",
+    "keywords"}.
+    """
+    text = normalize(question)
+    period, text = parse_time_range(text, now)
+    words = set(TOKEN_PATTERN.findall(text))
+
+    # Domain from explicit words first, then from domain-only filter values
+    domains = [table for table, config in DOMAINS.items() if words & config["words"]]
+    filters = {table: {} for table in DOMAINS}
+    remaining = text
+    for table, table_options in options.items():
+        scan = text
+        for column in DOMAINS[table]["columns"]:
+            values = sorted(table_options.get(column, ()), key=len, reverse=True)
+            for value in values:
+                pattern = r"\b" + re.escape(normalize(value).strip()) + r"s?\b"
+                match, scan = _consume(scan, pattern)
+                if match:
+                    filters[table].setdefault(column, []).append(value)
+                    remaining = re.sub(pattern, " ", remaining)
+                    if column in DOMAIN_COLUMNS and DOMAIN_COLUMNS[column] not in domains:
+                        domains.append(DOMAIN_COLUMNS[column])
+    if not domains:
+        domains = list(DOMAINS)
+
+    for table in DOMAINS:
+        if period is not None:
+            filters[table][DOMAINS[table]["time_column"]] = period
+
+    # Intent from the words left over, so e.g. status 'Resolved' is not an SLA question
+    remaining_words = TOKEN_PATTERN.findall(remaining)
+    intent = "search"
+    for name, intent_words in INTENT_WORDS.items():
+        if set(remaining_words) & intent_words:
+            intent = name
+            break
+    if intent == "resolution" and "it_tickets" in domains:
+        domains = ["it_tickets"]
+
+    ignored = STOPWORDS | set().union(*INTENT_WORDS.values())
+    ignored |= set().union(*(config["words"] for config in DOMAINS.values()))
+    keywords = [word for word in remaining_words if word not in ignored and len(word) > 1]
+    if intent == "search" and not keywords:
+        intent = "count"
+    return {
+        "domains": domains,
+        "filters": {table: filters[table] for table in domains},
+        "period": period,
+        "intent": intent,
+        "keywords": keywords,
+    }
+
+def describe_filters(filters, time_column):
+    """Describe filters in words, e.g. 'Critical, Phishing, 2025-09-01 to 2025-10-01'"""
+    parts = []
+    for column, values in filters.items():
+        if column == time_column:
+            start, end = values
+            if end is None:
+                parts.append(f"since {start:%Y-%m-%d}")
+            else:
+                parts.append(f"{start:%Y-%m-%d} to {(end - pd.Timedelta(seconds=1)):%Y-%m-%d}")
+        else:
+            parts.append(" or ".join(values))
+    return ", ".join(parts) if parts else "all time"
+
+def format_rows(df, table, limit=5):
+    """Format result rows as markdown bullets"""
+    config = DOMAINS[table]
+    lines = []
+    for row in df.head(limit).itertuples(index=False):
+        row = row._asdict()
+        fields = [f"{row[config['time_column']]:%Y-%m-%d %H:%M}"]
+        fields += [str(row[column]) for column in config["columns"] if column in row]
+        line = f"- #{row[config['key']]} · " + " · ".join(fields)
+        if row.get("match"):
+            line += f" — {row['match']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+def _count_answer(db, table, filters):
+    """Total and a breakdown over the first column that is not filtered"""
+    config = DOMAINS[table]
+    if table == "cyber_incidents":
+        total = db.get_incident_summary(filters)["total"]
+        get_counts = db.get_incident_counts
+    else:
+        total = db.get_ticket_summary(filters)["total"]
+        get_counts = db.get_ticket_counts
+    text = f"**{total}** {config['label']} ({describe_filters(filters, config['time_column'])})."
+    breakdown = next((column for column in config["columns"] if column not in filters), None)
+    if total and breakdown:
+        counts = get_counts(breakdown, filters)
+        split = ", ".join(f"{row[breakdown]} {row['count']}" for _, row in counts.iterrows())
+        text += f" By {breakdown.replace('_', ' ')}: {split}."
+    return text
+
+def _list_answer(db, table, filters):
+    """Most recent matching rows"""
+    config = DOMAINS[table]
+    get_page = db.get_incidents_page if table == "cyber_incidents" else db.get_tickets_page
+    rows, _ = get_page(filters, limit=5, sort_by=config["time_column"], descending=True)
+    heading = f"Latest {config['label']} ({describe_filters(filters, config['time_column'])}):"
+    if rows.empty:
+        return f"No {config['label']} match ({describe_filters(filters, config['time_column'])})."
+    return heading + "\n" + format_rows(rows, table)
+
+def _search_answer(db, table, filters, keywords):
+    """Best description matches for the keywords within the filters"""
+    config = DOMAINS[table]
+    search = db.search_incidents if table == "cyber_incidents" else db.search_tickets
+    text = " ".join(keywords)
+    rows, total = search(text, limit=5, filters=filters)
+    scope = describe_filters(filters, config["time_column"])
+    if total == 0:
+        return f"No {config['label']} descriptions mention '{text}' ({scope})."
+    more = "+" if total >= MAX_COUNT else ""
+    return (f"**{total}{more}** {config['label']} mention '{text}' ({scope}). Best matches:\n"
+            + format_rows(rows, table))
+
+def _resolution_answer(db, filters):
+    """Resolution-time percentiles and SLA breach rate from the sketches"""
+    by = tuple(column for column in ("assigned_to", "priority") if column in filters) or ("priority",)
+    stats = resolution_percentiles(db.conn, filters.get("assigned_to"), filters.get("priority"), by)
+    if stats.empty:
+        return "No resolved tickets match."
+    lines = ["Resolution time of resolved tickets (all time):"]
+    for _, row in stats.iterrows():
+        group = " / ".join(str(row[column]) for column in by)
+        lines.append(f"- {group}: {row['tickets']} tickets, median {row['p50_hours']:.1f}h, "
+                     f"p90 {row['p90_hours']:.1f}h, {row['sla_breach_rate']:.0%} over SLA")
+    return "\n".join(lines)
+
+@timed("assistant.answer")
+def answer(db, question, now=None):
+    """Answer a question about incidents and tickets from the indexed data"""
+    options = {
+        "cyber_incidents": db.get_incident_filter_options(),
+        "it_tickets": db.get_ticket_filter_options(),
+    }
+    parsed = parse_question(question, options, now)
+    parts = []
+    for table in parsed["domains"]:
+        filters = parsed["filters"][table]
+        if parsed["intent"] == "resolution" and table == "it_tickets":
+            parts.append(_resolution_answer(db, filters))
+        elif parsed["keywords"]:
+            parts.append(_search_answer(db, table, filters, parsed["keywords"]))
+        elif parsed["intent"] == "list":
+            parts.append(_list_answer(db, table, filters))
+        else:
+            parts.append(_count_answer(db, table, filters))
+    return "\n\n".join(parts)
@@ -1,13 +1,151 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import bcrypt
 
-def hash_password(password):
+# bcrypt work factor. Changing it rehashes each user at their next login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+def hash_password(password, rounds=None):
     """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt)
 
 def verify_password(password, hashed_password):
     """Verify a password against its hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+def get_hash_rounds(hashed_password):
+    """Get the work factor a bcrypt hash was made with"""
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode('utf-8')
+    return int(hashed_password.split('$')[2])
+
+class AuthBusyError(Exception):
+    """Raised when too many password checks are already queued"""
+
+class AuthTimeoutError(Exception):
+    """Raised when a password check does not finish within the timeout"""
+
+class AuthService:
+    """Runs bcrypt in a bounded worker pool instead of on the script thread"""
+    
+    def __init__(self, workers=None, max_pending=64, rounds=None, timeout=10):
+        # bcrypt releases the GIL, so worker threads hash in parallel
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or os.cpu_count() or 2,
+            thread_name_prefix="bcrypt"
+        )
+        self.rounds = rounds or BCRYPT_ROUNDS
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._pending = 0
+        # Made in the background now, so the first unknown username is not slower either
+        self._dummy_hash = self.executor.submit(hash_password, os.urandom(16).hex(), self.rounds)
+    
+    def _done(self, future):
+        """Free a queue slot when a bcrypt job finishes"""
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+    
+    def _run(self, func, *args):
+        """Run a bcrypt call in the pool, rejecting it if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise AuthBusyError("Too many login attempts in progress, please try again")
+        
+        with self._lock:
+            self._pending += 1
+        start = time.perf_counter()
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self._done)
+        result = self._wait(future)
+        
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+            self._completed += 1
+        return result
+    
+    def _wait(self, future):
+        """Get a bcrypt job's result, giving up after the timeout"""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The job keeps its queue slot until it actually finishes
+            with self._lock:
+                self._timed_out += 1
+            raise AuthTimeoutError("The password check took too long, please try again")
+    
+    def hash_password(self, password):
+        """Hash a password with the configured work factor"""
+        return self._run(hash_password, password, self.rounds)
+    
+    def verify_password(self, password, hashed_password):
+        """Verify a password against its hash"""
+        return self._run(verify_password, password, hashed_password)
+    
+    def dummy_hash(self):
+        """A hash at the current work factor to check unknown usernames against
+
+        Checking it costs the same as a real password check, so response
+        times do not reveal which usernames exist.
+        """
+        return self._wait(self._dummy_hash)
+    
+    def needs_rehash(self, hashed_password):
+        """Check whether a hash was made with a different work factor"""
+        return get_hash_rounds(hashed_password) != self.rounds
+    
+    def stats(self):
+        """Get queue counters and auth latency percentiles in milliseconds"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "rounds": self.rounds,
+            }
+        
+        for name, percentile in [("p50_ms", 50), ("p90_ms", 90), ("p99_ms", 99)]:
+            if latencies:
+                index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+                stats[name] = latencies[index] * 1000
+            else:
+                stats[name] = None
+        return stats
+
+_auth_service = None
+_auth_service_lock = threading.Lock()
+
+def get_auth_service():
+    """Get the process-wide auth service"""
+    global _auth_service
+    with _auth_service_lock:
+        if _auth_service is None:
+            _auth_service = AuthService()
+        return _auth_service
+
+# Accounts created by create_default_users() and initialize_database()
+DEFAULT_USERS = [
+    {"username": "admin", "password": "admin123", "role": "admin"},
+    {"username": "cyber", "password": "cyber123", "role": "cybersecurity"},
+    {"username": "it", "password": "it123", "role": "it_operations"},
+]
 
 def create_default_users():
     """Create default users for testing"""
@@ -15,15 +153,8 @@ def create_default_users():
     
     db = DatabaseManager()
     
-    # Default users
-    users = [
-        ("admin", "admin123", "admin"),
-        ("cyber", "cyber123", "cybersecurity"),
-        ("it", "it123", "it_operations")
-    ]
-    
-    for username, password, role in users:
-        db.register_user(username, password, role)
+    # Default users, hashed in parallel and inserted together (existing ones are kept)
+    db.provision_users(DEFAULT_USERS)
     
     print("Default users created")
     
@@ -36,6 +167,7 @@ if __name__ == "__main__":
     
 def initialize_database():
     """Initialize the database with tables and data"""
+    from correlation import WINDOW_HOURS, refresh_correlations
     from db_manager import DatabaseManager
     
     print("=== Setting up database ===")
@@ -51,15 +183,13 @@ def initialize_database():
     print("Loading CSV data...")
     db.load_csv_data()
     
+    # Precompute the incident/ticket correlations the dashboard reads
+    print("Computing ticket correlations...")
+    for window_hours in WINDOW_HOURS:
+        refresh_correlations(db.conn, window_hours)
+    
     # Add your default users too
-    users = [
-        ("admin", "admin123", "admin"),
-        ("cyber", "cyber123", "cybersecurity"),
-        ("it", "it123", "it_operations")
-    ]
-    
-    for username, password, role in users:
-        db.register_user(username, password, role)
+    db.provision_users(DEFAULT_USERS)
     
     db.close()
     print("=== Database setup complete! ===")
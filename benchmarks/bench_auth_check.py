@@ -0,0 +1,52 @@
+import os
+import tempfile
+import time
+
+import sessions
+from db_manager import DatabaseManager
+
+# Auth-check overhead per page render
+# Run from the project root: python -m benchmarks.bench_auth_check
+
+def time_calls(func, iterations):
+    """Get the mean time of func() in microseconds"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def run(iterations=20000):
+    """Compare the cached token check with a role query per rerun"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        with DatabaseManager(db_name) as db:
+            db.cursor.execute(
+                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                ("analyst", "x", "cybersecurity")
+            )
+            db.conn.commit()
+
+        sessions.session_cache = sessions.SessionCache(db_name=db_name)
+        token = sessions.create_token("analyst")
+
+        def role_query():
+            with DatabaseManager(db_name) as db:
+                db.get_user_role("analyst")
+
+        def cold_check():
+            sessions.session_cache.invalidate("analyst")
+            sessions.authorize(token, "cybersecurity")
+
+        results = {
+            "verify_token_us": time_calls(lambda: sessions.verify_token(token), iterations),
+            "authorize_cached_us": time_calls(lambda: sessions.authorize(token, "cybersecurity"), iterations),
+            "authorize_cold_us": time_calls(cold_check, iterations // 10),
+            "role_query_us": time_calls(role_query, iterations // 10),
+        }
+
+    for name, value in results.items():
+        print(f"{name:>22}: {value:8.1f}")
+    return results
+
+if __name__ == "__main__":
+    run()
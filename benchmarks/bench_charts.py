@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import charts
+from db_manager import DatabaseManager
+from benchmarks.scratch import scratch_result_cache
+
+# Chart payload size and build time: raw rows against the chart data layer
+# Run from the project root: python -m benchmarks.bench_charts [rows]
+
+PRIORITIES = ["Low", "Medium", "High", "Critical"]
+STATUSES = ["Open", "In Progress", "Resolved", "Waiting for User"]
+
+def load_tickets(db, rows, seed=0):
+    """Insert rows synthetic tickets spread over ten years"""
+    rng = np.random.default_rng(seed)
+    created = 1420070400 + rng.integers(0, 10 * 365 * 86400, rows)
+    hours = rng.gamma(2.0, 12.0, rows).round()
+    with db.conn:
+        db.conn.executemany(
+            "INSERT INTO it_tickets (ticket_id, priority, description, status, assigned_to, "
+            "created_at, resolution_time_hours) VALUES (?, ?, '', ?, 'IT_Support_A', ?, ?)",
+            zip(range(rows), rng.choice(PRIORITIES, rows).tolist(), rng.choice(STATUSES, rows).tolist(),
+                created.tolist(), hours.tolist())
+        )
+
+def timed(build):
+    """Build a figure and return (seconds, JSON payload bytes)"""
+    start = time.perf_counter()
+    fig = build()
+    seconds = time.perf_counter() - start
+    return seconds, len(fig.to_json())
+
+def run(rows=1_000_000):
+    """Print and return payload size and build time per chart"""
+    with tempfile.TemporaryDirectory() as tmp, scratch_result_cache(tmp):
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        load_tickets(db, rows)
+        raw = pd.read_sql("SELECT created_at, resolution_time_hours FROM it_tickets", db.conn)
+        daily = raw.groupby(raw["created_at"] // 86400).size()
+        daily.index = pd.to_datetime(daily.index * 86400, unit="s")
+        daily = daily.to_frame("count")
+
+        cases = {
+            "histogram, raw rows": lambda: px.histogram(raw, x="resolution_time_hours", nbins=30),
+            "histogram, SQL bins": lambda: charts.resolution_histogram(db, None, "bins"),
+            "daily timeline, all points": lambda: px.line(daily),
+            "daily timeline, LTTB": lambda: px.line(charts.downsample(daily)),
+            "cached trend figure": lambda: charts.trend_line(db, "it_tickets", "daily", None,
+                                                             None, None, "trend"),
+        }
+        results = {"rows": rows, "charts": {}}
+        for name, build in cases.items():
+            seconds, payload = timed(build)
+            if name == "cached trend figure":
+                # Second call is served from the figure cache
+                seconds, payload = timed(build)
+            results["charts"][name] = {"seconds": seconds, "payload_bytes": payload}
+            print(f"{name:>28}: {payload / 1e3:10.1f} KB  {seconds * 1000:8.1f} ms")
+        db.close()
+    return results
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
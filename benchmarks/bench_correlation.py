@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from correlation import nearest_after, refresh_correlations, window_counts
+from db_manager import DatabaseManager
+from benchmarks.scratch import scratch_result_cache
+
+# Incident/ticket time-window join at 1M x 1M rows
+# Run from the project root: python -m benchmarks.bench_correlation [rows]
+
+START = 1577836800  # 2020-01-01
+SPAN = 5 * 365 * 86400
+
+def make_times(rows, seed):
+    """Sorted random epoch seconds over five years"""
+    rng = np.random.default_rng(seed)
+    return np.sort(START + rng.integers(0, SPAN, rows))
+
+def run(rows=1_000_000, window_hours=24):
+    """Print and return join timings in memory and through the cached table"""
+    window = window_hours * 3600
+    incident_times = make_times(rows, 1)
+    ticket_times = make_times(rows, 2)
+    results = {"rows": rows, "window_hours": window_hours}
+
+    start = time.perf_counter()
+    before, after = window_counts(incident_times, ticket_times, window, window)
+    results["window_counts_seconds"] = time.perf_counter() - start
+
+    incidents = pd.DataFrame({"incident_id": np.arange(rows), "timestamp": incident_times})
+    tickets = pd.DataFrame({"ticket_id": np.arange(rows), "created_at": ticket_times})
+    start = time.perf_counter()
+    nearest_after(incidents, tickets, window)
+    results["merge_asof_seconds"] = time.perf_counter() - start
+    print(f"{rows:,} incidents x {rows:,} tickets, {window_hours}h windows")
+    print(f"  window counts (searchsorted): {results['window_counts_seconds'] * 1000:8.1f} ms")
+    print(f"  nearest ticket (merge_asof):  {results['merge_asof_seconds'] * 1000:8.1f} ms")
+    print(f"  mean tickets after an incident: {after.mean():.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp, scratch_result_cache(tmp):
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        with db.conn:
+            db.conn.executemany(
+                "INSERT INTO cyber_incidents (incident_id, timestamp, severity, category, status) "
+                "VALUES (?, ?, 'High', 'Phishing', 'Open')",
+                zip(range(rows), incident_times.tolist())
+            )
+            db.conn.executemany(
+                "INSERT INTO it_tickets (ticket_id, created_at, priority, status, assigned_to) "
+                "VALUES (?, ?, 'High', 'Open', 'IT_Support_A')",
+                zip(range(rows), ticket_times.tolist())
+            )
+        print(f"  loaded both tables in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        refresh_correlations(db.conn, window_hours)
+        results["refresh_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        refresh_correlations(db.conn, window_hours)
+        results["current_check_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        db.get_correlation_summary(window_hours)
+        results["summary_seconds"] = time.perf_counter() - start
+        db.close()
+
+    print(f"  refresh through SQLite:       {results['refresh_seconds']:8.2f} s")
+    print(f"  refresh when unchanged:       {results['current_check_seconds'] * 1000:8.2f} ms")
+    print(f"  summary from cached table:    {results['summary_seconds']:8.2f} s")
+    return results
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from db_manager import DatabaseManager
+from benchmarks.scratch import scratch_result_cache
+
+# Description search latency at 1M+ documents
+# "filtered" restricts matches to one status, as the dashboard filters do
+# Run from the project root: python -m benchmarks.bench_search [rows]
+
+STATUSES = ["Open", "In Progress", "Resolved", "Closed"]
+
+WORDS = ["phishing", "malware", "ransomware", "password", "reset", "vpn", "printer",
+         "email", "outage", "server", "login", "failed", "suspicious", "attachment",
+         "firewall", "blocked", "laptop", "slow", "network", "access", "denied", "user",
+         "account", "locked", "update", "patch", "database", "timeout", "backup", "disk"]
+
+def make_descriptions(rows, seed=0):
+    """Generate descriptions with a skewed word distribution and rare ids"""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, len(WORDS) + 1)
+    weights /= weights.sum()
+    picks = rng.choice(len(WORDS), size=(rows, 6), p=weights)
+    return [" ".join(WORDS[i] for i in row) + f" ref{n}" for n, row in enumerate(picks)]
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def run(rows=1_000_000, repeats=20):
+    """Load rows incidents into a temporary database and time searches"""
+    with tempfile.TemporaryDirectory() as tmp, scratch_result_cache(tmp):
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        descriptions = make_descriptions(rows)
+        statuses = np.random.default_rng(1).choice(STATUSES, size=rows)
+
+        start = time.perf_counter()
+        with db.conn:
+            db.conn.executemany(
+                "INSERT INTO cyber_incidents (incident_id, timestamp, severity, category, status, description) "
+                "VALUES (?, ?, 'Low', 'Phishing', ?, ?)",
+                ((n, 1700000000 + n, str(status), text)
+                 for n, (status, text) in enumerate(zip(statuses, descriptions)))
+            )
+        load_seconds = time.perf_counter() - start
+        print(f"Indexed {rows:,} descriptions in {load_seconds:.1f}s")
+
+        queries = {
+            "common word": "phishing",
+            "rare word": "disk",
+            "two words": "password reset",
+            "phrase": '"account locked"',
+            "unique id": f"ref{rows // 2}",
+            "deep page": "phishing",
+            "filtered": "phishing",
+        }
+        results = {"rows": rows, "load_seconds": load_seconds, "queries": {}}
+        for name, query in queries.items():
+            offset = 1000 if name == "deep page" else 0
+            filters = {"status": ["Open"]} if name == "filtered" else None
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                page, total = db.search_incidents(query, filters=filters, limit=20, offset=offset)
+                samples.append(time.perf_counter() - start)
+            results["queries"][name] = {
+                "matches": total,
+                "p50_ms": percentile_ms(samples, 50),
+                "p95_ms": percentile_ms(samples, 95),
+            }
+            print(f"{name:>12}: {total:>9,} matches  p50 {percentile_ms(samples, 50):8.1f} ms"
+                  f"  p95 {percentile_ms(samples, 95):8.1f} ms")
+        db.close()
+    return results
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
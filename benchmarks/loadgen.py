@@ -0,0 +1,178 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from auth import hash_password
+
+# Synthetic incidents, tickets and users shaped like the shipped DATA CSVs
+# Category, status, priority and assignee frequencies, the time span and
+# resolution hours per priority are measured from DATA/*.csv, so the
+# generated files follow the same distributions at any size. Files are
+# written in chunks, so 10M rows never sit in memory at once.
+# Run from the project root: python -m benchmarks.loadgen OUT_DIR [rows]
+
+CHUNK_ROWS = 500_000
+
+# Words for descriptions, so full-text search has something to match
+INCIDENT_WORDS = {
+    "Phishing": ["phishing email", "credential harvesting page", "spoofed invoice", "suspicious link"],
+    "Malware": ["malware detected", "ransomware note", "trojan beacon", "infected attachment"],
+    "DDoS": ["traffic spike", "syn flood", "service degraded", "botnet traffic"],
+    "Misconfiguration": ["open storage bucket", "firewall rule", "expired certificate", "public share"],
+    "Unauthorized Access": ["failed logins", "privilege escalation", "unknown device", "vpn login"],
+}
+TICKET_WORDS = ["password reset", "vpn not connecting", "printer offline", "laptop slow",
+                "email sync error", "software install", "disk full", "network drive access"]
+ASSETS = ["workstation", "server", "laptop", "mail gateway", "web portal", "database", "file share"]
+
+# Roles the app grants, with how many of the generated users get each
+USER_ROLES = {"user": 0.4, "cybersecurity": 0.2, "it_operations": 0.2, "data_science": 0.15, "admin": 0.05}
+
+def frequencies(series):
+    """Values and their share of a column"""
+    counts = series.value_counts(normalize=True)
+    return counts.index.tolist(), counts.to_numpy()
+
+def measure_distributions(data_dir="DATA"):
+    """Read value frequencies and time spans from the shipped CSVs"""
+    incidents = pd.read_csv(os.path.join(data_dir, "cyber_incidents.csv"), parse_dates=["timestamp"],
+                            date_format="ISO8601")
+    tickets = pd.read_csv(os.path.join(data_dir, "it_tickets.csv"), parse_dates=["created_at"],
+                          date_format="ISO8601")
+    return {
+        "incidents": {
+            "severity": frequencies(incidents["severity"]),
+            "category": frequencies(incidents["category"]),
+            "status": frequencies(incidents["status"]),
+            "start": incidents["timestamp"].min(),
+            "end": incidents["timestamp"].max(),
+        },
+        "tickets": {
+            "priority": frequencies(tickets["priority"]),
+            "status": frequencies(tickets["status"]),
+            "assigned_to": frequencies(tickets["assigned_to"]),
+            "start": tickets["created_at"].min(),
+            "end": tickets["created_at"].max(),
+            # Observed resolution hours per priority, resampled with jitter
+            "resolution_hours": {
+                priority: group.dropna().to_numpy()
+                for priority, group in tickets.groupby("priority")["resolution_time_hours"]
+            },
+        },
+    }
+
+def pick(rng, distribution, size):
+    """Draw values with the measured frequencies"""
+    values, weights = distribution
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size, p=weights)]
+
+def random_times(rng, start, end, size):
+    """Uniform times between start and end, rounded to the second"""
+    seconds = int((end - start).total_seconds())
+    return start.floor("s") + pd.to_timedelta(rng.integers(0, seconds + 1, size), unit="s")
+
+def describe(rng, phrases, size):
+    """Short descriptions built from a phrase and an asset"""
+    phrases = np.asarray(phrases, dtype=object)
+    assets = np.asarray(ASSETS, dtype=object)
+    return phrases[rng.integers(0, len(phrases), size)] + " on " + assets[rng.integers(0, len(assets), size)]
+
+def incident_chunk(rng, spec, first_id, size):
+    """One chunk of incident rows in the cyber_incidents.csv layout"""
+    category = pick(rng, spec["category"], size)
+    description = describe(rng, ["security alert"], size)
+    for name, phrases in INCIDENT_WORDS.items():
+        mask = category == name
+        description[mask] = describe(rng, phrases, int(mask.sum()))
+    return pd.DataFrame({
+        "incident_id": np.arange(first_id, first_id + size),
+        "timestamp": random_times(rng, spec["start"], spec["end"], size).strftime("%Y-%m-%d %H:%M:%S.%f"),
+        "severity": pick(rng, spec["severity"], size),
+        "category": category,
+        "status": pick(rng, spec["status"], size),
+        "description": description,
+    })
+
+def ticket_chunk(rng, spec, first_id, size):
+    """One chunk of ticket rows in the it_tickets.csv layout"""
+    priority = pick(rng, spec["priority"], size)
+    hours = np.zeros(size, dtype=np.int64)
+    for name, observed in spec["resolution_hours"].items():
+        mask = priority == name
+        sample = rng.choice(observed, int(mask.sum())) + rng.normal(0, 3, int(mask.sum()))
+        hours[mask] = np.clip(sample.round(), 1, None).astype(np.int64)
+    return pd.DataFrame({
+        "ticket_id": np.arange(first_id, first_id + size),
+        "priority": priority,
+        "description": describe(rng, TICKET_WORDS, size),
+        "status": pick(rng, spec["status"], size),
+        "assigned_to": pick(rng, spec["assigned_to"], size),
+        "created_at": random_times(rng, spec["start"], spec["end"], size).strftime("%Y-%m-%d %H:%M:%S"),
+        "resolution_time_hours": hours,
+    })
+
+def write_csv(path, make_chunk, rows, first_id, seed, append=False):
+    """Write rows generated chunk by chunk, appending to an existing file if asked"""
+    rng = np.random.default_rng(seed)
+    header = not (append and os.path.exists(path))
+    with open(path, "a" if append else "w", newline="") as f:
+        for offset in range(0, rows, CHUNK_ROWS):
+            chunk = make_chunk(rng, first_id + offset, min(CHUNK_ROWS, rows - offset))
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+    return rows
+
+def write_incidents(path, rows, distributions, first_id=1000, seed=1, append=False):
+    """Write synthetic incidents to a CSV"""
+    spec = distributions["incidents"]
+    return write_csv(path, lambda rng, start, size: incident_chunk(rng, spec, start, size),
+                     rows, first_id, seed, append)
+
+def write_tickets(path, rows, distributions, first_id=2000, seed=2, append=False):
+    """Write synthetic tickets to a CSV"""
+    spec = distributions["tickets"]
+    return write_csv(path, lambda rng, start, size: ticket_chunk(rng, spec, start, size),
+                     rows, first_id, seed, append)
+
+def write_dataset(data_dir, incidents, tickets, distributions=None):
+    """Write a DATA folder with synthetic incident and ticket CSVs and the dataset metadata"""
+    distributions = distributions or measure_distributions()
+    os.makedirs(data_dir, exist_ok=True)
+    write_incidents(os.path.join(data_dir, "cyber_incidents.csv"), incidents, distributions)
+    write_tickets(os.path.join(data_dir, "it_tickets.csv"), tickets, distributions)
+    metadata = os.path.join("DATA", "datasets_metadata.csv")
+    if os.path.exists(metadata):
+        pd.read_csv(metadata).to_csv(os.path.join(data_dir, "datasets_metadata.csv"), index=False)
+
+def make_users(count, rounds=None, seed=3):
+    """Synthetic (username, password, role, password_hash) rows
+
+    Hashes are made in parallel threads, since bcrypt releases the GIL.
+    """
+    rng = np.random.default_rng(seed)
+    roles = pick(rng, (list(USER_ROLES), np.array(list(USER_ROLES.values()))), count)
+    credentials = [(f"user{number:06d}", f"pass-{number}-{rng.integers(1e9)}", role)
+                   for number, role in enumerate(roles)]
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 2) as executor:
+        hashes = list(executor.map(lambda row: hash_password(row[1], rounds).decode("utf-8"),
+                                   credentials))
+    return [row + (password_hash,) for row, password_hash in zip(credentials, hashes)]
+
+def insert_users(conn, users):
+    """Insert generated users in one transaction"""
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+            [(username, password_hash, role) for username, _, role, password_hash in users]
+        )
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.loadgen OUT_DIR [rows]")
+        sys.exit(1)
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    write_dataset(sys.argv[1], rows, rows)
+    print(f"Wrote {rows:,} incidents and {rows:,} tickets to {sys.argv[1]}")
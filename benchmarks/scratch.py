@@ -0,0 +1,24 @@
+import contextlib
+import os
+
+from data_cache import data_cache
+from result_cache import RESULT_CACHE_MB, SharedResultCache
+
+# Scratch state shared by the benchmarks
+# Benchmarks fill and clear the result caches, so they run against a
+# result cache file in their own temporary folder and never touch the
+# app's result_cache.db or leave their results in it.
+
+@contextlib.contextmanager
+def scratch_result_cache(folder):
+    """Point data_cache at an empty result cache file in folder for the duration"""
+    shared = data_cache.shared
+    data_cache.clear()
+    data_cache.shared = SharedResultCache(os.path.join(folder, "result_cache.db"),
+                                          RESULT_CACHE_MB * 1024 * 1024)
+    try:
+        yield data_cache.shared
+    finally:
+        data_cache.clear()
+        data_cache.shared.close()
+        data_cache.shared = shared
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import charts
+from assistant import answer
+from auth import get_auth_service
+from correlation import WINDOW_HOURS, correlation_summary, refresh_correlations, top_correlated_incidents
+from data_cache import data_cache
+from db_manager import DatabaseManager
+from sla import open_ticket_ageing, resolution_percentiles
+from benchmarks.loadgen import (insert_users, make_users, measure_distributions, write_dataset,
+                                write_incidents, write_tickets)
+from benchmarks.scratch import scratch_result_cache
+
+# Platform benchmark suite on synthetic data
+# For each size it generates incidents and tickets shaped like DATA/*.csv,
+# loads them with load_csv_data and times the dashboard queries and the
+# data prep each dashboard page does on a rerun (cold, from the shared
+# result cache and from memory) and verify_user throughput. Results are
+# written as JSON with flat metric names, and --compare reports metrics
+# that got slower between two runs.
+# Run from the project root:
+#   python -m benchmarks.suite --rows 10000 100000 --out results.json
+#   python -m benchmarks.suite --compare baseline.json results.json
+
+# Share of rows appended before timing the incremental load
+APPEND_SHARE = 0.01
+
+# Cache states each query and page is timed in: nothing cached, only the
+# host-wide result cache filled (as for a second app process), and warm
+CACHE_MODES = ("cold", "shared", "warm")
+
+def measure(func, repeat, mode):
+    """Median seconds of func() with the result caches in the given state"""
+    times = []
+    for _ in range(repeat):
+        if mode == "cold":
+            data_cache.clear(shared=True)
+        elif mode == "shared":
+            data_cache.clear()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+def bench_ingest(db, rows, distributions):
+    """Full load, unchanged reload and an incremental load after appending rows"""
+    results = {}
+    start = time.perf_counter()
+    loaded = db.load_csv_data(full_reload=True)
+    results["ingest.full.seconds"] = time.perf_counter() - start
+    for table, stats in loaded.items():
+        results[f"ingest.{table}.rows_per_sec"] = stats["rows_per_sec"]
+
+    start = time.perf_counter()
+    db.load_csv_data()
+    results["ingest.unchanged.seconds"] = time.perf_counter() - start
+
+    appended = max(1, int(rows * APPEND_SHARE))
+    write_incidents(os.path.join("DATA", "cyber_incidents.csv"), appended, distributions,
+                    first_id=1000 + rows, seed=11, append=True)
+    write_tickets(os.path.join("DATA", "it_tickets.csv"), appended, distributions,
+                  first_id=2000 + rows, seed=12, append=True)
+    start = time.perf_counter()
+    db.load_csv_data()
+    results["ingest.append.seconds"] = time.perf_counter() - start
+    return results
+
+def bench_queries(db, repeat):
+    """Each dashboard query on its own, from SQLite and from the cache"""
+    incident_filters = {"severity": ["High", "Critical"], "status": ["Open", "In Progress"]}
+    ticket_filters = {"priority": ["High"], "assigned_to": ["IT_Support_A"]}
+    _, cursor = db.get_incidents_page(limit=50, sort_by="timestamp", descending=True)
+    cases = {
+        "incident_summary": lambda: db.get_incident_summary(),
+        "incident_summary_filtered": lambda: db.get_incident_summary(incident_filters),
+        "incident_counts": lambda: db.get_incident_counts("category", incident_filters),
+        "incident_filter_options": lambda: db.get_incident_filter_options(),
+        "incidents_first_page": lambda: db.get_incidents_page(incident_filters, limit=50),
+        "incidents_next_page": lambda: db.get_incidents_page(limit=50, after=cursor, sort_by="timestamp",
+                                                             descending=True),
+        "incident_search": lambda: db.search_incidents("phishing email", filters=incident_filters),
+        "ticket_summary": lambda: db.get_ticket_summary(),
+        "ticket_summary_filtered": lambda: db.get_ticket_summary(ticket_filters),
+        "staff_performance": lambda: db.get_staff_performance(),
+        "resolution_histogram": lambda: db.get_resolution_histogram(ticket_filters),
+        "resolution_percentiles": lambda: resolution_percentiles(db.conn),
+        "open_ticket_ageing": lambda: open_ticket_ageing(db.conn),
+        "ticket_search": lambda: db.search_tickets("vpn", filters=ticket_filters),
+    }
+    results = {}
+    for name, func in cases.items():
+        for mode in CACHE_MODES:
+            results[f"query.{name}.{mode}_seconds"] = measure(func, repeat, mode)
+    return results
+
+def cybersecurity_page(db):
+    """The data the Cybersecurity dashboard loads on a rerun"""
+    filters = {"severity": [], "status": ["Open"], "category": []}
+    db.get_incident_summary()
+    db.get_incident_filter_options()
+    db.get_incident_summary(filters)
+    charts.counts_bar(db, "cyber_incidents", "category", filters, "Incidents by Category")
+    charts.counts_pie(db, "cyber_incidents", "severity", filters, "Incidents by Severity")
+    charts.trend_line(db, "cyber_incidents", "weekly", "severity", filters, None,
+                      "Incidents by Severity over Time")
+    charts.backlog_area(db, "cyber_incidents", "weekly", filters, "Open Incidents over Time")
+    correlation_summary(db, 24, "severity", filters)
+    top_correlated_incidents(db, 24, filters)
+    db.get_incidents_page(filters, limit=50)
+
+def it_operations_page(db):
+    """The data the IT Operations dashboard loads on a rerun"""
+    filters = {"priority": [], "status": [], "assigned_to": ["IT_Support_B"]}
+    db.get_ticket_summary()
+    db.get_ticket_filter_options()
+    db.get_ticket_summary(filters)
+    charts.counts_bar(db, "it_tickets", "priority", filters, "Tickets by Priority")
+    charts.counts_pie(db, "it_tickets", "status", filters, "Tickets by Status")
+    charts.trend_line(db, "it_tickets", "weekly", "priority", filters, None,
+                      "Tickets by Priority over Time")
+    charts.backlog_area(db, "it_tickets", "weekly", filters, "Open Tickets over Time")
+    db.get_staff_performance(filters)
+    charts.resolution_histogram(db, filters, "Resolution Time Distribution")
+    resolution_percentiles(db.conn, ["IT_Support_B"], None)
+    open_ticket_ageing(db.conn, filters)
+    db.get_tickets_page(filters, limit=50)
+
+def assistant_page(db):
+    """Answers the AI Assistant gives to typical questions"""
+    answer(db, "How many critical phishing incidents are open?")
+    answer(db, "Show high priority tickets mentioning vpn")
+
+def bench_dashboards(db, repeat):
+    """Headless data prep per page, the first render and a cached rerun"""
+    start = time.perf_counter()
+    for window_hours in WINDOW_HOURS:
+        refresh_correlations(db.conn, window_hours)
+    results = {"dashboard.correlation_refresh.seconds": time.perf_counter() - start}
+
+    pages = {
+        "cybersecurity": lambda: cybersecurity_page(db),
+        "it_operations": lambda: it_operations_page(db),
+        "ai_assistant": lambda: assistant_page(db),
+        "data_science": lambda: db.get_dataset_catalog(),
+    }
+    for name, func in pages.items():
+        for mode in CACHE_MODES:
+            results[f"dashboard.{name}.{mode}_seconds"] = measure(func, repeat, mode)
+    return results
+
+def bench_login(db_name, users, threads):
+    """verify_user latency and throughput, one at a time and from concurrent sessions"""
+    def login(user):
+        with DatabaseManager(db_name) as db:
+            start = time.perf_counter()
+            if not db.verify_user(user[0], user[1]):
+                raise RuntimeError(f"Login failed for {user[0]}")
+            return time.perf_counter() - start
+
+    results = {}
+    start = time.perf_counter()
+    latencies = [login(user) for user in users]
+    results["login.sequential.per_sec"] = len(users) / (time.perf_counter() - start)
+    results["login.sequential.p50_ms"] = percentile(latencies, 50) * 1000
+    results["login.sequential.p95_ms"] = percentile(latencies, 95) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(login, users * 2))
+    results["login.concurrent.per_sec"] = len(users) * 2 / (time.perf_counter() - start)
+    results["login.concurrent.p50_ms"] = percentile(latencies, 50) * 1000
+    results["login.concurrent.p95_ms"] = percentile(latencies, 95) * 1000
+
+    with DatabaseManager(db_name) as db:
+        start = time.perf_counter()
+        db.verify_user(users[0][0], "wrong password")
+        results["login.wrong_password.ms"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        db.verify_user("no-such-user", "password")
+        results["login.unknown_user.ms"] = (time.perf_counter() - start) * 1000
+    return results
+
+def run(rows=10_000, users=32, threads=8, repeat=5):
+    """Generate rows incidents and tickets in a scratch folder and return flat metrics"""
+    distributions = measure_distributions()
+    project = os.getcwd()
+    results = {"rows": rows}
+    with tempfile.TemporaryDirectory() as tmp, scratch_result_cache(tmp):
+        # SOURCES and the catalog use paths relative to the project root
+        start = time.perf_counter()
+        write_dataset(os.path.join(tmp, "DATA"), rows, rows, distributions)
+        results["generate.seconds"] = time.perf_counter() - start
+        os.chdir(tmp)
+        try:
+            db_name = os.path.join(tmp, "bench.db")
+            with DatabaseManager(db_name) as db:
+                results.update(bench_ingest(db, rows, distributions))
+                results.update(bench_queries(db, repeat))
+                results.update(bench_dashboards(db, repeat))
+                # Hashed at the service's work factor, so logins never rehash
+                generated = make_users(users, get_auth_service().rounds)
+                insert_users(db.conn, generated)
+            results.update(bench_login(db_name, generated, threads))
+        finally:
+            os.chdir(project)
+    return results
+
+def environment():
+    """Machine and build details stored with the results"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "bcrypt_rounds": get_auth_service().rounds,
+    }
+
+def higher_is_better(metric):
+    """Throughput metrics improve upwards, timings downwards"""
+    return metric.endswith("per_sec")
+
+def compare(baseline, current, threshold=0.2):
+    """Print metrics that changed between two result files; returns the regressions"""
+    regressions = []
+    for rows, metrics in current["runs"].items():
+        old_metrics = baseline["runs"].get(rows)
+        if old_metrics is None:
+            print(f"{rows} rows: not in the baseline")
+            continue
+        print(f"{int(rows):,} rows")
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if metric == "rows" or not old or value is None:
+                continue
+            change = value / old - 1
+            worse = -change if higher_is_better(metric) else change
+            flag = "REGRESSION" if worse > threshold else ("faster" if worse < -threshold else "")
+            print(f"  {metric:>44}: {old:12.4f} -> {value:12.4f}  {change:+7.1%}  {flag}")
+            if flag == "REGRESSION":
+                regressions.append((rows, metric, old, value))
+    print(f"{len(regressions)} metrics regressed by more than {threshold:.0%}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the platform on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000],
+                        help="incidents and tickets per run, e.g. 10000 100000 1000000")
+    parser.add_argument("--users", type=int, default=32, help="users created for the login benchmark")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent login sessions")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per query (median kept)")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two results files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        return 1 if compare(baseline, current, args.threshold) else 0
+
+    report = {"environment": environment(), "runs": {}}
+    for rows in args.rows:
+        print(f"Benchmarking {rows:,} incidents and {rows:,} tickets")
+        metrics = run(rows, args.users, args.threads, args.repeat)
+        for metric, value in metrics.items():
+            print(f"  {metric:>44}: {value:12.4f}")
+        report["runs"][str(rows)] = metrics
+        # Written after every size, so a long run keeps its finished sizes
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import csv
+import json
+import os
+import time
+
+import pandas as pd
+
+from ingest import get_ingest_state, parse_epoch, tail_fingerprint
+from instrumentation import timed
+
+# Dataset catalog for the data science dashboard
+# Datasets are registered from DATA/datasets_metadata.csv, which is only
+# reread when its size or mtime differs from the ingest_state row of the
+# last sync. Profiles (size,
+# row count, null and duplicate rates, quality score) are computed lazily,
+# one dataset at a time: rows are counted by streaming the file and column
+# statistics come from a bounded row sample, so no dataset is fully loaded.
+# A profile is stored with the file's size, mtime and tail fingerprint and
+# reused until the file changes; an appended file only has its new bytes
+# counted. Datasets whose file is not in DATA get a size estimate from the
+# metadata instead.
+
+METADATA_PATH = os.path.join("DATA", "datasets_metadata.csv")
+
+# Rows parsed per dataset for the column statistics
+SAMPLE_ROWS = 50000
+
+# Rough bytes per CSV cell, for datasets whose file is missing
+ESTIMATED_CELL_BYTES = 8
+
+# Recommendation thresholds
+COMPRESS_BYTES = 50 * 1024 * 1024
+LOW_QUALITY_SCORE = 80
+HIGH_NULL_RATE = 0.05
+HIGH_DUPLICATE_RATE = 0.01
+ARCHIVE_AFTER_DAYS = 365
+
+def dataset_path(name):
+    """Get the CSV file a dataset is expected at"""
+    return os.path.join("DATA", f"{name}.csv")
+
+def sync_catalog(conn, path=METADATA_PATH, force=False):
+    """Register the datasets listed in the metadata CSV, dropping removed ones
+
+    Returns the number of datasets, or None if the file is unchanged since
+    the last sync.
+    """
+    stat = os.stat(path)
+    state = get_ingest_state(conn, "datasets")
+    if (not force and state and state["path"] == path and state["file_size"] == stat.st_size
+            and state["file_mtime"] == stat.st_mtime):
+        return None
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = [
+            (int(row["dataset_id"]), row["name"], int(row["rows"]), int(row["columns"]),
+             row["uploaded_by"], parse_epoch(row["upload_date"]), dataset_path(row["name"]))
+            for row in csv.DictReader(f)
+        ]
+    ids = [row[0] for row in rows]
+    with conn:
+        conn.executemany('''
+            INSERT INTO datasets (dataset_id, name, rows, columns, uploaded_by, upload_date, path)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(dataset_id) DO UPDATE SET
+                name = excluded.name, rows = excluded.rows, columns = excluded.columns,
+                uploaded_by = excluded.uploaded_by, upload_date = excluded.upload_date,
+                path = excluded.path
+        ''', rows)
+        placeholders = ", ".join("?" for _ in ids) or "NULL"
+        conn.execute(f"DELETE FROM datasets WHERE dataset_id NOT IN ({placeholders})", ids)
+        conn.execute("DELETE FROM dataset_profiles WHERE dataset_id NOT IN "
+                     "(SELECT dataset_id FROM datasets)")
+        conn.execute('''
+            INSERT OR REPLACE INTO ingest_state
+                (source, path, file_size, file_mtime, byte_offset, rows_loaded, updated_at)
+            VALUES ('datasets', ?, ?, ?, ?, ?, strftime('%s', 'now'))
+        ''', (path, stat.st_size, stat.st_mtime, stat.st_size, len(rows)))
+    return len(rows)
+
+def count_lines(f, start=0, chunk_size=1024 * 1024):
+    """Count newlines from a byte offset to the end, reading in chunks"""
+    f.seek(start)
+    lines = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return lines
+        lines += chunk.count(b"\n")
+
+def profile_sample(path, sample_rows=SAMPLE_ROWS):
+    """Null rate, duplicate rate and per-column stats from the first rows"""
+    sample = pd.read_csv(path, nrows=sample_rows, low_memory=False)
+    if sample.empty:
+        return {"column_count": len(sample.columns), "sample_rows": 0, "null_rate": 0.0,
+                "duplicate_rate": 0.0, "column_stats": {}}
+    nulls = sample.isna().mean()
+    return {
+        "column_count": len(sample.columns),
+        "sample_rows": len(sample),
+        "null_rate": float(nulls.mean()),
+        "duplicate_rate": float(sample.duplicated().mean()),
+        "column_stats": {
+            column: {
+                "dtype": str(sample[column].dtype),
+                "null_rate": round(float(nulls[column]), 4),
+                "distinct": int(sample[column].nunique()),
+            }
+            for column in sample.columns
+        },
+    }
+
+def quality_score(null_rate, duplicate_rate):
+    """Score 0-100 from the share of cells filled and rows unique"""
+    return round(100 * (1 - null_rate) * (1 - duplicate_rate), 1)
+
+def _stored_profile(conn, dataset_id):
+    """Get the stored profile row of a dataset as a dict (None if missing)"""
+    cursor = conn.execute("SELECT * FROM dataset_profiles WHERE dataset_id = ?", (dataset_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([column[0] for column in cursor.description], row))
+
+def _save_profile(conn, dataset_id, profile):
+    """Insert or replace a dataset's profile"""
+    profile = dict(profile, dataset_id=dataset_id, profiled_at=int(time.time()))
+    if isinstance(profile.get("column_stats"), dict):
+        profile["column_stats"] = json.dumps(profile["column_stats"])
+    columns = list(profile)
+    with conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO dataset_profiles ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            [profile[column] for column in columns]
+        )
+    return profile
+
+def profile_dataset(conn, dataset_id, force=False, sample_rows=SAMPLE_ROWS):
+    """Profile one dataset unless its stored profile is still current"""
+    rows, columns, path = conn.execute(
+        "SELECT rows, columns, path FROM datasets WHERE dataset_id = ?", (dataset_id,)
+    ).fetchone()
+    stored = None if force else _stored_profile(conn, dataset_id)
+
+    if not os.path.exists(path):
+        if (stored is not None and stored["estimated"]
+                and (stored["row_count"], stored["column_count"]) == (rows, columns)):
+            return stored
+        return _save_profile(conn, dataset_id, {
+            "file_mtime": None, "fingerprint": None, "row_count": rows,
+            "column_count": columns, "sample_rows": 0, "null_rate": None,
+            "duplicate_rate": None, "quality_score": None, "column_stats": None, "estimated": 1,
+            # Size the file would have as a CSV, for the size totals
+            "file_size": (rows or 0) * (columns or 0) * ESTIMATED_CELL_BYTES,
+        })
+
+    stat = os.stat(path)
+    if (stored is not None and not stored["estimated"]
+            and stored["file_size"] == stat.st_size and stored["file_mtime"] == stat.st_mtime):
+        return stored
+
+    with open(path, "rb") as f:
+        # Appended file: keep the sample stats and count only the new lines
+        if (stored is not None and not stored["estimated"] and stored["fingerprint"]
+                and stat.st_size > stored["file_size"]
+                and tail_fingerprint(f, stored["file_size"]) == stored["fingerprint"]):
+            new_lines = count_lines(f, stored["file_size"])
+            return _save_profile(conn, dataset_id, dict(
+                stored, file_size=stat.st_size, file_mtime=stat.st_mtime,
+                fingerprint=tail_fingerprint(f, stat.st_size),
+                row_count=stored["row_count"] + new_lines
+            ))
+
+        # Header line excluded; a last line without a newline still counts
+        lines = count_lines(f)
+        f.seek(max(0, stat.st_size - 1))
+        if stat.st_size and f.read(1) != b"\n":
+            lines += 1
+        fingerprint = tail_fingerprint(f, stat.st_size)
+
+    sample = profile_sample(path, sample_rows)
+    return _save_profile(conn, dataset_id, dict(
+        sample,
+        file_size=stat.st_size, file_mtime=stat.st_mtime, fingerprint=fingerprint,
+        row_count=max(0, lines - 1),
+        quality_score=quality_score(sample["null_rate"], sample["duplicate_rate"]),
+        estimated=0
+    ))
+
+@timed("catalog.refresh_profiles")
+def refresh_profiles(conn, force=False):
+    """Profile every dataset whose profile is missing or out of date"""
+    ids = [row[0] for row in conn.execute("SELECT dataset_id FROM datasets ORDER BY dataset_id")]
+    for dataset_id in ids:
+        profile_dataset(conn, dataset_id, force)
+    return len(ids)
+
+def load_catalog(conn):
+    """Get every dataset with its profile"""
+    df = pd.read_sql('''
+        SELECT d.dataset_id, d.name, d.uploaded_by, d.upload_date, d.path,
+               IFNULL(p.row_count, d.rows) AS rows,
+               IFNULL(p.column_count, d.columns) AS columns,
+               p.file_size AS size_bytes, p.null_rate, p.duplicate_rate, p.quality_score,
+               p.sample_rows, IFNULL(p.estimated, 1) AS estimated, p.profiled_at
+        FROM datasets d LEFT JOIN dataset_profiles p ON p.dataset_id = d.dataset_id
+        ORDER BY d.dataset_id
+    ''', conn)
+    df["upload_date"] = pd.to_datetime(df["upload_date"], unit="s")
+    df["profiled_at"] = pd.to_datetime(df["profiled_at"], unit="s")
+    df["estimated"] = df["estimated"].astype(bool)
+    return df
+
+def recommendations(catalog, now=None):
+    """Derive compress/clean-up/archive suggestions from the profiles, most urgent first"""
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+    compress, review, clean, archive, missing = [], [], [], [], []
+    for row in catalog.itertuples(index=False):
+        size = f"{'~' if row.estimated else ''}{(row.size_bytes or 0) / (1024 * 1024):.1f} MB"
+        if row.size_bytes and row.size_bytes >= COMPRESS_BYTES:
+            compress.append(f"Compress {row.name} ({size}, {row.rows:,} rows): "
+                            f"store it as Parquet or gzip the CSV")
+        if pd.notna(row.quality_score) and row.quality_score < LOW_QUALITY_SCORE:
+            review.append(f"Review {row.name} (quality score {row.quality_score:.0f}%)")
+        if pd.notna(row.null_rate) and row.null_rate >= HIGH_NULL_RATE:
+            clean.append(f"Fill or drop missing values in {row.name} "
+                         f"({row.null_rate:.0%} of sampled cells empty)")
+        if pd.notna(row.duplicate_rate) and row.duplicate_rate >= HIGH_DUPLICATE_RATE:
+            clean.append(f"Deduplicate {row.name} "
+                         f"({row.duplicate_rate:.1%} of sampled rows repeated)")
+        age_days = (now - row.upload_date).days if pd.notna(row.upload_date) else 0
+        if age_days >= ARCHIVE_AFTER_DAYS:
+            archive.append((row.name, age_days, size))
+        if row.estimated:
+            missing.append(row.name)
+
+    suggestions = compress + review + clean
+    if archive:
+        suggestions.append(
+            f"Archive datasets uploaded over {ARCHIVE_AFTER_DAYS} days ago: "
+            + ", ".join(f"{name} ({days} days, {size})" for name, days, size in archive)
+        )
+    if missing:
+        suggestions.append(f"Add the files of {', '.join(missing)} to DATA "
+                           f"(as <name>.csv) to profile them")
+    return suggestions
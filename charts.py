@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from data_cache import data_cache, get_table_version, freeze
+from instrumentation import span
+from timeseries import backlog_over_time, counts_over_time
+
+# Chart data layer for the dashboards
+# Every figure is built from a fixed-size aggregate (group counts, SQL
+# histogram bins, timelines downsampled with LTTB), so its payload does not
+# grow with the number of rows. Built figures are cached per (chart,
+# arguments, table version) and reused across reruns and sessions until
+# the table changes. The cache holds each figure as a dict, and every
+# caller gets a figure of its own built from it.
+
+# Points kept per timeline
+MAX_POINTS = 500
+
+# Bins per histogram
+HISTOGRAM_BINS = 30
+
+def lttb(x, y, threshold):
+    """Pick threshold indices of a series with Largest-Triangle-Three-Buckets
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previous pick and the next
+    bucket's average, so peaks and dips survive downsampling.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        indices.append(previous)
+    indices.append(n - 1)
+    return np.array(indices)
+
+def downsample(frame, max_points=MAX_POINTS):
+    """Keep at most max_points rows of a time-indexed frame
+
+    Rows are picked with LTTB on the row total, so every column keeps the
+    same timestamps.
+    """
+    if len(frame) <= max_points:
+        return frame
+    x = frame.index.to_numpy().astype("datetime64[ns]").astype(np.int64)
+    y = frame.sum(axis=1).to_numpy()
+    return frame.iloc[lttb(x, y, max_points)]
+
+def figure_from(spec):
+    """Build a figure from a cached figure dict (None stays None)"""
+    if spec is None:
+        return None
+    # The dict came from a valid figure, so it is not validated again
+    return go.Figure(spec, _validate=False)
+
+def cached_figure(db, table, chart, args, build):
+    """Get a figure from the cache, building it on a miss or after the table changed"""
+    def timed_build():
+        with span(f"chart.{chart}.build"):
+            fig = build()
+            return None if fig is None else fig.to_dict()
+
+    with span(f"chart.{chart}"):
+        version = get_table_version(db.conn, table)
+        return data_cache.get_or_load(db.pool.cache_source, table, version, ("figure", chart, freeze(args)),
+                                      timed_build, copy=figure_from)
+
+def counts_bar(db, table, column, filters, title):
+    """Bar chart of row counts per value of a column"""
+    def build():
+        get_counts = db.get_incident_counts if table == "cyber_incidents" else db.get_ticket_counts
+        return px.bar(get_counts(column, filters), x=column, y='count', title=title)
+    return cached_figure(db, table, "counts_bar", (column, filters, title), build)
+
+def counts_pie(db, table, column, filters, title):
+    """Pie chart of row counts per value of a column"""
+    def build():
+        get_counts = db.get_incident_counts if table == "cyber_incidents" else db.get_ticket_counts
+        return px.pie(get_counts(column, filters), values='count', names=column, title=title)
+    return cached_figure(db, table, "counts_pie", (column, filters, title), build)
+
+def trend_line(db, table, frequency, group_by, filters, rolling_window, title):
+    """Line chart of counts per period (None when there is no data)"""
+    def build():
+        trend = counts_over_time(db, table, frequency, group_by, filters, rolling_window)
+        if trend.empty:
+            return None
+        return px.line(downsample(trend), title=title)
+    return cached_figure(db, table, "trend_line",
+                         (frequency, group_by, filters, rolling_window, title), build)
+
+def backlog_area(db, table, frequency, filters, title):
+    """Area chart of open rows at each period boundary (None when there is no data)"""
+    def build():
+        backlog = backlog_over_time(db, table, frequency, filters)
+        if backlog.empty:
+            return None
+        return px.area(downsample(backlog), y='open', title=title)
+    return cached_figure(db, table, "backlog_area", (frequency, filters, title), build)
+
+def resolution_histogram(db, filters, title, bins=HISTOGRAM_BINS):
+    """Histogram of ticket resolution times from SQL-side bins (None when empty)"""
+    def build():
+        binned = db.get_resolution_histogram(filters, bins)
+        if binned.empty:
+            return None
+        binned = pd.DataFrame({
+            "hours": (binned["bin_start"] + binned["bin_end"]) / 2,
+            "count": binned["count"],
+            "width": binned["bin_end"] - binned["bin_start"],
+        })
+        fig = px.bar(binned, x="hours", y="count", title=title)
+        fig.update_traces(width=binned["width"].to_numpy())
+        return fig
+    return cached_figure(db, "it_tickets", "resolution_histogram", (filters, title, bins), build)
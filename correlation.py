@@ -0,0 +1,149 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_cache import data_cache, get_table_version, freeze
+from instrumentation import timed
+
+# Cross-domain correlation between security incidents and IT tickets
+# For every incident, count the tickets raised in the window hours before
+# and after it and find the first ticket after it. Both tables are read in
+# timestamp order from their time indexes and joined with binary searches
+# and merge_asof, so the cost is O((n + m) log m) rather than n x m.
+# Results are stored per window in incident_ticket_windows together with
+# the table versions they came from, and recomputed only after either
+# table changes, by the background worker or the setup script. Dashboards
+# only read the stored results.
+
+# Windows offered on the dashboard and refreshed by the background worker
+WINDOW_HOURS = (4, 24, 72)
+
+def window_counts(incident_times, ticket_times, before, after):
+    """Count tickets in [t - before, t) and [t, t + after] around each incident time
+
+    ticket_times must be sorted; incident_times can be in any order.
+    """
+    low = np.searchsorted(ticket_times, incident_times - before, "left")
+    middle = np.searchsorted(ticket_times, incident_times, "left")
+    high = np.searchsorted(ticket_times, incident_times + after, "right")
+    return middle - low, high - middle
+
+def nearest_after(incidents, tickets, within):
+    """Match each incident to the first ticket at or after it, within seconds
+
+    Both frames must be sorted by time.
+    """
+    matched = pd.merge_asof(
+        incidents, tickets, left_on="timestamp", right_on="created_at",
+        direction="forward", tolerance=within
+    )
+    return matched["ticket_id"], (matched["created_at"] - matched["timestamp"]) / 60
+
+def is_current(conn, window_hours):
+    """Check whether stored results match the current table versions"""
+    row = conn.execute(
+        "SELECT incidents_version, tickets_version FROM correlation_runs WHERE window_hours = ?",
+        (window_hours,)
+    ).fetchone()
+    return row == (get_table_version(conn, "cyber_incidents"), get_table_version(conn, "it_tickets"))
+
+def stored_run(conn, window_hours):
+    """Get (incidents version, tickets version, tickets per hour, computed at) of a window's results
+
+    None if the window has not been computed yet.
+    """
+    return conn.execute(
+        "SELECT incidents_version, tickets_version, tickets_per_hour, computed_at "
+        "FROM correlation_runs WHERE window_hours = ?", (window_hours,)
+    ).fetchone()
+
+@timed("aggregate.refresh_correlations")
+def refresh_correlations(conn, window_hours, force=False):
+    """Recompute one window's results if either table changed; returns True if it ran"""
+    if not force and is_current(conn, window_hours):
+        return False
+    start = time.perf_counter()
+    versions = (get_table_version(conn, "cyber_incidents"), get_table_version(conn, "it_tickets"))
+
+    # Ordered by the indexed time columns, so SQLite returns them pre-sorted
+    incidents = pd.read_sql(
+        "SELECT incident_id, timestamp FROM cyber_incidents "
+        "WHERE timestamp IS NOT NULL ORDER BY timestamp", conn
+    )
+    tickets = pd.read_sql(
+        "SELECT ticket_id, created_at FROM it_tickets "
+        "WHERE created_at IS NOT NULL ORDER BY created_at", conn
+    )
+    window = int(window_hours) * 3600
+    incident_times = incidents["timestamp"].to_numpy(dtype=np.int64)
+    ticket_times = tickets["created_at"].to_numpy(dtype=np.int64)
+    before, after = window_counts(incident_times, ticket_times, window, window)
+    nearest_id, nearest_minutes = nearest_after(incidents, tickets, window)
+
+    # Baseline: tickets per hour over the whole ticket history
+    span_hours = (ticket_times[-1] - ticket_times[0]) / 3600 if len(ticket_times) > 1 else 0
+    tickets_per_hour = len(ticket_times) / span_hours if span_hours else 0.0
+
+    rows = zip(
+        [int(window_hours)] * len(incidents),
+        incidents["incident_id"].tolist(),
+        before.tolist(),
+        after.tolist(),
+        [None if pd.isna(value) else int(value) for value in nearest_id],
+        [None if pd.isna(value) else float(value) for value in nearest_minutes]
+    )
+    with conn:
+        conn.execute("DELETE FROM incident_ticket_windows WHERE window_hours = ?", (window_hours,))
+        conn.executemany(
+            "INSERT INTO incident_ticket_windows (window_hours, incident_id, tickets_before, "
+            "tickets_after, nearest_ticket_id, nearest_minutes) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.execute('''
+            INSERT OR REPLACE INTO correlation_runs
+                (window_hours, incidents_version, tickets_version, tickets_per_hour, seconds, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (window_hours, versions[0], versions[1], tickets_per_hour,
+              time.perf_counter() - start, int(time.time())))
+    return True
+
+def _cached(db, run, key, loader):
+    """Cache a result until either table changes or the window is recomputed"""
+    tickets_version = get_table_version(db.conn, "it_tickets")
+    incidents_version = get_table_version(db.conn, "cyber_incidents")
+    return data_cache.get_or_load(db.pool.cache_source, "cyber_incidents", incidents_version,
+                                  ("correlation", tickets_version, tuple(run)) + key, loader)
+
+@timed("aggregate.correlation_summary")
+def correlation_summary(db, window_hours, group_by="severity", filters=None):
+    """Average tickets before/after incidents per group, with lift over the baseline
+
+    lift is tickets after an incident divided by the tickets expected in
+    any window of the same length. Returns None if the window has not been
+    computed yet.
+    """
+    run = stored_run(db.conn, window_hours)
+    if run is None:
+        return None
+
+    def load():
+        summary = db.get_correlation_summary(window_hours, group_by, filters)
+        expected = run[2] * window_hours
+        summary["expected"] = expected
+        summary["lift"] = summary["avg_after"] / expected if expected else np.nan
+        return summary
+
+    return _cached(db, run, ("summary", window_hours, group_by, freeze(filters)), load)
+
+@timed("aggregate.top_correlated_incidents")
+def top_correlated_incidents(db, window_hours, filters=None, limit=10):
+    """Incidents followed by the most tickets within the window (None if not computed yet)"""
+    run = stored_run(db.conn, window_hours)
+    if run is None:
+        return None
+
+    def load():
+        return db.get_correlated_incidents(window_hours, filters, limit)
+
+    return _cached(db, run, ("top", window_hours, freeze(filters), limit), load)
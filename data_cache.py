@@ -0,0 +1,196 @@
+import functools
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+from result_cache import get_shared_cache
+
+# Process-wide cache of query results keyed on the version of their table
+# table_versions holds a change counter per table that triggers bump on
+# every write, so a cached result is reused until its own table changes.
+# Results are shared between sessions, so callers get their own copy:
+# DataFrames a shallow one on pandas 3 (copy-on-write keeps their changes
+# away from the cache) and a deep one on older pandas, dicts and lists
+# read-only wrappers, and loaders with a copy function (such as figures)
+# a fresh object built from what is stored. A miss
+# checks the host-wide result_cache file before running the query, so
+# other app processes reuse what one process computed.
+
+# Shallow copies only share data safely where copy-on-write is always on
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+def get_table_version(conn, table):
+    """Get the change counter of a table"""
+    row = conn.execute(
+        "SELECT version FROM table_versions WHERE table_name = ?",
+        (table,)
+    ).fetchone()
+    return row[0] if row else 0
+
+def freeze(value):
+    """Turn filters and arguments into a hashable cache key"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def _read_only(value):
+    """Wrap a result so sessions sharing it cannot change it by accident"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _read_only(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+def _for_caller(value):
+    """Give a caller its own copy of a read-only result where it could change it"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        # No data is copied until one side writes
+        return value.copy(deep=not _COPY_ON_WRITE)
+    if isinstance(value, MappingProxyType):
+        return MappingProxyType({key: _for_caller(item) for key, item in value.items()})
+    if isinstance(value, tuple) and any(isinstance(item, (pd.DataFrame, pd.Series)) for item in value):
+        return tuple(_for_caller(item) for item in value)
+    return value
+
+def _size_of(value):
+    """Estimate the memory used by a cached result in bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return 64 + value.nbytes
+    if isinstance(value, (str, bytes)):
+        return 64 + len(value)
+    if isinstance(value, (dict, MappingProxyType)):
+        return 64 + sum(_size_of(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(_size_of(item) for item in value)
+    return 64
+
+class DataCache:
+    """Size-bounded LRU cache of query results keyed on table versions"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_entries=1024, shared=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.shared_hits = 0
+
+    def _drop(self, key):
+        """Remove one entry (lock held)"""
+        value, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _invalidate_table(self, source, table, version):
+        """Drop a table's entries once its version has moved on (lock held)"""
+        if self._versions.get((source, table)) == version:
+            return
+        self._versions[(source, table)] = version
+        stale = [key for key in self._entries
+                 if key[0] == source and key[1] == table and key[2] != version]
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+
+    def get_or_load(self, source, table, version, key, loader, copy=None):
+        """Get a cached result, running loader() on a miss
+
+        With copy, loader's result is stored as it is and every caller gets
+        copy(stored) instead.
+        """
+        cache_key = (source, table, version, key)
+        give = copy or _for_caller
+        with self._lock:
+            self._invalidate_table(source, table, version)
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                value = self._entries[cache_key][0]
+                found = True
+            else:
+                self.misses += 1
+                found = False
+        if found:
+            return give(value)
+
+        # In-memory databases are private to this process, so they skip the shared tier
+        shared = self.shared if not str(source).startswith("memory:") else None
+        found = False
+        if shared is not None:
+            with span("cache.shared_get"):
+                found, value = shared.get(source, table, version, key)
+        if found:
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            value = loader()
+            if shared is not None:
+                with span("cache.shared_put"):
+                    shared.put(source, table, version, key, value)
+        if copy is None:
+            value = _read_only(value)
+        size = _size_of(value)
+        with self._lock:
+            # Another session may have loaded the same result meanwhile
+            if cache_key in self._entries:
+                value = self._entries[cache_key][0]
+            elif size <= self.max_bytes:
+                self._entries[cache_key] = (value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        return give(value)
+
+    def clear(self, shared=False):
+        """Drop every entry, and the host-wide results too if shared"""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+        if shared and self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        """Get cache size and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "shared_hits": self.shared_hits,
+            }
+
+data_cache = DataCache(shared=get_shared_cache())
+
+def cached_query(table):
+    """Cache a DatabaseManager query method until its table changes"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with span(f"db.{method.__name__}"):
+                version = get_table_version(self.conn, table)
+                key = (method.__name__, freeze(args), freeze(kwargs))
+                return data_cache.get_or_load(
+                    self.pool.cache_source, table, version, key,
+                    lambda: method(self, *args, **kwargs)
+                )
+        return wrapper
+    return decorator
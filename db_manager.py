@@ -1,100 +1,227 @@
+import numbers
+import os
+import queue
 import sqlite3
+import threading
+import time
 import pandas as pd
-import bcrypt
+from auth import get_auth_service
+from data_cache import cached_query
+from sessions import ROLE_PERMISSIONS, invalidate_user
+from migrations import migrate, rebuild_rollups
+from ingest import ingest_csv, reset_ingest_state
+from search import search
+from catalog import load_catalog, refresh_profiles, sync_catalog
+from sla import update_sketches
+from instrumentation import TimedConnection, timed
+from provisioning import print_report, provision_users
+from ratelimit import get_login_limiter
+
+# Columns the dashboards are allowed to filter and group on
+INCIDENT_FILTER_COLUMNS = ("severity", "category", "status")
+TICKET_FILTER_COLUMNS = ("priority", "status", "assigned_to")
+
+# AI Assistant chat retention per user (older messages are deleted)
+CHAT_HISTORY_LIMIT = 200
+CHAT_RETENTION_DAYS = 30
+
+def to_epoch(value):
+    """Convert a date string, datetime or epoch number to epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, numbers.Real):
+        return int(value)
+    return int(pd.Timestamp(value).timestamp())
+
+class ConnectionPool:
+    """Process-wide pool of SQLite connections to one database file"""
+    
+    # Applied to every new connection
+    PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -20000,  # negative means KiB, so about 20 MB
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    }
+    
+    def __init__(self, db_name, max_connections=32, timeout=30):
+        self.db_name = db_name
+        # An in-memory database only exists inside a single connection
+        self.max_connections = 1 if db_name == ":memory:" else max_connections
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._checked_out = 0
+        self._acquisitions = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        
+        # Schema creation runs once per process, not once per page load
+        conn = self._connect()
+        self._created = 1
+        migrate(conn)
+        
+        # Names this database in the result caches (in-memory ones stay per process)
+        if db_name == ":memory:":
+            self.cache_source = f"memory:{id(self)}"
+        else:
+            instance_id = conn.execute(
+                "SELECT value FROM database_info WHERE name = 'instance_id'"
+            ).fetchone()[0]
+            self.cache_source = f"{os.path.abspath(db_name)}#{instance_id}"
+        self._idle.put(conn)
+    
+    def _connect(self):
+        """Open a new connection with the tuned pragmas"""
+        # Statements are timed and slow ones logged with their query plan
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, timeout=self.timeout,
+                               factory=TimedConnection)
+        for pragma, value in self.PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+    
+    def acquire(self):
+        """Check out a connection, waiting if the pool is exhausted"""
+        start = time.perf_counter()
+        waited = False
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.max_connections
+                if can_create:
+                    # Reserve the slot before connecting outside the lock
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"No database connection free after {self.timeout}s"
+                    ) from None
+        
+        wait_time = time.perf_counter() - start
+        with self._lock:
+            self._checked_out += 1
+            self._acquisitions += 1
+            if waited:
+                self._waits += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+        return conn
+    
+    def release(self, conn):
+        """Return a connection to the pool"""
+        # Never hand the next user a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._checked_out -= 1
+        self._idle.put(conn)
+    
+    def stats(self):
+        """Get pool usage counters"""
+        with self._lock:
+            return {
+                "connections": self._created,
+                "checked_out": self._checked_out,
+                "idle": self._idle.qsize(),
+                "max_connections": self.max_connections,
+                "acquisitions": self._acquisitions,
+                "waits": self._waits,
+                "total_wait_seconds": self._total_wait,
+                "max_wait_seconds": self._max_wait,
+            }
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_name="multi_domain.db"):
+    """Get the shared connection pool for a database file"""
+    key = db_name if db_name == ":memory:" else os.path.abspath(db_name)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_name)
+        return _pools[key]
 
 class DatabaseManager:
     def __init__(self, db_name="multi_domain.db"):
-        self.conn = sqlite3.connect(db_name)
+        # Connections come from the process-wide pool and go back on close()
+        self.pool = get_pool(db_name)
+        self.conn = self.pool.acquire()
         self.cursor = self.conn.cursor()
-        self.create_tables()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def __del__(self):
+        # Pages that never call close() still return their connection
+        self.close()
     
     def create_tables(self):
-        """Create tables for users and domains"""
-        # Users table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL
-            )
-        ''')
-        
-        # Cybersecurity incidents table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cyber_incidents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                incident_id TEXT,
-                date TEXT,
-                severity TEXT,
-                category TEXT,
-                status TEXT,
-                resolution_time_hours INTEGER
-            )
-        ''')
-        
-        # IT Tickets table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS it_tickets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticket_id TEXT,
-                created_date TEXT,
-                priority TEXT,
-                status TEXT,
-                assigned_to TEXT,
-                category TEXT,
-                resolution_time_hours INTEGER
-            )
-        ''')
-        
-        self.conn.commit()
+        """Create or upgrade tables through the versioned migrations"""
+        migrate(self.conn)
     
     def migrate_users(self):
-        """Migrate users from text file to database"""
+        """Migrate users from the legacy users.txt (username,password_hash,role)"""
         try:
-            with open('users.txt', 'r') as f:
-                lines = f.readlines()
-            
-            for line in lines:
-                if line.strip():
-                    parts = line.strip().split(',')
-                    if len(parts) >= 3:
-                        username, password_hash, role = parts[:3]
-                        try:
-                            self.cursor.execute(
-                                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                                (username, password_hash, role)
-                            )
-                        except:
-                            pass  # User already exists
-            
-            self.conn.commit()
-            print("Users migrated to database")
-        except:
+            report = self.provision_users("users.txt", columns=["username", "password_hash", "role"])
+        except FileNotFoundError:
             print("No users.txt file found")
+            return None
+        print_report(report)
+        print("Users migrated to database")
+        return report
     
-    def load_csv_data(self):
-        """Load CSV data into database"""
-        # Load cybersecurity data
-        try:
-            cyber_df = pd.read_csv('DATA/cyber_incidents.csv')
-            cyber_df.to_sql('cyber_incidents', self.conn, if_exists='replace', index=False)
-            print(f"Loaded {len(cyber_df)} cyber incidents")
-        except:
-            print("Could not load cyber_incidents.csv")
+    def provision_users(self, source, on_conflict="skip", columns=None, workers=None, batch_size=500):
+        """Bulk import users from a CSV/JSONL file or records (see provisioning.py)"""
+        return provision_users(self.conn, source, on_conflict, columns=columns, workers=workers,
+                               batch_size=batch_size)
+    
+    @timed("ingest.load_csv_data")
+    def load_csv_data(self, full_reload=False, batch_size=10000):
+        """Stream new CSV rows into the database"""
+        # Only rows appended since the last load are read unless full_reload
+        if full_reload:
+            reset_ingest_state(self.conn)
         
-        # Load IT tickets data
-        try:
-            it_df = pd.read_csv('DATA/it_tickets.csv')
-            it_df.to_sql('it_tickets', self.conn, if_exists='replace', index=False)
-            print(f"Loaded {len(it_df)} IT tickets")
-        except:
-            print("Could not load it_tickets.csv")
+        results = {}
+        for table, label in [("cyber_incidents", "cyber incidents"), ("it_tickets", "IT tickets")]:
+            try:
+                stats = ingest_csv(self.conn, table, batch_size=batch_size)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"Could not load {table}.csv: {e}")
+                continue
+            
+            results[table] = stats
+            if stats["skipped"]:
+                print(f"No new {label} to load")
+            else:
+                print(f"Loaded {stats['rows']} {label} "
+                      f"({stats['rows_per_sec']:.0f} rows/sec, {stats['rejected']} rejected)")
+        
+        # Fold newly resolved tickets into the resolution-time sketches
+        update_sketches(self.conn)
+        return results
     
     def register_user(self, username, password, role="user"):
         """Register a new user with bcrypt hashing"""
-        salt = bcrypt.gensalt()
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
+        password_hash = get_auth_service().hash_password(password)
         
         try:
             self.cursor.execute(
@@ -102,10 +229,24 @@ class DatabaseManager:
                 (username, password_hash.decode('utf-8'), role)
             )
             self.conn.commit()
+            invalidate_user(username)
             return True
-        except:
+        except sqlite3.IntegrityError:
             return False
     
+    def set_user_role(self, username, role):
+        """Change a user's role"""
+        if role not in ROLE_PERMISSIONS:
+            raise ValueError(f"Unknown role: {role}")
+        self.cursor.execute(
+            "UPDATE users SET role = ? WHERE username = ?",
+            (role, username)
+        )
+        self.conn.commit()
+        invalidate_user(username)
+        return self.cursor.rowcount > 0
+    
+    @timed("auth.verify_user")
     def verify_user(self, username, password):
         """Verify user login credentials"""
         self.cursor.execute(
@@ -114,10 +255,39 @@ class DatabaseManager:
         )
         result = self.cursor.fetchone()
         
-        if result:
-            stored_hash = result[0].encode('utf-8')
-            return bcrypt.checkpw(password.encode('utf-8'), stored_hash)
-        return False
+        auth_service = get_auth_service()
+        if not result:
+            # Same bcrypt cost as a real user, so unknown usernames are not faster
+            auth_service.verify_password(password, auth_service.dummy_hash())
+            return False
+        
+        stored_hash = result[0]
+        if not auth_service.verify_password(password, stored_hash):
+            return False
+        
+        # Upgrade the hash if the work factor has changed
+        if auth_service.needs_rehash(stored_hash):
+            new_hash = auth_service.hash_password(password)
+            self.cursor.execute(
+                "UPDATE users SET password_hash = ? WHERE username = ?",
+                (new_hash.decode('utf-8'), username)
+            )
+            self.conn.commit()
+        return True
+    
+    @timed("auth.login")
+    def login(self, username, password, client=None):
+        """Verify a login attempt behind the per-user and per-client rate limits
+
+        Raises LoginThrottledError before any bcrypt work once the username
+        or client is out of attempts.
+        """
+        limiter = get_login_limiter()
+        limiter.attempt(self.conn, username, client)
+        if not self.verify_user(username, password):
+            return False
+        limiter.succeeded(self.conn, username)
+        return True
     
     def get_user_role(self, username):
         """Get user's role"""
@@ -128,6 +298,12 @@ class DatabaseManager:
         result = self.cursor.fetchone()
         return result[0] if result else None
     
+    def get_role_counts(self):
+        """Get the number of users per role"""
+        return pd.read_sql(
+            "SELECT role, COUNT(*) AS users FROM users GROUP BY role ORDER BY role", self.conn
+        )
+    
     def get_cyber_incidents(self):
         """Get all cybersecurity incidents"""
         return pd.read_sql("SELECT * FROM cyber_incidents", self.conn)
@@ -136,6 +312,420 @@ class DatabaseManager:
         """Get all IT tickets"""
         return pd.read_sql("SELECT * FROM it_tickets", self.conn)
     
+    def _build_where(self, filters, allowed_columns, time_column=None):
+        """Turn {column: [values]} filters into a parameterized WHERE clause"""
+        # The time column takes a (start, end) range instead of a value list
+        clauses = []
+        params = []
+        for column, values in (filters or {}).items():
+            if not values:
+                continue
+            if column == time_column:
+                start, end = values
+                if start is not None:
+                    clauses.append(f"{column} >= ?")
+                    params.append(to_epoch(start))
+                if end is not None:
+                    clauses.append(f"{column} < ?")
+                    params.append(to_epoch(end))
+                continue
+            if column not in allowed_columns:
+                raise ValueError(f"Cannot filter on column: {column}")
+            placeholders = ", ".join("?" for _ in values)
+            clauses.append(f"{column} IN ({placeholders})")
+            params.extend(values)
+        
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+    
+    def _rollup_where(self, filters, allowed_columns, time_column):
+        """Build a WHERE clause over a rollup table, mapping time ranges to days"""
+        # Rollups are per day, so ranges are widened to whole days
+        rollup_filters = {}
+        for column, values in (filters or {}).items():
+            if column == time_column:
+                if not values:
+                    continue
+                start, end = values
+                rollup_filters["day"] = (
+                    to_epoch(start) // 86400 if start is not None else None,
+                    -(-to_epoch(end) // 86400) if end is not None else None
+                )
+            else:
+                rollup_filters[column] = values
+        return self._build_where(rollup_filters, allowed_columns, "day")
+    
+    def rebuild_rollups(self):
+        """Recompute the dashboard rollup tables from the raw rows"""
+        rebuild_rollups(self.conn)
+        # Cached results were computed from the old rollups
+        self.cursor.execute("UPDATE table_versions SET version = version + 1")
+        self.conn.commit()
+    
+    def _get_distinct(self, table, column, allowed_columns):
+        """Get sorted distinct values of a filter column"""
+        if column not in allowed_columns:
+            raise ValueError(f"Cannot filter on column: {column}")
+        self.cursor.execute(
+            f"SELECT DISTINCT {column} FROM {table} WHERE {column} != '' ORDER BY {column}"
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def _get_counts(self, table, group_by, filters, allowed_columns, time_column):
+        """Count rows per value of one column with filters applied in SQL"""
+        if group_by not in allowed_columns:
+            raise ValueError(f"Cannot group on column: {group_by}")
+        where, params = self._rollup_where(filters, allowed_columns, time_column)
+        return pd.read_sql(
+            f"SELECT {group_by}, SUM(count) AS count FROM {table}{where} "
+            f"GROUP BY {group_by} ORDER BY count DESC",
+            self.conn,
+            params=params
+        )
+    
+    def _get_page(self, table, key, filters, allowed_columns, time_column,
+                  columns, sort_by, descending, after, limit):
+        """Get one page of filtered rows using keyset pagination
+
+        Rows are ordered by (sort_by, key) and the page starts after the
+        cursor of the previous page, so the database seeks straight to it
+        instead of skipping OFFSET rows. Returns (rows, next cursor), with
+        no next cursor on the last page.
+        """
+        # Only the key and the indexed time column keep the seek an index scan
+        if sort_by not in (key, time_column):
+            raise ValueError(f"Cannot sort on column: {sort_by}")
+        table_columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+        columns = [column for column in (columns or table_columns) if column in table_columns]
+        for column in (key, sort_by):
+            if column not in columns:
+                columns.insert(0, column)
+        
+        where, params = self._build_where(filters, allowed_columns, time_column)
+        direction = "DESC" if descending else "ASC"
+        if after is not None:
+            comparison = "<" if descending else ">"
+            seek = f"({sort_by}, {key}) {comparison} (?, ?)"
+            where = f"{where} AND {seek}" if where else f" WHERE {seek}"
+            params = params + list(after)
+        
+        # Fetch one extra row to know whether there is a next page
+        df = pd.read_sql(
+            f"SELECT {', '.join(columns)} FROM {table}{where} "
+            f"ORDER BY {sort_by} {direction}, {key} {direction} LIMIT ?",
+            self.conn,
+            params=params + [int(limit) + 1]
+        )
+        next_cursor = None
+        if len(df) > limit:
+            df = df.iloc[:limit]
+            last = df.iloc[-1]
+            next_cursor = (int(last[sort_by]), int(last[key]))
+        
+        if time_column in df.columns:
+            df[time_column] = pd.to_datetime(df[time_column], unit='s')
+        return df, next_cursor
+    
+    @cached_query("cyber_incidents")
+    def get_incident_filter_options(self):
+        """Get the values offered by the cybersecurity sidebar filters"""
+        return {
+            column: self._get_distinct("incident_rollup", column, INCIDENT_FILTER_COLUMNS)
+            for column in INCIDENT_FILTER_COLUMNS
+        }
+    
+    @cached_query("cyber_incidents")
+    def get_incident_summary(self, filters=None, recent_since="2025-01-01"):
+        """Get the cybersecurity metric tiles from the rollup table"""
+        where, params = self._rollup_where(filters, INCIDENT_FILTER_COLUMNS, "timestamp")
+        self.cursor.execute(f'''
+            SELECT
+                SUM(count),
+                SUM(CASE WHEN status = 'Open' THEN count ELSE 0 END),
+                SUM(CASE WHEN severity = 'Critical' THEN count ELSE 0 END),
+                SUM(CASE WHEN category = 'Phishing' THEN count ELSE 0 END),
+                SUM(CASE WHEN category = 'Phishing' AND status = 'Open' THEN count ELSE 0 END),
+                SUM(CASE WHEN category = 'Phishing' AND day >= ? THEN count ELSE 0 END)
+            FROM incident_rollup{where}
+        ''', [to_epoch(recent_since) // 86400] + params)
+        row = self.cursor.fetchone()
+        keys = ["total", "open", "critical", "phishing", "phishing_open", "phishing_recent"]
+        return {key: value or 0 for key, value in zip(keys, row)}
+    
+    @cached_query("cyber_incidents")
+    def get_incident_counts(self, group_by, filters=None):
+        """Count incidents per severity/category/status"""
+        return self._get_counts(
+            "incident_rollup", group_by, filters, INCIDENT_FILTER_COLUMNS, "timestamp"
+        )
+    
+    @timed("db.get_incidents_page")
+    def get_incidents_page(self, filters=None, limit=50, after=None, sort_by="incident_id",
+                           descending=False, columns=None):
+        """Get one page of filtered incidents and the cursor of the next page"""
+        return self._get_page(
+            "cyber_incidents", "incident_id", filters, INCIDENT_FILTER_COLUMNS, "timestamp",
+            columns, sort_by, descending, after, limit
+        )
+    
+    @cached_query("it_tickets")
+    def get_ticket_filter_options(self):
+        """Get the values offered by the IT operations sidebar filters"""
+        return {
+            column: self._get_distinct("ticket_rollup", column, TICKET_FILTER_COLUMNS)
+            for column in TICKET_FILTER_COLUMNS
+        }
+    
+    @cached_query("it_tickets")
+    def get_ticket_summary(self, filters=None):
+        """Get the IT operations metric tiles from the rollup table"""
+        where, params = self._rollup_where(filters, TICKET_FILTER_COLUMNS, "created_at")
+        self.cursor.execute(f'''
+            SELECT
+                SUM(count),
+                SUM(CASE WHEN status = 'Open' THEN count ELSE 0 END),
+                SUM(CASE WHEN status = 'Waiting for User' THEN count ELSE 0 END)
+            FROM ticket_rollup{where}
+        ''', params)
+        row = self.cursor.fetchone()
+        keys = ["total", "open", "waiting"]
+        return {key: value or 0 for key, value in zip(keys, row)}
+    
+    @cached_query("it_tickets")
+    def get_ticket_counts(self, group_by, filters=None):
+        """Count tickets per priority/status/assignee"""
+        return self._get_counts(
+            "ticket_rollup", group_by, filters, TICKET_FILTER_COLUMNS, "created_at"
+        )
+    
+    @cached_query("it_tickets")
+    def get_staff_performance(self, filters=None):
+        """Get ticket count and mean resolution time per staff member"""
+        where, params = self._rollup_where(filters, TICKET_FILTER_COLUMNS, "created_at")
+        return pd.read_sql(
+            f"SELECT assigned_to AS Staff, SUM(count) AS 'Ticket Count', "
+            f"SUM(resolution_sum) * 1.0 / NULLIF(SUM(resolution_count), 0) AS 'Avg Resolution (hrs)' "
+            f"FROM ticket_rollup{where} GROUP BY assigned_to ORDER BY assigned_to",
+            self.conn,
+            params=params
+        )
+    
+    @timed("db.get_tickets_page")
+    def get_tickets_page(self, filters=None, limit=50, after=None, sort_by="ticket_id",
+                         descending=False, columns=None):
+        """Get one page of filtered tickets and the cursor of the next page"""
+        return self._get_page(
+            "it_tickets", "ticket_id", filters, TICKET_FILTER_COLUMNS, "created_at",
+            columns, sort_by, descending, after, limit
+        )
+    
+    def _get_daily_counts(self, rollup, group_by, filters, allowed_columns, time_column):
+        """Get per-day counts from a rollup table, optionally split by a column"""
+        if group_by is not None and group_by not in allowed_columns:
+            raise ValueError(f"Cannot group on column: {group_by}")
+        where, params = self._rollup_where(filters, allowed_columns, time_column)
+        group = f"day, {group_by}" if group_by else "day"
+        return pd.read_sql(
+            f"SELECT {group}, SUM(count) AS count FROM {rollup}{where} "
+            f"GROUP BY {group} ORDER BY day",
+            self.conn,
+            params=params
+        )
+    
+    def _get_backlog_days(self, table, filters, allowed_columns, time_column):
+        """Count filtered rows opened and closed per day, binned in SQL
+
+        day is the first midnight (in epoch days) at or after the event, so a
+        row is open at every midnight from its opening day until its closing
+        day. Closed rows without a resolution time close when created.
+        """
+        where, params = self._build_where(filters, allowed_columns, time_column)
+        closed = "status IN ('Resolved', 'Closed')"
+        closed_where = f"{where} AND {closed}" if where else f" WHERE {closed}"
+        resolved_at = f"{time_column} + CAST(COALESCE(resolution_time_hours, 0) * 3600 AS INTEGER)"
+        return pd.read_sql(
+            f"SELECT day, SUM(opened) AS opened, SUM(closed) AS closed, "
+            f"MIN(first_at) AS first_at, MAX(last_at) AS last_at FROM ("
+            f"    SELECT ({time_column} + 86399) / 86400 AS day, COUNT(*) AS opened, 0 AS closed, "
+            f"    MIN({time_column}) AS first_at, MAX({time_column}) AS last_at "
+            f"    FROM {table}{where} GROUP BY day "
+            f"    UNION ALL "
+            f"    SELECT ({resolved_at} + 86399) / 86400 AS day, 0, COUNT(*), NULL, NULL "
+            f"    FROM {table}{closed_where} GROUP BY day"
+            f") GROUP BY day ORDER BY day",
+            self.conn,
+            params=params + params
+        )
+    
+    def _get_histogram(self, table, column, filters, allowed_columns, time_column, bins):
+        """Count rows in equal-width bins of a numeric column, binned in SQL"""
+        where, params = self._build_where(filters, allowed_columns, time_column)
+        not_null = f"{column} IS NOT NULL"
+        where = f"{where} AND {not_null}" if where else f" WHERE {not_null}"
+        low, high = self.cursor.execute(
+            f"SELECT MIN({column}), MAX({column}) FROM {table}{where}", params
+        ).fetchone()
+        if low is None:
+            return pd.DataFrame(columns=["bin_start", "bin_end", "count"])
+        # The maximum falls in the last bin rather than one of its own
+        width = (high - low) / bins or 1
+        df = pd.read_sql(
+            f"SELECT MIN(CAST(({column} - ?) / ? AS INTEGER), ?) AS bin, COUNT(*) AS count "
+            f"FROM {table}{where} GROUP BY bin ORDER BY bin",
+            self.conn,
+            params=[low, width, bins - 1] + params
+        )
+        df["bin_start"] = low + df["bin"] * width
+        df["bin_end"] = df["bin_start"] + width
+        return df[["bin_start", "bin_end", "count"]]
+    
+    @cached_query("cyber_incidents")
+    def get_incident_daily_counts(self, group_by=None, filters=None):
+        """Get incidents per day, optionally per severity/category/status"""
+        return self._get_daily_counts(
+            "incident_rollup", group_by, filters, INCIDENT_FILTER_COLUMNS, "timestamp"
+        )
+    
+    def get_incident_backlog_days(self, filters=None):
+        """Get filtered incidents opened and closed per day"""
+        return self._get_backlog_days(
+            "cyber_incidents", filters, INCIDENT_FILTER_COLUMNS, "timestamp"
+        )
+    
+    @cached_query("it_tickets")
+    def get_ticket_daily_counts(self, group_by=None, filters=None):
+        """Get tickets per day, optionally per priority/status/assignee"""
+        return self._get_daily_counts(
+            "ticket_rollup", group_by, filters, TICKET_FILTER_COLUMNS, "created_at"
+        )
+    
+    @cached_query("it_tickets")
+    def get_resolution_histogram(self, filters=None, bins=30):
+        """Get the number of tickets per resolution-time bin"""
+        return self._get_histogram(
+            "it_tickets", "resolution_time_hours", filters, TICKET_FILTER_COLUMNS, "created_at", bins
+        )
+    
+    def get_ticket_backlog_days(self, filters=None):
+        """Get filtered tickets opened and closed per day"""
+        return self._get_backlog_days(
+            "it_tickets", filters, TICKET_FILTER_COLUMNS, "created_at"
+        )
+    
+    def get_correlation_summary(self, window_hours, group_by="severity", filters=None):
+        """Average tickets around incidents per severity/category/status"""
+        if group_by not in INCIDENT_FILTER_COLUMNS:
+            raise ValueError(f"Cannot group on column: {group_by}")
+        where, params = self._build_where(filters, INCIDENT_FILTER_COLUMNS, "timestamp")
+        where = f"{where} AND w.window_hours = ?" if where else " WHERE w.window_hours = ?"
+        return pd.read_sql(
+            f"SELECT i.{group_by}, COUNT(*) AS incidents, "
+            f"AVG(w.tickets_before) AS avg_before, AVG(w.tickets_after) AS avg_after, "
+            f"AVG(w.nearest_minutes) AS avg_minutes_to_ticket "
+            f"FROM incident_ticket_windows w JOIN cyber_incidents i ON i.incident_id = w.incident_id"
+            f"{where} GROUP BY i.{group_by} ORDER BY avg_after DESC",
+            self.conn,
+            params=params + [int(window_hours)]
+        )
+    
+    def get_correlated_incidents(self, window_hours, filters=None, limit=10):
+        """Get the incidents followed by the most tickets within the window"""
+        where, params = self._build_where(filters, INCIDENT_FILTER_COLUMNS, "timestamp")
+        where = f"{where} AND w.window_hours = ?" if where else " WHERE w.window_hours = ?"
+        df = pd.read_sql(
+            f"SELECT i.incident_id, i.timestamp, i.severity, i.category, i.status, "
+            f"w.tickets_before, w.tickets_after, w.nearest_ticket_id, w.nearest_minutes "
+            f"FROM incident_ticket_windows w JOIN cyber_incidents i ON i.incident_id = w.incident_id"
+            f"{where} ORDER BY w.tickets_after DESC, i.incident_id LIMIT ?",
+            self.conn,
+            params=params + [int(window_hours), int(limit)]
+        )
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+        return df
+    
+    @timed("db.search_incidents")
+    def search_incidents(self, text, limit=20, offset=0, filters=None):
+        """Search incident descriptions, best matches first"""
+        where, params = self._build_where(filters, INCIDENT_FILTER_COLUMNS, "timestamp")
+        return search(self.conn, "cyber_incidents", text, limit, offset, where, params)
+    
+    @timed("db.search_tickets")
+    def search_tickets(self, text, limit=20, offset=0, filters=None):
+        """Search ticket descriptions, best matches first"""
+        where, params = self._build_where(filters, TICKET_FILTER_COLUMNS, "created_at")
+        return search(self.conn, "it_tickets", text, limit, offset, where, params)
+    
+    def add_chat_message(self, username, role, content):
+        """Store a chat message and apply the retention policy for the user"""
+        now = int(time.time())
+        self.cursor.execute(
+            "INSERT INTO chat_messages (username, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (username, role, content, now)
+        )
+        # Keep only the newest CHAT_HISTORY_LIMIT messages within the retention period
+        self.cursor.execute('''
+            DELETE FROM chat_messages WHERE username = ? AND (
+                created_at < ? OR id <= (
+                    SELECT id FROM chat_messages WHERE username = ?
+                    ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            )
+        ''', (username, now - CHAT_RETENTION_DAYS * 86400, username, CHAT_HISTORY_LIMIT))
+        self.conn.commit()
+    
+    @timed("db.get_chat_messages")
+    def get_chat_messages(self, username, limit=20, before=None):
+        """Get up to limit messages older than id before, oldest first
+
+        Returns (messages, cursor for the next older window or None).
+        """
+        params = [username]
+        seek = ""
+        if before is not None:
+            seek = " AND id < ?"
+            params.append(int(before))
+        # Fetch one extra row to know whether there are older messages
+        self.cursor.execute(
+            f"SELECT id, role, content FROM chat_messages WHERE username = ?{seek} "
+            f"ORDER BY id DESC LIMIT ?",
+            params + [int(limit) + 1]
+        )
+        rows = self.cursor.fetchall()
+        older = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            older = rows[-1][0]
+        messages = [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+        return messages, older
+    
+    def clear_chat_history(self, username):
+        """Delete all chat messages of a user"""
+        self.cursor.execute("DELETE FROM chat_messages WHERE username = ?", (username,))
+        self.conn.commit()
+    
+    @timed("db.get_dataset_catalog")
+    def get_dataset_catalog(self, refresh=True):
+        """Get the registered datasets, first profiling any that are new or changed
+
+        With refresh=False only the stored profiles are read (the background
+        worker keeps them current).
+        """
+        if refresh:
+            try:
+                sync_catalog(self.conn)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not read datasets_metadata.csv: {e}")
+            refresh_profiles(self.conn)
+        return load_catalog(self.conn)
+    
+    def reprofile_datasets(self):
+        """Recompute every dataset profile, ignoring the cached ones"""
+        return refresh_profiles(self.conn, force=True)
+    
     def close(self):
-        """Close database connection"""
-        self.conn.close()
\ No newline at end of file
+        """Return the database connection to the pool"""
+        conn = getattr(self, "conn", None)
+        if conn is not None:
+            self.conn = None
+            self.cursor = None
+            self.pool.release(conn)
\ No newline at end of file
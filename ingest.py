@@ -0,0 +1,238 @@
+import csv
+import hashlib
+import io
+import os
+import time
+from datetime import datetime
+
+# Streaming CSV ingestion
+# Files are read in bounded batches and upserted on their id column. The
+# byte offset reached is stored in ingest_state as a high-water mark, so a
+# rerun only reads rows appended since the last load.
+
+EPOCH = datetime(1970, 1, 1)
+
+# How many bytes before the high-water mark are fingerprinted to detect a
+# file that was rewritten rather than appended to
+FINGERPRINT_BYTES = 4096
+
+def parse_int(value):
+    """Parse an integer CSV field (empty means NULL)"""
+    return int(float(value)) if value.strip() else None
+
+def parse_epoch(value):
+    """Parse a CSV date field to epoch seconds (empty means NULL)"""
+    if not value.strip():
+        return None
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is not None:
+        # Offsets such as Z or +02:00 are converted to UTC
+        return int(parsed.timestamp())
+    return int((parsed - EPOCH).total_seconds())
+
+def parse_text(value):
+    """Parse a text CSV field (empty means NULL)"""
+    return value if value != "" else None
+
+# table -> key column, CSV file and a parser for each CSV column loaded
+SOURCES = {
+    "cyber_incidents": {
+        "key": "incident_id",
+        "time_column": "timestamp",
+        "path": os.path.join("DATA", "cyber_incidents.csv"),
+        "columns": {
+            "incident_id": parse_int,
+            "timestamp": parse_epoch,
+            "severity": parse_text,
+            "category": parse_text,
+            "status": parse_text,
+            "description": parse_text,
+        },
+    },
+    "it_tickets": {
+        "key": "ticket_id",
+        "time_column": "created_at",
+        "path": os.path.join("DATA", "it_tickets.csv"),
+        "columns": {
+            "ticket_id": parse_int,
+            "priority": parse_text,
+            "description": parse_text,
+            "status": parse_text,
+            "assigned_to": parse_text,
+            "created_at": parse_epoch,
+            "resolution_time_hours": parse_int,
+        },
+    },
+}
+
+def tail_fingerprint(f, offset):
+    """Hash the bytes just before offset"""
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+def get_ingest_state(conn, table):
+    """Get the stored high-water mark for a table (None if never loaded)"""
+    row = conn.execute(
+        "SELECT path, file_size, file_mtime, byte_offset, fingerprint, max_timestamp, rows_loaded "
+        "FROM ingest_state WHERE source = ?",
+        (table,)
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ["path", "file_size", "file_mtime", "byte_offset", "fingerprint",
+            "max_timestamp", "rows_loaded"]
+    return dict(zip(keys, row))
+
+def reset_ingest_state(conn, table=None):
+    """Forget the high-water mark so the next load rereads the whole file"""
+    if table is None:
+        conn.execute("DELETE FROM ingest_state")
+    else:
+        conn.execute("DELETE FROM ingest_state WHERE source = ?", (table,))
+    conn.commit()
+
+def _settled(f, stat):
+    """Check that an open file is still the size and mtime seen in stat"""
+    if stat is None:
+        return False
+    current = os.fstat(f.fileno())
+    return current.st_size == stat.st_size and current.st_mtime == stat.st_mtime
+
+def _read_batches(f, batch_size, stat=None):
+    """Yield (raw lines, end offset) batches ending on complete CSV records
+
+    An unterminated last line only counts as a record when the file has not
+    changed since stat was taken; otherwise it may still be being written.
+    """
+    lines = []
+    records = 0
+    in_quotes = False
+    partial = b""
+    while True:
+        line = f.readline()
+        if not line:
+            break
+        if not line.endswith(b"\n") and not _settled(f, stat):
+            partial = line
+            break
+        lines.append(line)
+        # An odd number of quotes opens or closes a multi-line field
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        if in_quotes:
+            continue
+        records += 1
+        if records >= batch_size:
+            yield lines, f.tell()
+            lines = []
+            records = 0
+
+    if lines and not in_quotes:
+        yield lines, f.tell() - len(partial)
+
+def _upsert_sql(table, key, columns):
+    """Build the INSERT ... ON CONFLICT DO UPDATE statement for a table"""
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT({key}) DO UPDATE SET {updates}"
+    )
+
+def ingest_csv(conn, table, path=None, batch_size=10000):
+    """Stream new rows of a CSV into a table and advance its high-water mark"""
+    source = SOURCES[table]
+    path = path or source["path"]
+    key = source["key"]
+    time_column = source["time_column"]
+    parsers = source["columns"]
+    columns = list(parsers)
+
+    stat = os.stat(path)
+    state = get_ingest_state(conn, table)
+    stats = {"table": table, "rows": 0, "rejected": 0, "seconds": 0.0,
+             "rows_per_sec": 0.0, "skipped": False}
+
+    # Nothing changed since the last load
+    if (state and state["path"] == path and state["file_size"] == stat.st_size
+            and state["file_mtime"] == stat.st_mtime):
+        stats["skipped"] = True
+        return stats
+
+    start_time = time.perf_counter()
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode("utf-8-sig")]))
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {missing}")
+        positions = [header.index(column) for column in columns]
+        key_position = columns.index(key)
+        time_position = columns.index(time_column)
+
+        # Resume after the high-water mark only if the file was appended to
+        offset = f.tell()
+        max_timestamp = None
+        if state and state["path"] == path and stat.st_size >= state["byte_offset"]:
+            if tail_fingerprint(f, state["byte_offset"]) == state["fingerprint"]:
+                offset = state["byte_offset"]
+                max_timestamp = state["max_timestamp"]
+        f.seek(offset)
+
+        sql = _upsert_sql(table, key, columns)
+        for lines, end_offset in _read_batches(f, batch_size, stat):
+            rows = []
+            text = b"".join(lines).decode("utf-8")
+            for record in csv.reader(io.StringIO(text)):
+                if not record:
+                    continue
+                try:
+                    row = [parsers[column](record[position])
+                           for column, position in zip(columns, positions)]
+                except (ValueError, IndexError):
+                    stats["rejected"] += 1
+                    continue
+                if row[key_position] is None or row[time_position] is None:
+                    stats["rejected"] += 1
+                    continue
+                rows.append(row)
+                if max_timestamp is None or row[time_position] > max_timestamp:
+                    max_timestamp = row[time_position]
+
+            # The batch and the new high-water mark commit together
+            position = f.tell()
+            fingerprint = tail_fingerprint(f, end_offset)
+            f.seek(position)
+            with conn:
+                conn.executemany(sql, rows)
+                conn.execute('''
+                    INSERT INTO ingest_state
+                        (source, path, file_size, file_mtime, byte_offset, fingerprint,
+                         max_timestamp, rows_loaded, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, strftime('%s', 'now'))
+                    ON CONFLICT(source) DO UPDATE SET
+                        path = excluded.path,
+                        file_size = excluded.file_size,
+                        file_mtime = excluded.file_mtime,
+                        byte_offset = excluded.byte_offset,
+                        fingerprint = excluded.fingerprint,
+                        max_timestamp = excluded.max_timestamp,
+                        rows_loaded = ingest_state.rows_loaded + excluded.rows_loaded,
+                        updated_at = excluded.updated_at
+                ''', (table, path, None, None, end_offset, fingerprint,
+                      max_timestamp, len(rows)))
+            stats["rows"] += len(rows)
+
+    # Only mark the file as fully seen once every complete record is loaded
+    with conn:
+        conn.execute(
+            "UPDATE ingest_state SET file_size = ?, file_mtime = ? "
+            "WHERE source = ? AND byte_offset = ?",
+            (stat.st_size, stat.st_mtime, table, stat.st_size)
+        )
+
+    stats["seconds"] = time.perf_counter() - start_time
+    if stats["seconds"] > 0:
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"]
+    return stats
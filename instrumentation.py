@@ -0,0 +1,370 @@
+import cProfile
+import contextlib
+import functools
+import io
+import os
+import pstats
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+# Timing spans, SQL statistics and per-rerun profiles for this process
+# Spans wrap the hot paths (cached queries, ingest, aggregation, chart
+# builds and Streamlit element serialization) and keep their latest
+# durations per name. Pooled connections time every statement and capture
+# EXPLAIN QUERY PLAN the first time a statement is slow. Pages run their
+# body inside page_run(), optionally under cProfile, which ends the run even
+# when the page stops early, and render through timed_dataframe() and
+# timed_chart(). Streamlit itself is never patched.
+# Everything is in memory, so the Admin page shows the app process only.
+
+# Durations kept per span name for percentiles and histograms
+SAMPLES_PER_SPAN = 1000
+
+# Statements slower than this are logged with their query plan
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_MS", 100)) / 1000
+
+# Distinct statements tracked (least recently run are dropped first)
+MAX_STATEMENTS = 500
+
+# Slow statements kept, slowest first
+MAX_SLOW_QUERIES = 50
+
+# Profile every rerun, not only sessions that turned it on
+PROFILE_RERUNS = os.environ.get("PROFILE_RERUNS") == "1"
+
+# Profiles kept and the number of functions shown from each
+MAX_PROFILES = 10
+PROFILE_LINES = 30
+
+# Statements whose plan is worth capturing
+PLANNED_STATEMENTS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace and IN lists so one query shape is one statement"""
+    sql = " ".join(sql.split())
+    return re.sub(r"\?(\s*,\s*\?)+", "?, ...", sql)
+
+def percentiles(values, qs=(50, 95, 99)):
+    """Percentiles of a list of seconds, in milliseconds"""
+    if not values:
+        return [None] * len(qs)
+    return [float(value) * 1000 for value in np.percentile(values, qs)]
+
+class Metrics:
+    """Thread-safe registry of span timings, SQL statistics and profiles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._statements = OrderedDict()
+        self._slow = {}
+        self._reruns = {}
+        self._profiles = deque(maxlen=MAX_PROFILES)
+
+    def record(self, name, seconds):
+        """Add one duration to a span"""
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = {"count": 0, "total": 0.0, "max": 0.0,
+                                            "samples": deque(maxlen=SAMPLES_PER_SPAN)}
+            span["count"] += 1
+            span["total"] += seconds
+            span["max"] = max(span["max"], seconds)
+            span["samples"].append(seconds)
+
+    def record_query(self, sql, seconds, calls=1):
+        """Add time spent running or fetching a statement"""
+        with self._lock:
+            stats = self._statements.pop(sql, None) or {"calls": 0, "total": 0.0, "max": 0.0}
+            stats["calls"] += calls
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            self._statements[sql] = stats
+            while len(self._statements) > MAX_STATEMENTS:
+                self._statements.popitem(last=False)
+
+    def is_slow_logged(self, sql, seconds):
+        """Check whether a slow statement already has a plan at least this slow"""
+        with self._lock:
+            entry = self._slow.get(sql)
+            return entry is not None and entry["seconds"] >= seconds
+
+    def record_slow(self, sql, seconds, params, plan):
+        """Keep a slow statement with its plan, dropping the fastest when full"""
+        with self._lock:
+            self._slow[sql] = {"seconds": seconds, "params": params, "plan": plan,
+                               "seen_at": time.time()}
+            if len(self._slow) > MAX_SLOW_QUERIES:
+                fastest = min(self._slow, key=lambda key: self._slow[key]["seconds"])
+                del self._slow[fastest]
+
+    def record_rerun(self, page, seconds, spans):
+        """Keep the span breakdown of the latest run of a page"""
+        with self._lock:
+            self._reruns[page] = {"seconds": seconds, "spans": spans, "finished_at": time.time()}
+
+    def add_profile(self, page, seconds, text):
+        """Keep the formatted cProfile output of a run"""
+        with self._lock:
+            self._profiles.appendleft({"page": page, "seconds": seconds, "stats": text,
+                                       "finished_at": time.time()})
+
+    def span_stats(self):
+        """Count, mean and p50/p95/p99/max milliseconds per span"""
+        with self._lock:
+            spans = {name: dict(span, samples=list(span["samples"])) for name, span in self._spans.items()}
+        rows = []
+        for name, span in sorted(spans.items()):
+            p50, p95, p99 = percentiles(span["samples"])
+            rows.append({"span": name, "count": span["count"],
+                         "mean_ms": span["total"] / span["count"] * 1000,
+                         "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": span["max"] * 1000})
+        return pd.DataFrame(rows, columns=["span", "count", "mean_ms", "p50_ms", "p95_ms",
+                                           "p99_ms", "max_ms"])
+
+    def samples(self, name):
+        """Latest durations of a span in milliseconds"""
+        with self._lock:
+            span = self._spans.get(name)
+            return [seconds * 1000 for seconds in span["samples"]] if span else []
+
+    def statement_stats(self, limit=20):
+        """Statements with the most total time"""
+        with self._lock:
+            rows = [{"statement": sql, "calls": stats["calls"], "total_ms": stats["total"] * 1000,
+                     "max_ms": stats["max"] * 1000} for sql, stats in self._statements.items()]
+        frame = pd.DataFrame(rows, columns=["statement", "calls", "total_ms", "max_ms"])
+        return frame.sort_values("total_ms", ascending=False).head(limit).reset_index(drop=True)
+
+    def slow_queries(self):
+        """Slow statements with their plans, slowest first"""
+        with self._lock:
+            entries = [dict(entry, statement=sql) for sql, entry in self._slow.items()]
+        return sorted(entries, key=lambda entry: entry["seconds"], reverse=True)
+
+    def reruns(self):
+        """Latest run breakdown per page"""
+        with self._lock:
+            return dict(self._reruns)
+
+    def profiles(self):
+        """Latest profiled runs, newest first"""
+        with self._lock:
+            return list(self._profiles)
+
+    def reset(self):
+        """Drop everything recorded so far"""
+        with self._lock:
+            self._spans.clear()
+            self._statements.clear()
+            self._slow.clear()
+            self._reruns.clear()
+            self._profiles.clear()
+
+metrics = Metrics()
+
+# The run in progress on this thread (Streamlit runs each script on its own thread)
+_local = threading.local()
+
+class Span:
+    """Context manager timing a block under a name"""
+
+    __slots__ = ("name", "entry", "depth", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        # Listed in start order, so nested spans follow their parent
+        self.entry = [self.depth, self.name, None]
+        rerun = getattr(_local, "rerun", None)
+        if rerun is not None:
+            rerun["spans"].append(self.entry)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        self.entry[2] = seconds
+        _local.depth = self.depth
+        metrics.record(self.name, seconds)
+        return False
+
+def span(name):
+    """Time a block under a span name"""
+    return Span(name)
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _explain(conn, sql, parameters):
+    """Get the query plan of a statement as indented lines"""
+    try:
+        # A plain cursor, so the plan query is not timed itself
+        rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error as e:
+        return f"(no plan: {e})"
+    depths = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depths[node] = depths.get(parent, -1) + 1
+        lines.append("  " * depths[node] + detail)
+    return "\n".join(lines)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports statement and fetch times to the metrics"""
+
+    _statement = None
+
+    def _track(self, sql, parameters, seconds, calls, planned):
+        statement = normalize_sql(sql)
+        self._statement = (statement, sql, parameters, planned)
+        self._seconds = seconds
+        metrics.record_query(statement, seconds, calls)
+        self._check_slow()
+
+    def _check_slow(self):
+        statement, sql, parameters, planned = self._statement
+        if self._seconds < SLOW_QUERY_SECONDS or metrics.is_slow_logged(statement, self._seconds):
+            return
+        plan = None
+        if planned and sql.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            plan = _explain(self.connection, sql, parameters)
+        metrics.record_slow(statement, self._seconds, repr(parameters)[:200], plan)
+
+    def _fetched(self, seconds):
+        if self._statement is None:
+            return
+        self._seconds += seconds
+        metrics.record_query(self._statement[0], seconds, calls=0)
+        self._check_slow()
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._track(sql, parameters, time.perf_counter() - start, 1, True)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._track(sql, (), time.perf_counter() - start, 1, False)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._fetched(time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size or self.arraysize)
+        finally:
+            self._fetched(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._fetched(time.perf_counter() - start)
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors, including conn.execute(), are timed"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def timed_dataframe(*args, **kwargs):
+    """st.dataframe, timed as render.dataframe"""
+    import streamlit as st
+    with span("render.dataframe"):
+        return st.dataframe(*args, **kwargs)
+
+def timed_chart(*args, **kwargs):
+    """st.plotly_chart, timed as render.plotly_chart"""
+    import streamlit as st
+    with span("render.plotly_chart"):
+        return st.plotly_chart(*args, **kwargs)
+
+def _stop_profiler(rerun):
+    """Stop a run's profiler and return its top functions by cumulative time"""
+    profiler = rerun["profiler"]
+    if profiler is None:
+        return None
+    profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return output.getvalue()
+
+def start_rerun(page, profile=False):
+    """Start timing a page run on this thread, under cProfile if asked"""
+    previous = getattr(_local, "rerun", None)
+    if previous is not None:
+        # The last run on this thread was started but never ended
+        _stop_profiler(previous)
+    profiler = None
+    if profile or PROFILE_RERUNS:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            profiler = None
+    _local.rerun = {"page": page, "start": time.perf_counter(), "spans": [], "profiler": profiler}
+    _local.depth = 0
+
+def end_rerun():
+    """Finish the page run on this thread; returns its duration in seconds"""
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+    seconds = time.perf_counter() - rerun["start"]
+    stats = _stop_profiler(rerun)
+    if stats is not None:
+        metrics.add_profile(rerun["page"], seconds, stats)
+    metrics.record(f"rerun.{rerun['page']}", seconds)
+    metrics.record_rerun(rerun["page"], seconds, rerun["spans"])
+    return seconds
+
+@contextlib.contextmanager
+def page_run(page, profile=False):
+    """Time a page body as one run
+
+    The run is ended and its profiler stopped however the body exits,
+    including st.stop() and st.rerun(), which raise to end the script.
+    """
+    start_rerun(page, profile)
+    try:
+        yield
+    finally:
+        end_rerun()
@@ -0,0 +1,583 @@
+import sqlite3
+
+# Schema migrations for multi_domain.db
+# The applied version is stored in PRAGMA user_version. Each migration runs
+# in its own transaction, so a failed migration leaves the previous version.
+
+def _table_columns(conn, table):
+    """Get the column names of a table (empty if it does not exist)"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _epoch_expr(column):
+    """SQL expression converting a TEXT date or epoch integer column to epoch seconds"""
+    return (
+        f"CASE WHEN typeof({column}) = 'integer' THEN {column} "
+        f"ELSE CAST(strftime('%s', {column}) AS INTEGER) END"
+    )
+
+def _pick(columns, *names):
+    """Get the first of names that exists in columns, or NULL"""
+    for name in names:
+        if name in columns:
+            return name
+    return "NULL"
+
+def initial_tables(conn):
+    """Version 1: the original users and domain tables"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cyber_incidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_id TEXT,
+            date TEXT,
+            severity TEXT,
+            category TEXT,
+            status TEXT,
+            resolution_time_hours INTEGER
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS it_tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id TEXT,
+            created_date TEXT,
+            priority TEXT,
+            status TEXT,
+            assigned_to TEXT,
+            category TEXT,
+            resolution_time_hours INTEGER
+        )
+    ''')
+
+def typed_domain_tables(conn):
+    """Version 2: match the CSV columns and store timestamps as epoch integers"""
+    # Old tables are either the declared version 1 schema (date, created_date)
+    # or a copy of the CSV written by to_sql (timestamp, created_at)
+    incident_columns = _table_columns(conn, "cyber_incidents")
+    ticket_columns = _table_columns(conn, "it_tickets")
+
+    conn.execute("ALTER TABLE cyber_incidents RENAME TO cyber_incidents_old")
+    conn.execute('''
+        CREATE TABLE cyber_incidents (
+            incident_id INTEGER PRIMARY KEY,
+            timestamp INTEGER NOT NULL,
+            severity TEXT,
+            category TEXT,
+            status TEXT,
+            description TEXT,
+            resolution_time_hours INTEGER
+        )
+    ''')
+    timestamp = _pick(incident_columns, "timestamp", "date")
+    conn.execute(f'''
+        INSERT OR REPLACE INTO cyber_incidents
+            (incident_id, timestamp, severity, category, status, description, resolution_time_hours)
+        SELECT
+            CAST(incident_id AS INTEGER),
+            {_epoch_expr(timestamp)},
+            {_pick(incident_columns, "severity")},
+            {_pick(incident_columns, "category")},
+            {_pick(incident_columns, "status")},
+            {_pick(incident_columns, "description")},
+            {_pick(incident_columns, "resolution_time_hours")}
+        FROM cyber_incidents_old
+        WHERE incident_id IS NOT NULL AND {timestamp} IS NOT NULL
+    ''')
+    conn.execute("DROP TABLE cyber_incidents_old")
+
+    conn.execute("ALTER TABLE it_tickets RENAME TO it_tickets_old")
+    conn.execute('''
+        CREATE TABLE it_tickets (
+            ticket_id INTEGER PRIMARY KEY,
+            created_at INTEGER NOT NULL,
+            priority TEXT,
+            status TEXT,
+            assigned_to TEXT,
+            category TEXT,
+            description TEXT,
+            resolution_time_hours INTEGER
+        )
+    ''')
+    created_at = _pick(ticket_columns, "created_at", "created_date")
+    conn.execute(f'''
+        INSERT OR REPLACE INTO it_tickets
+            (ticket_id, created_at, priority, status, assigned_to, category, description, resolution_time_hours)
+        SELECT
+            CAST(ticket_id AS INTEGER),
+            {_epoch_expr(created_at)},
+            {_pick(ticket_columns, "priority")},
+            {_pick(ticket_columns, "status")},
+            {_pick(ticket_columns, "assigned_to")},
+            {_pick(ticket_columns, "category")},
+            {_pick(ticket_columns, "description")},
+            {_pick(ticket_columns, "resolution_time_hours")}
+        FROM it_tickets_old
+        WHERE ticket_id IS NOT NULL AND {created_at} IS NOT NULL
+    ''')
+    conn.execute("DROP TABLE it_tickets_old")
+
+def filter_indexes(conn):
+    """Version 3: composite indexes for the dashboard filters and time ranges"""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_incidents_filters "
+        "ON cyber_incidents (severity, status, category)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_incidents_timestamp "
+        "ON cyber_incidents (timestamp)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tickets_filters "
+        "ON it_tickets (priority, status, assigned_to)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tickets_created_at "
+        "ON it_tickets (created_at)"
+    )
+
+def ingest_state_table(conn):
+    """Version 4: high-water marks for incremental CSV ingestion"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_state (
+            source TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            file_size INTEGER,
+            file_mtime REAL,
+            byte_offset INTEGER NOT NULL,
+            fingerprint TEXT,
+            max_timestamp INTEGER,
+            rows_loaded INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER
+        )
+    ''')
+
+def _rollup_triggers(conn, table, rollup, key_exprs, value_exprs):
+    """Create triggers that keep a rollup table in step with its source table"""
+    # key_exprs/value_exprs are {rollup column: expression over NEW./OLD. row}
+    keys = list(key_exprs)
+    values = list(value_exprs)
+    columns = ", ".join(keys + values)
+    updates = ", ".join(f"{value} = {value} + excluded.{value}" for value in values)
+
+    def add(row, sign):
+        """SQL adding (sign=1) or removing (sign=-1) one source row"""
+        key_sql = ", ".join(expr.format(row=row) for expr in key_exprs.values())
+        value_sql = ", ".join(f"{sign} * ({expr.format(row=row)})" for expr in value_exprs.values())
+        key_match = " AND ".join(
+            f"{key} = {expr.format(row=row)}" for key, expr in key_exprs.items()
+        )
+        sql = (
+            f"INSERT INTO {rollup} ({columns}) VALUES ({key_sql}, {value_sql}) "
+            f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates};"
+        )
+        if sign < 0:
+            sql += f" DELETE FROM {rollup} WHERE {key_match} AND count = 0;"
+        return sql
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {rollup}_insert AFTER INSERT ON {table}
+        BEGIN {add("NEW", 1)} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {rollup}_delete AFTER DELETE ON {table}
+        BEGIN {add("OLD", -1)} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {rollup}_update AFTER UPDATE ON {table}
+        BEGIN {add("OLD", -1)} {add("NEW", 1)} END
+    ''')
+
+# Rollup key and value expressions, shared by the triggers and rebuild_rollups()
+INCIDENT_ROLLUP_KEYS = {
+    "day": "{row}.timestamp / 86400",
+    "severity": "IFNULL({row}.severity, '')",
+    "category": "IFNULL({row}.category, '')",
+    "status": "IFNULL({row}.status, '')",
+}
+INCIDENT_ROLLUP_VALUES = {
+    "count": "1",
+}
+TICKET_ROLLUP_KEYS = {
+    "day": "{row}.created_at / 86400",
+    "assigned_to": "IFNULL({row}.assigned_to, '')",
+    "priority": "IFNULL({row}.priority, '')",
+    "status": "IFNULL({row}.status, '')",
+}
+TICKET_ROLLUP_VALUES = {
+    "count": "1",
+    "resolution_sum": "IFNULL({row}.resolution_time_hours, 0)",
+    "resolution_count": "{row}.resolution_time_hours IS NOT NULL",
+}
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the raw rows"""
+    for table, rollup, keys, values in [
+        ("cyber_incidents", "incident_rollup", INCIDENT_ROLLUP_KEYS, INCIDENT_ROLLUP_VALUES),
+        ("it_tickets", "ticket_rollup", TICKET_ROLLUP_KEYS, TICKET_ROLLUP_VALUES),
+    ]:
+        key_sql = ", ".join(expr.format(row=table) for expr in keys.values())
+        value_sql = ", ".join(f"SUM({expr.format(row=table)})" for expr in values.values())
+        conn.execute(f"DELETE FROM {rollup}")
+        conn.execute(
+            f"INSERT INTO {rollup} ({', '.join(list(keys) + list(values))}) "
+            f"SELECT {key_sql}, {value_sql} FROM {table} GROUP BY {key_sql}"
+        )
+
+def rollup_tables(conn):
+    """Version 5: per-day summary tables kept up to date by triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS incident_rollup (
+            day INTEGER NOT NULL,
+            severity TEXT NOT NULL,
+            category TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, severity, category, status)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_rollup (
+            day INTEGER NOT NULL,
+            assigned_to TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            resolution_sum INTEGER NOT NULL,
+            resolution_count INTEGER NOT NULL,
+            PRIMARY KEY (day, assigned_to, priority, status)
+        )
+    ''')
+    _rollup_triggers(conn, "cyber_incidents", "incident_rollup",
+                     INCIDENT_ROLLUP_KEYS, INCIDENT_ROLLUP_VALUES)
+    _rollup_triggers(conn, "it_tickets", "ticket_rollup",
+                     TICKET_ROLLUP_KEYS, TICKET_ROLLUP_VALUES)
+    rebuild_rollups(conn)
+
+def table_versions(conn):
+    """Version 6: per-table change counters for cache invalidation"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in ("cyber_incidents", "it_tickets"):
+        conn.execute(
+            "INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)",
+            (table,)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions SET version = version + 1
+                    WHERE table_name = '{table}';
+                END
+            ''')
+
+def resolution_sketch_tables(conn):
+    """Version 7: resolution-time sketches and the queue of newly resolved tickets"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resolution_sketches (
+            assigned_to TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (assigned_to, priority)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resolution_queue (
+            id INTEGER PRIMARY KEY,
+            assigned_to TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            hours REAL NOT NULL
+        )
+    ''')
+
+    # Queue a ticket once, when it first becomes resolved with a known time
+    closed = "('Resolved', 'Closed')"
+    enqueue = (
+        "INSERT INTO resolution_queue (assigned_to, priority, hours) "
+        "VALUES (IFNULL(NEW.assigned_to, ''), IFNULL(NEW.priority, ''), NEW.resolution_time_hours);"
+    )
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS resolution_queue_insert AFTER INSERT ON it_tickets
+        WHEN NEW.status IN {closed} AND NEW.resolution_time_hours IS NOT NULL
+        BEGIN {enqueue} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS resolution_queue_update AFTER UPDATE ON it_tickets
+        WHEN NEW.status IN {closed} AND NEW.resolution_time_hours IS NOT NULL
+            AND (OLD.status NOT IN {closed} OR OLD.resolution_time_hours IS NULL)
+        BEGIN {enqueue} END
+    ''')
+
+    # Existing resolved tickets are folded in by the next update_sketches()
+    conn.execute(f'''
+        INSERT INTO resolution_queue (assigned_to, priority, hours)
+        SELECT IFNULL(assigned_to, ''), IFNULL(priority, ''), resolution_time_hours
+        FROM it_tickets
+        WHERE status IN {closed} AND resolution_time_hours IS NOT NULL
+    ''')
+
+def fts5_available(conn):
+    """Check whether SQLite was built with the FTS5 extension"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_check USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_check")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def description_search_index(conn):
+    """Version 8: FTS5 full-text indexes over incident and ticket descriptions"""
+    # Without FTS5 the search functions fall back to LIKE scans
+    if not fts5_available(conn):
+        return
+
+    for table, index, key in [("cyber_incidents", "incidents_fts", "incident_id"),
+                              ("it_tickets", "tickets_fts", "ticket_id")]:
+        # External-content index: the text lives only in the source table
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                description, content='{table}', content_rowid='{key}'
+            )
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {index} (rowid, description) VALUES (NEW.{key}, NEW.description);
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {index} ({index}, rowid, description)
+                VALUES ('delete', OLD.{key}, OLD.description);
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF description ON {table}
+            BEGIN
+                INSERT INTO {index} ({index}, rowid, description)
+                VALUES ('delete', OLD.{key}, OLD.description);
+                INSERT INTO {index} (rowid, description) VALUES (NEW.{key}, NEW.description);
+            END
+        ''')
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+def chat_history_table(conn):
+    """Version 9: AI Assistant chat messages per user"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    # Windows and pruning read one user's newest messages by id
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (username, id)"
+    )
+
+def dataset_catalog_tables(conn):
+    """Version 10: data science dataset catalog and cached profiles"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS datasets (
+            dataset_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            rows INTEGER,
+            columns INTEGER,
+            uploaded_by TEXT,
+            upload_date INTEGER,
+            path TEXT NOT NULL
+        )
+    ''')
+    # One profile per dataset, valid while the file size/mtime match
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS dataset_profiles (
+            dataset_id INTEGER PRIMARY KEY,
+            file_size INTEGER,
+            file_mtime REAL,
+            fingerprint TEXT,
+            row_count INTEGER,
+            column_count INTEGER,
+            sample_rows INTEGER,
+            null_rate REAL,
+            duplicate_rate REAL,
+            quality_score REAL,
+            column_stats TEXT,
+            estimated INTEGER NOT NULL DEFAULT 0,
+            profiled_at INTEGER
+        )
+    ''')
+
+def job_queue_tables(conn):
+    """Version 11: background job queue and worker heartbeats"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            task TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            enqueued_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            worker TEXT,
+            result TEXT,
+            error TEXT
+        )
+    ''')
+    # Workers claim the oldest queued job; the scheduler looks up each task's last run
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_task ON jobs (task, enqueued_at)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS workers (
+            name TEXT PRIMARY KEY,
+            started_at REAL NOT NULL,
+            heartbeat_at REAL NOT NULL
+        )
+    ''')
+
+def correlation_tables(conn):
+    """Version 12: cached incident/ticket time-window join results"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS incident_ticket_windows (
+            window_hours INTEGER NOT NULL,
+            incident_id INTEGER NOT NULL,
+            tickets_before INTEGER NOT NULL,
+            tickets_after INTEGER NOT NULL,
+            nearest_ticket_id INTEGER,
+            nearest_minutes REAL,
+            PRIMARY KEY (window_hours, incident_id)
+        ) WITHOUT ROWID
+    ''')
+    # Which table versions each window's results were computed from
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS correlation_runs (
+            window_hours INTEGER PRIMARY KEY,
+            incidents_version INTEGER NOT NULL,
+            tickets_version INTEGER NOT NULL,
+            tickets_per_hour REAL NOT NULL,
+            seconds REAL NOT NULL,
+            computed_at INTEGER NOT NULL
+        )
+    ''')
+
+def rate_limit_table(conn):
+    """Version 13: login rate-limit token buckets shared between processes"""
+    # A missing row is a full bucket, so only recently used buckets are stored
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            bucket TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+def database_info_table(conn):
+    """Version 14: a random id naming this database file in shared caches"""
+    # Table versions restart if the file is recreated; the new id keeps old cached results out
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS database_info (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    conn.execute(
+        "INSERT OR IGNORE INTO database_info (name, value) VALUES ('instance_id', lower(hex(randomblob(16))))"
+    )
+
+def user_change_counter(conn):
+    """Version 15: a users change counter so other processes drop cached roles"""
+    # Password rehashes on login do not change what a session may open
+    conn.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES ('users', 0)")
+    for event, name in (("INSERT", "insert"), ("UPDATE OF role", "update"), ("DELETE", "delete")):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_version_{name}
+            AFTER {event} ON users
+            BEGIN
+                UPDATE table_versions SET version = version + 1
+                WHERE table_name = 'users';
+            END
+        ''')
+
+# (version, description, function) - append new migrations at the end
+MIGRATIONS = [
+    (1, "initial tables", initial_tables),
+    (2, "typed cyber_incidents and it_tickets", typed_domain_tables),
+    (3, "filter and time indexes", filter_indexes),
+    (4, "ingest high-water marks", ingest_state_table),
+    (5, "dashboard rollup tables", rollup_tables),
+    (6, "table change counters", table_versions),
+    (7, "resolution-time sketches", resolution_sketch_tables),
+    (8, "description search index", description_search_index),
+    (9, "assistant chat history", chat_history_table),
+    (10, "dataset catalog", dataset_catalog_tables),
+    (11, "background job queue", job_queue_tables),
+    (12, "incident/ticket correlation cache", correlation_tables),
+    (13, "login rate limits", rate_limit_table),
+    (14, "database instance id", database_info_table),
+    (15, "user change counter", user_change_counter),
+]
+
+def get_schema_version(conn):
+    """Get the schema version applied to a database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, target=None):
+    """Apply all pending migrations up to target (default latest)"""
+    if target is None:
+        target = MIGRATIONS[-1][0]
+
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= get_schema_version(conn) or version > target:
+            continue
+
+        # Run the migration and the version bump as one transaction
+        old_isolation = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock
+            if version <= get_schema_version(conn):
+                conn.execute("ROLLBACK")
+                continue
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.isolation_level = old_isolation
+
+        applied.append((version, description))
+
+    return applied
+
+if __name__ == "__main__":
+    import sys
+
+    db_name = sys.argv[1] if len(sys.argv) > 1 else "multi_domain.db"
+    conn = sqlite3.connect(db_name)
+    print(f"Current schema version: {get_schema_version(conn)}")
+
+    for version, description in migrate(conn):
+        print(f"Applied migration {version}: {description}")
+
+    print(f"Schema is at version {get_schema_version(conn)}")
+    conn.close()
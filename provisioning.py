@@ -0,0 +1,236 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from auth import BCRYPT_ROUNDS, hash_password
+from instrumentation import timed
+from sessions import ROLE_PERMISSIONS, invalidate_user
+
+# Bulk user provisioning from CSV or JSONL exports
+# Records are streamed in batches. Passwords are hashed in a process pool
+# (bcrypt is CPU-bound, so each process hashes on its own core), users that
+# already exist are skipped before hashing unless they are being updated,
+# and each batch is written with executemany as soon as it is hashed. The
+# whole import is one BEGIN IMMEDIATE transaction, so it lands completely
+# or not at all, memory stays bounded by the batch size, and the counts
+# come from the same transaction as the writes. Other writers (logins
+# included) wait while an import runs, so run large ones off-peak.
+# Run: python provisioning.py users.csv [--update] [--workers N]
+
+# Records read, hashed and inserted together
+BATCH_SIZE = 500
+
+# Conflicting usernames and rejected lines listed in the report
+MAX_REPORTED = 100
+
+# Fields a record can have; a password or an existing bcrypt hash is required
+FIELDS = ("username", "password", "password_hash", "role")
+
+def read_users(path, columns=None):
+    """Stream (line number, record) pairs from a CSV or JSONL file
+
+    CSV files need a header row unless columns names the fields in order,
+    as in the legacy users.txt (username,password_hash,role).
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield number, {"error": f"invalid JSON: {e}"}
+                    continue
+                yield number, record if isinstance(record, dict) else {"error": "not a JSON object"}
+        else:
+            reader = csv.DictReader(f, fieldnames=columns)
+            for record in reader:
+                if any(value for value in record.values() if isinstance(value, str)):
+                    yield reader.line_num, record
+
+def check_record(record):
+    """Clean up a record, or return (None, reason) if it cannot be imported"""
+    if "error" in record:
+        return None, record["error"]
+    # JSONL values can be numbers, lists or objects
+    for field in FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            return None, f"{field} must be a string"
+    username = (record.get("username") or "").strip()
+    password = record.get("password") or None
+    password_hash = (record.get("password_hash") or "").strip() or None
+    role = (record.get("role") or "").strip() or "user"
+    if not username:
+        return None, "missing username"
+    if password is None and password_hash is None:
+        return None, "missing password"
+    if password is None and not password_hash.startswith("$2"):
+        return None, "password_hash is not a bcrypt hash"
+    if role not in ROLE_PERMISSIONS:
+        return None, f"unknown role: {role}"
+    return {"username": username, "password": password, "password_hash": password_hash,
+            "role": role}, None
+
+def _batches(records, size):
+    """Group an iterable into lists of at most size items"""
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _hash_passwords(passwords, rounds):
+    """Hash a chunk of passwords (runs in a worker process)"""
+    return [hash_password(password, rounds).decode("utf-8") for password in passwords]
+
+def _existing_usernames(conn, usernames):
+    """Usernames of a batch that are already in the users table"""
+    placeholders = ", ".join("?" for _ in usernames)
+    rows = conn.execute(f"SELECT username FROM users WHERE username IN ({placeholders})", usernames)
+    return {row[0] for row in rows}
+
+@timed("auth.provision_users")
+def provision_users(conn, source, on_conflict="skip", columns=None, workers=None,
+                    rounds=None, batch_size=BATCH_SIZE):
+    """Import users from a file path or an iterable of records in one transaction
+
+    on_conflict is "skip" (keep existing users untouched) or "update"
+    (replace their password and role). Returns a report with counts,
+    conflicting usernames, rejected lines and throughput.
+    """
+    if on_conflict not in ("skip", "update"):
+        raise ValueError(f"on_conflict must be 'skip' or 'update', not {on_conflict!r}")
+    rounds = rounds or BCRYPT_ROUNDS
+    workers = workers or os.cpu_count() or 1
+    if isinstance(source, str):
+        records = read_users(source, columns)
+    else:
+        records = enumerate(source, 1)
+
+    sql = "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?) ON CONFLICT(username) "
+    if on_conflict == "update":
+        sql += "DO UPDATE SET password_hash = excluded.password_hash, role = excluded.role"
+    else:
+        sql += "DO NOTHING"
+
+    report = {"read": 0, "inserted": 0, "updated": 0, "skipped": 0, "duplicates": 0,
+              "rejected": 0, "hashed": 0, "conflicts": [], "errors": [],
+              "seconds": 0.0, "hash_seconds": 0.0, "users_per_sec": 0.0}
+    seen = set()
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        # Taken before the first existence check, so nobody can add a user
+        # between the check and the insert
+        conn.execute("BEGIN IMMEDIATE")
+        for batch in _batches(records, batch_size):
+            users = []
+            for number, record in batch:
+                report["read"] += 1
+                user, reason = check_record(record)
+                if user is None:
+                    report["rejected"] += 1
+                    if len(report["errors"]) < MAX_REPORTED:
+                        report["errors"].append((number, reason))
+                elif user["username"] in seen:
+                    report["duplicates"] += 1
+                else:
+                    seen.add(user["username"])
+                    users.append(user)
+            if not users:
+                continue
+
+            # Existing users are reported, and skipped before the costly hashing
+            existing = _existing_usernames(conn, [user["username"] for user in users])
+            for username in sorted(existing):
+                if len(report["conflicts"]) < MAX_REPORTED:
+                    report["conflicts"].append(username)
+            if on_conflict == "skip":
+                report["skipped"] += len(existing)
+                users = [user for user in users if user["username"] not in existing]
+
+            to_hash = [user for user in users if user["password"] is not None]
+            hash_start = time.perf_counter()
+            passwords = [user["password"] for user in to_hash]
+            if pool is None:
+                hashes = _hash_passwords(passwords, rounds)
+            else:
+                # One chunk per process keeps pickling overhead low
+                chunk = max(1, -(-len(passwords) // workers))
+                chunks = [passwords[i:i + chunk] for i in range(0, len(passwords), chunk)]
+                hashes = [value for part in pool.map(_hash_passwords, chunks, [rounds] * len(chunks))
+                          for value in part]
+            for user, password_hash in zip(to_hash, hashes):
+                user["password_hash"] = password_hash
+            report["hash_seconds"] += time.perf_counter() - hash_start
+            report["hashed"] += len(to_hash)
+
+            conn.executemany(sql, [(user["username"], user["password_hash"], user["role"])
+                                   for user in users])
+            if on_conflict == "update":
+                report["updated"] += len(existing)
+            report["inserted"] += len(users) - (len(existing) if on_conflict == "update" else 0)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = old_isolation
+        if pool is not None:
+            pool.shutdown()
+
+    # Updated users may have a new role
+    if report["updated"]:
+        invalidate_user()
+    report["seconds"] = time.perf_counter() - start
+    if report["seconds"]:
+        report["users_per_sec"] = (report["inserted"] + report["updated"]) / report["seconds"]
+    return report
+
+def print_report(report):
+    """Print an import report"""
+    print(f"Read {report['read']} records in {report['seconds']:.1f}s "
+          f"({report['users_per_sec']:.0f} users/sec, {report['hash_seconds']:.1f}s hashing)")
+    print(f"  inserted {report['inserted']}, updated {report['updated']}, "
+          f"skipped {report['skipped']}, duplicates {report['duplicates']}, "
+          f"rejected {report['rejected']}")
+    if report["conflicts"]:
+        print(f"  existing users: {', '.join(report['conflicts'][:10])}"
+              + (" ..." if len(report["conflicts"]) > 10 else ""))
+    for number, reason in report["errors"][:10]:
+        print(f"  line {number}: {reason}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import users from a CSV or JSONL file")
+    parser.add_argument("path", help="CSV with a header row (username,password,role) or JSONL")
+    parser.add_argument("--update", action="store_true",
+                        help="update the password and role of existing users instead of skipping them")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="records per batch")
+    parser.add_argument("--db", default="multi_domain.db", help="database file")
+    args = parser.parse_args(argv)
+
+    from db_manager import DatabaseManager
+    with DatabaseManager(args.db) as db:
+        try:
+            report = db.provision_users(args.path, "update" if args.update else "skip",
+                                        workers=args.workers, batch_size=args.batch_size)
+        except OSError as e:
+            print(f"Could not read {args.path}: {e}")
+            return 1
+    print_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
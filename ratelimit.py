@@ -0,0 +1,196 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Login throttling with token buckets per username and per client
+# Every attempt takes a token from both buckets before any bcrypt work is
+# queued, and a successful login refills the user's bucket. Buckets live
+# in the rate_limits table, so every app process sees the same counts;
+# each process also keeps a bounded LRU copy. A copy can be stale in both
+# directions: other processes take tokens, and a successful login or the
+# worker's pruning deletes buckets. So a copy that says "empty" is only a
+# hint: the bucket rows are re-read (one indexed lookup each, no write
+# transaction) before a client is turned away, and the shared table
+# always makes the final decision.
+
+# Bucket kind -> (capacity, seconds to earn one token back)
+LIMITS = {
+    "user": (5, 60.0),     # 5 tries, then one a minute per username
+    "client": (20, 6.0),   # 20 tries, then ten a minute per client
+}
+
+# Buckets kept in memory per process
+MAX_BUCKETS = 10000
+
+class LoginThrottledError(Exception):
+    """Raised when a username or client has run out of login attempts"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts, please try again in {math.ceil(retry_after)} seconds")
+        self.retry_after = retry_after
+
+def refill(tokens, updated_at, now, capacity, per_token):
+    """Tokens in a bucket after earning some back since updated_at"""
+    return min(capacity, tokens + max(0.0, now - updated_at) / per_token)
+
+def bucket_key(kind, name):
+    """Key of a bucket in memory and in rate_limits"""
+    return f"{kind}:{name.strip().lower()}"
+
+# Take one token if the refilled bucket has one; returns the tokens left
+TAKE_SQL = '''
+    INSERT INTO rate_limits (bucket, tokens, updated_at) VALUES (?, ? - 1, ?)
+    ON CONFLICT(bucket) DO UPDATE SET
+        tokens = MIN(?, tokens + MAX(0, excluded.updated_at - updated_at) / ?) - 1,
+        updated_at = excluded.updated_at
+    WHERE MIN(?, tokens + MAX(0, excluded.updated_at - updated_at) / ?) >= 1
+    RETURNING tokens
+'''
+
+class LoginRateLimiter:
+    """Token buckets per username and client, shared through SQLite"""
+
+    def __init__(self, limits=None, max_buckets=MAX_BUCKETS):
+        self.limits = limits or LIMITS
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.denied = 0
+        self.denied_read_only = 0
+
+    def _remember(self, key, tokens, updated_at):
+        """Store a bucket in the LRU copy, dropping the least recently used"""
+        with self._lock:
+            self._buckets[key] = (tokens, updated_at)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+    def _wait(self, kind, tokens, now, updated_at):
+        """Seconds until a bucket has a whole token again"""
+        capacity, per_token = self.limits[kind]
+        tokens = refill(tokens, updated_at, now, capacity, per_token)
+        return 0.0 if tokens >= 1 else (1 - tokens) * per_token
+
+    def _cached_wait(self, buckets, now):
+        """Longest wait among the buckets according to this process's copy"""
+        wait = 0.0
+        with self._lock:
+            for kind, key in buckets:
+                entry = self._buckets.get(key)
+                if entry is not None:
+                    self._buckets.move_to_end(key)
+                    wait = max(wait, self._wait(kind, entry[0], now, entry[1]))
+        return wait
+
+    def _stored_wait(self, conn, buckets, now):
+        """Longest wait among the buckets according to rate_limits, refreshing the copies"""
+        wait = 0.0
+        for kind, key in buckets:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limits WHERE bucket = ?", (key,)
+            ).fetchone()
+            if row is None:
+                # Refilled by a successful login or pruned: the bucket is full
+                with self._lock:
+                    self._buckets.pop(key, None)
+                continue
+            self._remember(key, row[0], row[1])
+            wait = max(wait, self._wait(kind, row[0], now, row[1]))
+        return wait
+
+    def _deny(self, wait, read_only=False):
+        with self._lock:
+            self.denied += 1
+            if read_only:
+                self.denied_read_only += 1
+        raise LoginThrottledError(wait)
+
+    def attempt(self, conn, username, client=None, now=None):
+        """Take a token for a login attempt, or raise LoginThrottledError
+
+        Tokens come from the username's and, if given, the client's bucket
+        in one transaction, so either both are charged or neither is.
+        """
+        now = time.time() if now is None else now
+        buckets = [("user", bucket_key("user", username))]
+        if client:
+            buckets.append(("client", bucket_key("client", client)))
+
+        # The copies may be out of date, so an empty one is confirmed with a
+        # read before the client is turned away without a write transaction
+        if self._cached_wait(buckets, now) > 0:
+            wait = self._stored_wait(conn, buckets, now)
+            if wait > 0:
+                self._deny(wait, read_only=True)
+
+        taken = []
+        empty = None
+        with conn:
+            for kind, key in buckets:
+                capacity, per_token = self.limits[kind]
+                row = conn.execute(
+                    TAKE_SQL, (key, capacity, now, capacity, per_token, capacity, per_token)
+                ).fetchall()
+                if not row:
+                    empty = (kind, key)
+                    break
+                taken.append((key, row[0][0]))
+            if empty is not None:
+                # Undo the tokens already taken from the other bucket
+                conn.rollback()
+
+        if empty is not None:
+            tokens, updated_at = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limits WHERE bucket = ?", (empty[1],)
+            ).fetchone()
+            self._remember(empty[1], tokens, updated_at)
+            self._deny(self._wait(empty[0], tokens, now, updated_at))
+
+        for key, tokens in taken:
+            self._remember(key, tokens, now)
+        with self._lock:
+            self.allowed += 1
+
+    def succeeded(self, conn, username):
+        """Refill a user's bucket after a successful login"""
+        key = bucket_key("user", username)
+        with conn:
+            conn.execute("DELETE FROM rate_limits WHERE bucket = ?", (key,))
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self):
+        """Get attempt counters and the number of buckets held in memory"""
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "denied": self.denied,
+                "denied_read_only": self.denied_read_only,
+                "buckets": len(self._buckets),
+            }
+
+def prune_buckets(conn, limits=None, now=None):
+    """Delete stored buckets that have refilled completely; returns the number deleted"""
+    now = time.time() if now is None else now
+    deleted = 0
+    with conn:
+        for kind, (capacity, per_token) in (limits or LIMITS).items():
+            deleted += conn.execute(
+                "DELETE FROM rate_limits WHERE bucket LIKE ? AND tokens + (? - updated_at) / ? >= ?",
+                (f"{kind}:%", now, per_token, capacity)
+            ).rowcount
+    return deleted
+
+_login_limiter = None
+_login_limiter_lock = threading.Lock()
+
+def get_login_limiter():
+    """Get the process-wide login rate limiter"""
+    global _login_limiter
+    with _login_limiter_lock:
+        if _login_limiter is None:
+            _login_limiter = LoginRateLimiter()
+        return _login_limiter
@@ -0,0 +1,197 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# Host-wide cache of query results shared by every app process
+# The second tier behind data_cache: results are pickled into a separate
+# SQLite file keyed on (database, table, table version, query), so when
+# several Streamlit processes serve the same database a view is computed
+# by the first process that needs it and read back by the others. Writing
+# a result for a newer table version deletes the older ones, and the
+# least recently used results are evicted once the file passes its size
+# limit. Unpickling runs code, so the file is created readable and
+# writable by its owner only and is not used if anyone else could have
+# written to it; delete it at any time to start empty.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cache file, next to the app unless RESULT_CACHE_PATH says otherwise ("" turns it off)
+# A relative RESULT_CACHE_PATH is taken from the app folder, not the working directory
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "result_cache.db")
+
+# Size limit of the cache file's results
+RESULT_CACHE_MB = int(os.environ.get("RESULT_CACHE_MB", 512))
+
+# Larger results are only kept in process memory
+MAX_VALUE_BYTES = 32 * 1024 * 1024
+
+# A hit refreshes the entry's last-used time at most this often
+TOUCH_SECONDS = 60
+
+class SharedResultCache:
+    """Size-bounded LRU cache of pickled results in a SQLite file"""
+
+    def __init__(self, path, max_bytes):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _check_file(self):
+        """Create the cache file owner-only, refusing one others could have written"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            info = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            raise PermissionError(f"{self.path} belongs to another user")
+        if info.st_mode & 0o022:
+            raise PermissionError(f"{self.path} is writable by other users")
+
+    def _connect(self):
+        """Open the cache file on first use (lock held)"""
+        if self._conn is None:
+            self._check_file()
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    source TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL,
+                    PRIMARY KEY (source, table_name, key, version)
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_used ON results(used_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, source, table, version, key):
+        """Get (True, result) on a hit or (False, None) on a miss"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT rowid, value, used_at FROM results "
+                    "WHERE source = ? AND table_name = ? AND key = ? AND version = ?",
+                    (source, table, repr(key), version)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return False, None
+                value = pickle.loads(row[1])
+                now = time.time()
+                if now - row[2] > TOUCH_SECONDS:
+                    with conn:
+                        conn.execute("UPDATE results SET used_at = ? WHERE rowid = ?", (now, row[0]))
+                self.hits += 1
+                return True, value
+            except (sqlite3.Error, OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                # A broken or busy cache only costs a recomputation
+                self.errors += 1
+                return False, None
+
+    def put(self, source, table, version, key, value):
+        """Store a result, dropping older versions and evicting past the size limit"""
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        if len(blob) > min(MAX_VALUE_BYTES, self.max_bytes):
+            return False
+
+        with self._lock:
+            try:
+                conn = self._connect()
+                now = time.time()
+                with conn:
+                    conn.execute(
+                        "DELETE FROM results WHERE source = ? AND table_name = ? AND version < ?",
+                        (source, table, version)
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO results "
+                        "(source, table_name, version, key, value, size, created_at, used_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (source, table, version, repr(key), blob, len(blob), now, now)
+                    )
+                    self._evict(conn)
+                self.writes += 1
+                return True
+            except (sqlite3.Error, OSError):
+                self.errors += 1
+                return False
+
+    def _evict(self, conn):
+        """Delete least recently used results until under the size limit"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for rowid, size in conn.execute("SELECT rowid, size FROM results ORDER BY used_at"):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM results WHERE rowid = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        """Delete every stored result"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute("DELETE FROM results")
+            except (sqlite3.Error, OSError):
+                self.errors += 1
+
+    def close(self):
+        """Close the cache file (it is reopened on next use)"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        """Get stored size and hit/miss/write/eviction counters"""
+        with self._lock:
+            try:
+                entries, size = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()
+            except (sqlite3.Error, OSError):
+                entries, size = None, None
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
+
+def get_shared_cache():
+    """The host-wide result cache configured by RESULT_CACHE_PATH, or None if turned off"""
+    if not RESULT_CACHE_PATH:
+        return None
+    return SharedResultCache(os.path.join(APP_DIR, RESULT_CACHE_PATH), RESULT_CACHE_MB * 1024 * 1024)
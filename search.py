@@ -0,0 +1,118 @@
+import re
+
+import pandas as pd
+
+# Full-text search over incident and ticket descriptions
+# Uses the FTS5 indexes from migration 8 (kept in sync by triggers, so
+# every ingest updates them) and ranks matches with bm25. Databases built
+# without FTS5 fall back to a LIKE scan in id order.
+
+SEARCH_TABLES = {
+    "cyber_incidents": {
+        "index": "incidents_fts",
+        "key": "incident_id",
+        "time_column": "timestamp",
+        "columns": ["incident_id", "timestamp", "severity", "category", "status"],
+    },
+    "it_tickets": {
+        "index": "tickets_fts",
+        "key": "ticket_id",
+        "time_column": "created_at",
+        "columns": ["ticket_id", "created_at", "priority", "status", "assigned_to"],
+    },
+}
+
+# Match counts are capped here (shown as "10000+")
+MAX_COUNT = 10000
+
+# "quoted phrases" or single words
+TOKEN_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+def parse_query(text):
+    """Split user input into phrases and words (all must match)"""
+    terms = []
+    for phrase, word in TOKEN_PATTERN.findall(text or ""):
+        term = (phrase or word).strip()
+        # Drop characters that only mean something to the FTS5 parser
+        term = re.sub(r'[^\w\s\-\']', " ", term).strip()
+        if term:
+            terms.append(term)
+    return terms
+
+def to_fts_query(text):
+    """Turn user input into a safe FTS5 MATCH expression"""
+    # Every term is quoted, so operators and syntax errors can't be injected
+    return " ".join('"' + term.replace('"', '""') + '"' for term in parse_query(text))
+
+def has_index(conn, table):
+    """Check whether the FTS5 index for a table exists"""
+    index = SEARCH_TABLES[table]["index"]
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (index,)
+    ).fetchone() is not None
+
+def optimize_indexes(conn):
+    """Merge each FTS5 index's segments into one for faster queries"""
+    optimized = []
+    for table, config in SEARCH_TABLES.items():
+        if has_index(conn, table):
+            index = config["index"]
+            with conn:
+                conn.execute(f"INSERT INTO {index} ({index}) VALUES ('optimize')")
+            optimized.append(index)
+    return optimized
+
+def search(conn, table, text, limit=20, offset=0, where="", params=None):
+    """Get one page of ranked matches and the number of matches (up to MAX_COUNT)
+
+    where/params optionally restrict the matches to rows of the table,
+    e.g. a WHERE clause built from the dashboard filters.
+    """
+    config = SEARCH_TABLES[table]
+    key = config["key"]
+    columns = ", ".join(f"t.{column}" for column in config["columns"])
+    terms = parse_query(text)
+    if not terms:
+        return pd.DataFrame(columns=config["columns"] + ["match"]), 0
+    # Filters are checked on the joined table row: a rowid IN (SELECT ...) list
+    # would be pushed into FTS5 and rescanned for every match
+    conditions = " AND " + where[len(" WHERE "):] if where else ""
+    params = list(params or [])
+
+    if has_index(conn, table):
+        index = config["index"]
+        match = to_fts_query(text)
+        joined = f" JOIN {table} t ON t.{key} = {index}.rowid" if where else ""
+        matches = f"FROM {index}{joined} WHERE {index} MATCH ?{conditions}"
+        # Counting stops at MAX_COUNT so very common words stay cheap
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 {matches} LIMIT ?)",
+            [match] + params + [MAX_COUNT]
+        ).fetchone()[0]
+        # Rank first, then build snippets for the page's rows only
+        df = pd.read_sql(
+            f"SELECT {columns}, snippet({index}, 0, '**', '**', '...', 12) AS match FROM ("
+            f"    SELECT {index}.rowid AS id, {index}.rank AS rank {matches} ORDER BY rank LIMIT ? OFFSET ?"
+            f") p JOIN {index} ON {index}.rowid = p.id AND {index} MATCH ? "
+            f"JOIN {table} t ON t.{key} = p.id ORDER BY p.rank",
+            conn,
+            params=[match] + params + [int(limit), int(offset), match]
+        )
+    else:
+        like = " AND ".join("t.description LIKE ?" for _ in terms) + conditions
+        params = [f"%{term}%" for term in terms] + params
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} t WHERE {like} LIMIT ?)",
+            params + [MAX_COUNT]
+        ).fetchone()[0]
+        df = pd.read_sql(
+            f"SELECT {columns}, t.description AS match FROM {table} t WHERE {like} "
+            f"ORDER BY t.{key} LIMIT ? OFFSET ?",
+            conn,
+            params=params + [int(limit), int(offset)]
+        )
+
+    time_column = config["time_column"]
+    df[time_column] = pd.to_datetime(df[time_column], unit="s")
+    return df, total
@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Signed session tokens and a cache of user -> (role, permissions)
+# Pages check the token on every rerun; the role only comes from SQLite
+# on a cache miss, and is dropped from the cache when the user changes.
+# A change made here clears this process's cache at once; other processes
+# see the users change counter move at their next check, so a role change
+# reaches every process within version_interval seconds.
+
+# Set SESSION_SECRET to share tokens between server processes
+SESSION_SECRET = os.environ.get("SESSION_SECRET", "").encode("utf-8") or os.urandom(32)
+SESSION_TTL = 8 * 60 * 60
+
+# Which pages each role may open
+ROLE_PERMISSIONS = {
+    "admin": frozenset({"cybersecurity", "it_operations", "data_science", "ai_assistant", "admin"}),
+    "cybersecurity": frozenset({"cybersecurity", "ai_assistant"}),
+    "it_operations": frozenset({"it_operations", "ai_assistant"}),
+    "data_science": frozenset({"data_science", "ai_assistant"}),
+    "user": frozenset({"ai_assistant"}),
+}
+
+def _sign(payload):
+    """HMAC signature of a token payload"""
+    return hmac.new(SESSION_SECRET, payload, hashlib.sha256).hexdigest().encode("ascii")
+
+def create_token(username, ttl=SESSION_TTL):
+    """Create a signed session token for a user"""
+    expires = int(time.time()) + ttl
+    payload = base64.urlsafe_b64encode(f"{username}|{expires}".encode("utf-8"))
+    return (payload + b"." + _sign(payload)).decode("ascii")
+
+def verify_token(token):
+    """Get the username from a valid, unexpired token (None otherwise)"""
+    if not token or "." not in token:
+        return None
+    try:
+        payload, signature = token.encode("ascii").rsplit(b".", 1)
+    except UnicodeEncodeError:
+        return None
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        username, expires = base64.urlsafe_b64decode(payload).decode("utf-8").rsplit("|", 1)
+    except ValueError:
+        return None
+    if int(expires) < time.time():
+        return None
+    return username
+
+class SessionCache:
+    """LRU cache of user -> (role, permissions) entries that expire after a TTL"""
+
+    def __init__(self, max_size=10000, ttl=300, db_name="multi_domain.db", version_interval=2):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_interval = version_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a load that raced one is not stored
+        self._generation = 0
+        self._users_version = None
+        self._check_due = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username):
+        """Get the cached (role, permissions) of a user, loading it on a miss"""
+        now = time.monotonic()
+        if now >= self._check_due:
+            self._check_users_version(now)
+
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[2] > now:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        role = self._load_role(username)
+        if role is None:
+            return None
+        permissions = ROLE_PERMISSIONS.get(role, frozenset())
+
+        with self._lock:
+            # The role may have changed while it was loading
+            if self._generation == generation:
+                self._entries[username] = (role, permissions, now + self.ttl)
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return role, permissions
+
+    def _check_users_version(self, now):
+        """Clear the cache if users changed in any process since the last check"""
+        from data_cache import get_table_version
+        from db_manager import DatabaseManager
+
+        with DatabaseManager(self.db_name) as db:
+            version = get_table_version(db.conn, "users")
+        with self._lock:
+            if version != self._users_version:
+                if self._users_version is not None:
+                    self._entries.clear()
+                    self._generation += 1
+                self._users_version = version
+            self._check_due = now + self.version_interval
+
+    def _load_role(self, username):
+        """Look up a user's role in the database"""
+        from db_manager import DatabaseManager
+
+        with DatabaseManager(self.db_name) as db:
+            return db.get_user_role(username)
+
+    def invalidate(self, username=None):
+        """Drop one user (or everyone) from the cache"""
+        with self._lock:
+            self._generation += 1
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def stats(self):
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+session_cache = SessionCache()
+
+def invalidate_user(username=None):
+    """Forget cached roles after a user or role change"""
+    session_cache.invalidate(username)
+
+def authorize(token, permission=None):
+    """Check a session token and permission
+
+    Returns (username, role, allowed), or None if the token is invalid or
+    the user no longer exists.
+    """
+    username = verify_token(token)
+    if username is None:
+        return None
+
+    entry = session_cache.get(username)
+    if entry is None:
+        return None
+    role, permissions = entry
+    allowed = permission is None or permission in permissions
+    return username, role, allowed
@@ -0,0 +1,255 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# SLA and resolution-time analytics for IT tickets
+# Resolution times are summarised in mergeable t-digest sketches, one per
+# assignee x priority, stored in resolution_sketches. Triggers queue each
+# ticket once when it becomes Resolved/Closed, and update_sketches() folds
+# the queue into the sketches, so percentiles never rescan ticket history.
+
+# Target resolution time per priority in hours
+SLA_TARGETS = {
+    "Critical": 8,
+    "High": 24,
+    "Medium": 48,
+    "Low": 72,
+}
+
+# Open-ticket age buckets as (label, upper bound in hours)
+AGE_BUCKETS = [
+    ("< 1 day", 24),
+    ("1-3 days", 72),
+    ("3-7 days", 168),
+    ("7-30 days", 720),
+    ("> 30 days", None),
+]
+
+class TDigest:
+    """Mergeable quantile sketch (merging t-digest with the k1 scale function)"""
+
+    def __init__(self, compression=100, means=None, weights=None, minimum=None, maximum=None):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype="float64")
+        self.weights = np.asarray(weights if weights is not None else [], dtype="float64")
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _compress(self, means, weights):
+        """Merge sorted centroids so each spans at most one unit of k"""
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+
+        # k1 scale: small centroids at the tails, large ones in the middle
+        centers = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * centers - 1)
+        buckets = np.floor(k - k.min()).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+        return merged_means, merged_weights
+
+    def update(self, values):
+        """Add a batch of values"""
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.minimum = float(values.min()) if self.minimum is None else min(self.minimum, float(values.min()))
+        self.maximum = float(values.max()) if self.maximum is None else max(self.maximum, float(values.max()))
+        self.means, self.weights = self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))])
+        )
+        return self
+
+    def merge(self, other):
+        """Fold another digest into this one"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.minimum, self.maximum = other.minimum, other.maximum
+        else:
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+        self.means, self.weights = self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights])
+        )
+        return self
+
+    def quantile(self, q):
+        """Estimate the value at quantile q (0-1)"""
+        if self.count == 0:
+            return None
+        positions = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            q * self.count,
+            np.r_[0, positions, self.count],
+            np.r_[self.minimum, self.means, self.maximum]
+        ))
+
+    def cdf(self, x):
+        """Estimate the fraction of values <= x"""
+        if self.count == 0:
+            return None
+        positions = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            x,
+            np.r_[self.minimum, self.means, self.maximum],
+            np.r_[0, positions, self.count]
+        ) / self.count)
+
+    def to_json(self):
+        """Serialize for storage in SQLite"""
+        return json.dumps({
+            "compression": self.compression,
+            "means": self.means.round(6).tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.minimum,
+            "max": self.maximum,
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        """Load a digest stored with to_json()"""
+        data = json.loads(text)
+        return cls(data["compression"], data["means"], data["weights"], data["min"], data["max"])
+
+@timed("aggregate.update_sketches")
+def update_sketches(conn):
+    """Fold newly resolved tickets from the queue into the sketches"""
+    with conn:
+        queued = pd.read_sql(
+            "SELECT id, assigned_to, priority, hours FROM resolution_queue ORDER BY id", conn
+        )
+        if queued.empty:
+            return 0
+
+        for (assigned_to, priority), group in queued.groupby(["assigned_to", "priority"]):
+            row = conn.execute(
+                "SELECT digest FROM resolution_sketches WHERE assigned_to = ? AND priority = ?",
+                (assigned_to, priority)
+            ).fetchone()
+            digest = TDigest.from_json(row[0]) if row else TDigest()
+            digest.update(group["hours"].to_numpy())
+            conn.execute('''
+                INSERT INTO resolution_sketches (assigned_to, priority, digest, count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(assigned_to, priority) DO UPDATE SET
+                    digest = excluded.digest, count = excluded.count
+            ''', (assigned_to, priority, digest.to_json(), int(digest.count)))
+
+        conn.execute("DELETE FROM resolution_queue WHERE id <= ?", (int(queued["id"].max()),))
+    return len(queued)
+
+def rebuild_sketches(conn, batch_size=100000):
+    """Rebuild every sketch from the resolved tickets, streaming in batches"""
+    digests = {}
+    cursor = conn.execute(
+        "SELECT IFNULL(assigned_to, ''), IFNULL(priority, ''), resolution_time_hours FROM it_tickets "
+        "WHERE status IN ('Resolved', 'Closed') AND resolution_time_hours IS NOT NULL"
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batch = pd.DataFrame(rows, columns=["assigned_to", "priority", "hours"])
+        for key, group in batch.groupby(["assigned_to", "priority"]):
+            digests.setdefault(key, TDigest()).update(group["hours"].to_numpy())
+
+    with conn:
+        conn.execute("DELETE FROM resolution_queue")
+        conn.execute("DELETE FROM resolution_sketches")
+        conn.executemany(
+            "INSERT INTO resolution_sketches (assigned_to, priority, digest, count) VALUES (?, ?, ?, ?)",
+            [(key[0], key[1], digest.to_json(), int(digest.count)) for key, digest in digests.items()]
+        )
+
+def load_sketches(conn, assigned_to=None, priority=None):
+    """Load {(assignee, priority): TDigest} for the selected staff and priorities"""
+    query = "SELECT assigned_to, priority, digest FROM resolution_sketches"
+    clauses = []
+    params = []
+    for column, values in [("assigned_to", assigned_to), ("priority", priority)]:
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return {(row[0], row[1]): TDigest.from_json(row[2]) for row in conn.execute(query, params)}
+
+@timed("aggregate.resolution_percentiles")
+def resolution_percentiles(conn, assigned_to=None, priority=None, by=("assigned_to", "priority")):
+    """Get count, p50/p90/p99 resolution hours and SLA breach rate per group
+
+    by picks the grouping: ("assigned_to", "priority"), ("assigned_to",)
+    or ("priority",). Coarser groups merge the stored sketches.
+    """
+    sketches = load_sketches(conn, assigned_to, priority)
+    groups = {}
+    for (staff, level), digest in sketches.items():
+        key = tuple({"assigned_to": staff, "priority": level}[column] for column in by)
+        groups.setdefault(key, []).append((level, digest))
+
+    rows = []
+    for key, parts in sorted(groups.items()):
+        merged = TDigest()
+        breached = 0.0
+        for level, digest in parts:
+            merged.merge(digest)
+            target = SLA_TARGETS.get(level)
+            if target is not None:
+                breached += (1 - digest.cdf(target)) * digest.count
+        row = dict(zip(by, key))
+        row.update({
+            "tickets": int(merged.count),
+            "p50_hours": merged.quantile(0.5),
+            "p90_hours": merged.quantile(0.9),
+            "p99_hours": merged.quantile(0.99),
+            "sla_breach_rate": breached / merged.count if merged.count else None,
+        })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+@timed("aggregate.open_ticket_ageing")
+def open_ticket_ageing(conn, filters=None, now=None):
+    """Count open tickets per priority and age bucket"""
+    now = int(now if now is not None else time.time())
+    cases = []
+    for label, upper in AGE_BUCKETS:
+        if upper is None:
+            cases.append(f"ELSE '{label}'")
+        else:
+            cases.append(f"WHEN ? - created_at < {upper * 3600} THEN '{label}'")
+    bucket = "CASE " + " ".join(cases) + " END"
+    params = [now] * (len(AGE_BUCKETS) - 1)
+
+    where = "WHERE status NOT IN ('Resolved', 'Closed')"
+    for column, values in (filters or {}).items():
+        if values and column in ("priority", "status", "assigned_to"):
+            where += f" AND {column} IN ({', '.join('?' for _ in values)})"
+            params.extend(values)
+
+    df = pd.read_sql(
+        f"SELECT priority, {bucket} AS age, COUNT(*) AS tickets FROM it_tickets {where} "
+        f"GROUP BY priority, age",
+        conn,
+        params=params
+    )
+    if df.empty:
+        return df
+    labels = [label for label, _ in AGE_BUCKETS]
+    table = df.pivot_table(index="priority", columns="age", values="tickets", fill_value=0)
+    return table.reindex(columns=[label for label in labels if label in table.columns])
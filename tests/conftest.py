@@ -0,0 +1,21 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Shared fixtures for the test suite
+# The app modules live in the project root, so it is put on the import
+# path here. Run from the project root: python -m pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+
+@pytest.fixture
+def conn(tmp_path):
+    """A connection to a fresh database migrated to the latest schema"""
+    connection = sqlite3.connect(str(tmp_path / "test.db"))
+    migrate(connection)
+    yield connection
+    connection.close()
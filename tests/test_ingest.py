@@ -0,0 +1,90 @@
+import os
+
+from ingest import get_ingest_state, ingest_csv
+
+# Incremental CSV loads: appended files resume at the high-water mark,
+# rewritten files are read again from the top
+
+HEADER = "ticket_id,priority,description,status,assigned_to,created_at,resolution_time_hours\n"
+
+def ticket_line(ticket_id, priority="High", status="Open"):
+    return (f"{ticket_id},{priority},Ticket {ticket_id},{status},IT_Support_A,"
+            f"2024-01-{1 + ticket_id % 28:02d} 09:00:00,12\n")
+
+def write_tickets(path, lines, mode="w"):
+    with open(path, mode, newline="") as f:
+        f.writelines(lines)
+    # Give each write a new mtime even on coarse file system clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def tickets(conn):
+    return dict(conn.execute("SELECT ticket_id, priority FROM it_tickets").fetchall())
+
+def test_first_load_reads_every_row(conn, tmp_path):
+    path = str(tmp_path / "it_tickets.csv")
+    write_tickets(path, [HEADER] + [ticket_line(n) for n in range(5)])
+
+    stats = ingest_csv(conn, "it_tickets", path, batch_size=2)
+
+    assert stats["rows"] == 5 and stats["rejected"] == 0
+    assert sorted(tickets(conn)) == list(range(5))
+    assert get_ingest_state(conn, "it_tickets")["byte_offset"] == os.path.getsize(path)
+
+def test_unchanged_file_is_skipped(conn, tmp_path):
+    path = str(tmp_path / "it_tickets.csv")
+    write_tickets(path, [HEADER] + [ticket_line(n) for n in range(5)])
+    ingest_csv(conn, "it_tickets", path)
+
+    stats = ingest_csv(conn, "it_tickets", path)
+
+    assert stats["skipped"] and stats["rows"] == 0
+
+def test_appended_rows_resume_at_high_water_mark(conn, tmp_path):
+    path = str(tmp_path / "it_tickets.csv")
+    write_tickets(path, [HEADER] + [ticket_line(n) for n in range(5)])
+    ingest_csv(conn, "it_tickets", path)
+
+    write_tickets(path, [ticket_line(n) for n in range(5, 8)], mode="a")
+    stats = ingest_csv(conn, "it_tickets", path, batch_size=2)
+
+    assert stats["rows"] == 3
+    assert sorted(tickets(conn)) == list(range(8))
+    state = get_ingest_state(conn, "it_tickets")
+    assert state["rows_loaded"] == 8
+    assert state["byte_offset"] == os.path.getsize(path)
+
+def test_rewritten_file_is_read_from_the_top(conn, tmp_path):
+    path = str(tmp_path / "it_tickets.csv")
+    write_tickets(path, [HEADER] + [ticket_line(n) for n in range(5)])
+    ingest_csv(conn, "it_tickets", path)
+
+    # Same ids with new values and one more row: the file is longer, but
+    # the bytes before the old high-water mark changed
+    write_tickets(path, [HEADER] + [ticket_line(n, priority="Low") for n in range(6)])
+    stats = ingest_csv(conn, "it_tickets", path)
+
+    assert stats["rows"] == 6
+    assert tickets(conn) == {n: "Low" for n in range(6)}
+
+def test_truncated_file_is_read_from_the_top(conn, tmp_path):
+    path = str(tmp_path / "it_tickets.csv")
+    write_tickets(path, [HEADER] + [ticket_line(n) for n in range(5)])
+    ingest_csv(conn, "it_tickets", path)
+
+    write_tickets(path, [HEADER] + [ticket_line(n, status="Closed") for n in range(2)])
+    stats = ingest_csv(conn, "it_tickets", path)
+
+    assert stats["rows"] == 2
+    statuses = dict(conn.execute("SELECT ticket_id, status FROM it_tickets").fetchall())
+    assert statuses[0] == statuses[1] == "Closed"
+
+def test_bad_rows_are_rejected_without_stopping_the_load(conn, tmp_path):
+    path = str(tmp_path / "it_tickets.csv")
+    write_tickets(path, [HEADER, ticket_line(1), "x,High,Bad id,Open,IT_Support_A,2024-01-01,1\n",
+                         "3,High,No date,Open,IT_Support_A,,1\n", ticket_line(4)])
+
+    stats = ingest_csv(conn, "it_tickets", path)
+
+    assert stats["rows"] == 2 and stats["rejected"] == 2
+    assert sorted(tickets(conn)) == [1, 4]
@@ -0,0 +1,117 @@
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import migrations
+from migrations import MIGRATIONS, get_schema_version, migrate
+
+# Upgrading a database written by the original app to the latest schema
+
+# What the original DatabaseManager wrote: the declared users table, then
+# the domain tables replaced by to_sql copies of the CSVs
+BASELINE_USERS = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT NOT NULL
+    )
+'''
+INCIDENTS_CSV = """incident_id,timestamp,severity,category,status,description
+1000,2024-01-05 10:00:00.000000,High,Phishing,Open,Phishing email on laptop
+1001,2024-01-05 23:30:00.000000,Low,Malware,Resolved,Malware detected on server
+1002,2024-02-10 08:15:00.000000,Critical,DDoS,Closed,Traffic spike on web portal
+"""
+TICKETS_CSV = """ticket_id,priority,description,status,assigned_to,created_at,resolution_time_hours
+2000,High,Password reset,Resolved,IT_Support_A,2024-01-27 05:00:00,24
+2001,Medium,Printer offline,Open,IT_Support_B,2024-03-01 12:00:00,
+"""
+
+def baseline_database(path):
+    """Write a database the way the original app left it"""
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_USERS)
+    conn.execute(
+        "INSERT INTO users (username, password_hash, role) VALUES ('admin', 'hash', 'admin')"
+    )
+    pd.read_csv(io.StringIO(INCIDENTS_CSV)).to_sql("cyber_incidents", conn, index=False)
+    pd.read_csv(io.StringIO(TICKETS_CSV)).to_sql("it_tickets", conn, index=False)
+    conn.commit()
+    return conn
+
+def test_baseline_database_migrates_to_latest(tmp_path):
+    conn = baseline_database(str(tmp_path / "baseline.db"))
+    assert get_schema_version(conn) == 0
+
+    applied = migrate(conn)
+
+    assert [version for version, _ in applied] == [version for version, _, _ in MIGRATIONS]
+    assert get_schema_version(conn) == MIGRATIONS[-1][0]
+    assert conn.execute("SELECT username, role FROM users").fetchall() == [("admin", "admin")]
+
+def test_migration_keeps_rows_and_types_timestamps(tmp_path):
+    conn = baseline_database(str(tmp_path / "baseline.db"))
+    migrate(conn)
+
+    incidents = conn.execute(
+        "SELECT incident_id, typeof(timestamp), timestamp, severity FROM cyber_incidents ORDER BY incident_id"
+    ).fetchall()
+    assert [row[0] for row in incidents] == [1000, 1001, 1002]
+    assert {row[1] for row in incidents} == {"integer"}
+    assert incidents[0][2] == int(pd.Timestamp("2024-01-05 10:00:00").timestamp())
+
+    tickets = conn.execute(
+        "SELECT ticket_id, created_at, resolution_time_hours FROM it_tickets ORDER BY ticket_id"
+    ).fetchall()
+    assert tickets == [
+        (2000, int(pd.Timestamp("2024-01-27 05:00:00").timestamp()), 24),
+        (2001, int(pd.Timestamp("2024-03-01 12:00:00").timestamp()), None),
+    ]
+
+def test_migration_builds_rollups_from_existing_rows(tmp_path):
+    conn = baseline_database(str(tmp_path / "baseline.db"))
+    migrate(conn)
+
+    day = int(pd.Timestamp("2024-01-05").timestamp()) // 86400
+    assert conn.execute(
+        "SELECT SUM(count) FROM incident_rollup WHERE day = ?", (day,)
+    ).fetchone()[0] == 2
+    assert conn.execute("SELECT SUM(count) FROM ticket_rollup").fetchone()[0] == 2
+
+    # Triggers keep the rollups and change counters current after the upgrade
+    version = conn.execute(
+        "SELECT version FROM table_versions WHERE table_name = 'cyber_incidents'"
+    ).fetchone()[0]
+    with conn:
+        conn.execute("DELETE FROM cyber_incidents WHERE incident_id = 1000")
+    assert conn.execute(
+        "SELECT SUM(count) FROM incident_rollup WHERE day = ?", (day,)
+    ).fetchone()[0] == 1
+    assert conn.execute(
+        "SELECT version FROM table_versions WHERE table_name = 'cyber_incidents'"
+    ).fetchone()[0] > version
+
+def test_migrate_again_applies_nothing(tmp_path):
+    conn = baseline_database(str(tmp_path / "baseline.db"))
+    migrate(conn)
+    instance_id = conn.execute("SELECT value FROM database_info WHERE name = 'instance_id'").fetchone()
+
+    assert migrate(conn) == []
+    assert conn.execute("SELECT value FROM database_info WHERE name = 'instance_id'").fetchone() == instance_id
+
+def test_failed_migration_keeps_previous_version(tmp_path, monkeypatch):
+    conn = baseline_database(str(tmp_path / "baseline.db"))
+    migrate(conn, target=MIGRATIONS[-2][0])
+
+    def broken(connection):
+        connection.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("boom")
+
+    version, description, _ = MIGRATIONS[-1]
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS[:-1] + [(version, description, broken)])
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.migrate(conn)
+    assert get_schema_version(conn) == MIGRATIONS[-2][0]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
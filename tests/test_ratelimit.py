@@ -0,0 +1,123 @@
+import pytest
+
+from ratelimit import LIMITS, LoginRateLimiter, LoginThrottledError, bucket_key, prune_buckets
+
+# Login token buckets: refill over time, both buckets charged or neither,
+# and copies in memory never outvoting rate_limits
+
+NOW = 1_700_000_000.0
+
+def stored_tokens(conn, kind, name):
+    row = conn.execute(
+        "SELECT tokens FROM rate_limits WHERE bucket = ?", (bucket_key(kind, name),)
+    ).fetchone()
+    return None if row is None else row[0]
+
+def exhaust_user(limiter, conn, username, now=NOW):
+    capacity, _ = LIMITS["user"]
+    for _ in range(capacity):
+        limiter.attempt(conn, username, now=now)
+
+def test_user_bucket_empties_after_capacity_attempts(conn):
+    limiter = LoginRateLimiter()
+    exhaust_user(limiter, conn, "alice")
+
+    with pytest.raises(LoginThrottledError) as raised:
+        limiter.attempt(conn, "alice", now=NOW)
+    assert raised.value.retry_after == pytest.approx(LIMITS["user"][1])
+    # Usernames are matched case-insensitively
+    with pytest.raises(LoginThrottledError):
+        limiter.attempt(conn, " Alice ", now=NOW)
+
+def test_bucket_refills_one_token_per_interval(conn):
+    limiter = LoginRateLimiter()
+    _, per_token = LIMITS["user"]
+    exhaust_user(limiter, conn, "alice")
+
+    with pytest.raises(LoginThrottledError) as raised:
+        limiter.attempt(conn, "alice", now=NOW + per_token / 2)
+    assert raised.value.retry_after == pytest.approx(per_token / 2)
+
+    limiter.attempt(conn, "alice", now=NOW + per_token)
+    assert stored_tokens(conn, "user", "alice") == pytest.approx(0)
+    with pytest.raises(LoginThrottledError):
+        limiter.attempt(conn, "alice", now=NOW + per_token)
+
+def test_refill_stops_at_capacity(conn):
+    limiter = LoginRateLimiter()
+    capacity, per_token = LIMITS["user"]
+    exhaust_user(limiter, conn, "alice")
+
+    later = NOW + per_token * capacity * 10
+    exhaust_user(limiter, conn, "alice", now=later)
+    with pytest.raises(LoginThrottledError):
+        limiter.attempt(conn, "alice", now=later)
+
+def test_empty_client_bucket_rolls_back_the_user_token(conn):
+    limiter = LoginRateLimiter()
+    with conn:
+        conn.execute(
+            "INSERT INTO rate_limits (bucket, tokens, updated_at) VALUES (?, 0, ?)",
+            (bucket_key("client", "10.0.0.1"), NOW)
+        )
+
+    with pytest.raises(LoginThrottledError):
+        limiter.attempt(conn, "alice", "10.0.0.1", now=NOW)
+    assert stored_tokens(conn, "user", "alice") is None
+
+    limiter.attempt(conn, "bob", "10.0.0.2", now=NOW)
+    with conn:
+        conn.execute("UPDATE rate_limits SET tokens = 0 WHERE bucket = ?",
+                     (bucket_key("client", "10.0.0.2"),))
+    with pytest.raises(LoginThrottledError):
+        limiter.attempt(conn, "bob", "10.0.0.2", now=NOW)
+    assert stored_tokens(conn, "user", "bob") == pytest.approx(LIMITS["user"][0] - 1)
+
+def test_empty_user_bucket_rolls_back_the_client_token(conn):
+    limiter = LoginRateLimiter()
+    exhaust_user(limiter, conn, "alice")
+    limiter.attempt(conn, "bob", "10.0.0.1", now=NOW)
+    before = stored_tokens(conn, "client", "10.0.0.1")
+
+    with pytest.raises(LoginThrottledError):
+        LoginRateLimiter().attempt(conn, "alice", "10.0.0.1", now=NOW)
+    assert stored_tokens(conn, "client", "10.0.0.1") == before
+
+def test_success_refills_the_user_bucket(conn):
+    limiter = LoginRateLimiter()
+    exhaust_user(limiter, conn, "alice")
+
+    limiter.succeeded(conn, "alice")
+
+    assert stored_tokens(conn, "user", "alice") is None
+    limiter.attempt(conn, "alice", now=NOW)
+
+def test_stale_copy_does_not_deny_after_another_process_refills(conn):
+    here, elsewhere = LoginRateLimiter(), LoginRateLimiter()
+    exhaust_user(here, conn, "alice")
+
+    # A login through another process refills the bucket in rate_limits
+    elsewhere.succeeded(conn, "alice")
+
+    here.attempt(conn, "alice", now=NOW)
+    assert here.stats()["allowed"] == LIMITS["user"][0] + 1
+
+def test_copy_denies_without_charging_when_table_agrees(conn):
+    limiter = LoginRateLimiter()
+    exhaust_user(limiter, conn, "alice")
+
+    for _ in range(3):
+        with pytest.raises(LoginThrottledError):
+            limiter.attempt(conn, "alice", now=NOW)
+    assert limiter.stats()["denied_read_only"] == 3
+    assert stored_tokens(conn, "user", "alice") == pytest.approx(0)
+
+def test_prune_deletes_only_full_buckets(conn):
+    limiter = LoginRateLimiter()
+    capacity, per_token = LIMITS["user"]
+    limiter.attempt(conn, "alice", now=NOW)
+    exhaust_user(limiter, conn, "bob")
+
+    assert prune_buckets(conn, now=NOW + per_token) == 1
+    assert stored_tokens(conn, "user", "alice") is None
+    assert stored_tokens(conn, "user", "bob") is not None
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from sla import TDigest
+
+# Accuracy of the resolution-time t-digest against exact percentiles
+# Errors are measured in rank (the share of values between the estimate
+# and the true quantile), which is what the sketch bounds
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+
+def rank_error(values, estimate, q):
+    """Distance in rank between an estimated quantile and the true one"""
+    return abs(np.searchsorted(np.sort(values), estimate) / len(values) - q)
+
+@pytest.fixture(scope="module")
+def hours():
+    """Skewed resolution times, shaped like the ticket data"""
+    rng = np.random.default_rng(0)
+    return np.round(rng.lognormal(3.0, 1.0, 100_000), 1)
+
+def test_quantiles_within_half_a_percent_of_rank(hours):
+    digest = TDigest().update(hours)
+
+    for q in QUANTILES:
+        assert rank_error(hours, digest.quantile(q), q) < 0.005, q
+
+def test_tails_are_tighter_than_the_middle(hours):
+    digest = TDigest().update(hours)
+
+    assert rank_error(hours, digest.quantile(0.99), 0.99) < 0.001
+    assert rank_error(hours, digest.quantile(0.01), 0.01) < 0.001
+
+def test_batched_and_merged_digests_stay_accurate(hours):
+    batched = TDigest()
+    for chunk in np.array_split(hours, 50):
+        batched.update(chunk)
+    merged = TDigest()
+    for chunk in np.array_split(hours, 8):
+        merged.merge(TDigest().update(chunk))
+
+    for digest in (batched, merged):
+        assert digest.count == len(hours)
+        for q in QUANTILES:
+            assert rank_error(hours, digest.quantile(q), q) < 0.01, q
+
+def test_centroids_stay_bounded(hours):
+    digest = TDigest(compression=100).update(hours)
+
+    assert len(digest.means) <= 100
+    assert digest.quantile(0) == hours.min()
+    assert digest.quantile(1) == hours.max()
+
+def test_cdf_inverts_quantile(hours):
+    digest = TDigest().update(hours)
+
+    for q in QUANTILES:
+        assert digest.cdf(digest.quantile(q)) == pytest.approx(q, abs=0.005)
+
+def test_json_round_trip_keeps_estimates(hours):
+    digest = TDigest().update(hours)
+    restored = TDigest.from_json(digest.to_json())
+
+    assert restored.count == digest.count
+    for q in QUANTILES:
+        assert restored.quantile(q) == pytest.approx(digest.quantile(q), rel=1e-6)
+
+def test_empty_digest_has_no_estimates():
+    digest = TDigest().update([np.nan])
+
+    assert digest.count == 0
+    assert digest.quantile(0.5) is None and digest.cdf(1.0) is None
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from data_cache import data_cache, get_table_version, freeze
+from instrumentation import timed
+
+# Time-series trends for incidents and tickets
+# Counts come from the per-day rollup tables and are resampled here, so
+# their cost does not grow with the raw tables. Backlog curves are built
+# from rows opened and closed per day, counted in SQL, with sorted-array
+# searches.
+# Results are cached per (table, window, filters) until the table changes.
+
+# Every period is labelled by its first day (weeks start on Monday)
+FREQUENCIES = {
+    "daily": "D",
+    "weekly": "W-MON",
+    "monthly": "MS",
+}
+
+def _cached(db, table, key, loader):
+    """Cache a trend result until the table changes"""
+    version = get_table_version(db.conn, table)
+    return data_cache.get_or_load(db.pool.cache_source, table, version, ("trend",) + key, loader)
+
+def resample_counts(daily, frequency="weekly", group_by=None):
+    """Resample per-day counts to daily/weekly/monthly periods
+
+    Returns a frame indexed by period start with one column per group
+    value (or a single 'count' column). A week runs Monday to Sunday.
+    """
+    freq = FREQUENCIES[frequency]
+    if daily.empty:
+        return pd.DataFrame()
+
+    dates = pd.to_datetime(daily["day"].to_numpy() * 86400, unit="s")
+    if group_by:
+        wide = pd.DataFrame({"date": dates, group_by: daily[group_by].to_numpy(),
+                             "count": daily["count"].to_numpy()})
+        wide = wide.pivot_table(index="date", columns=group_by, values="count",
+                                aggfunc="sum", fill_value=0)
+    else:
+        wide = pd.DataFrame({"count": daily["count"].to_numpy()}, index=dates)
+    # W-MON would otherwise close each week on, and label it by, the next Monday
+    return wide.resample(freq, label="left", closed="left").sum()
+
+def rolling_mean(counts, window):
+    """Smooth resampled counts with a rolling mean over window periods"""
+    return counts.rolling(window, min_periods=1).mean()
+
+@timed("aggregate.counts_over_time")
+def counts_over_time(db, table, frequency="weekly", group_by=None, filters=None,
+                     rolling_window=None):
+    """Get incident or ticket counts per period, optionally smoothed"""
+    def load():
+        if table == "cyber_incidents":
+            daily = db.get_incident_daily_counts(group_by, filters)
+        else:
+            daily = db.get_ticket_daily_counts(group_by, filters)
+        counts = resample_counts(daily, frequency, group_by)
+        if rolling_window:
+            counts = rolling_mean(counts, rolling_window)
+        return counts
+
+    key = ("counts", frequency, group_by, freeze(filters), rolling_window)
+    return _cached(db, table, key, load)
+
+def backlog_curve(days, opened, closed, period_ends):
+    """Count items open at each period end in one vectorized pass
+
+    days must be sorted; opened and closed hold the items opened and closed
+    on each day, counted from the first period end at or after it.
+    """
+    open_after = np.concatenate([[0], np.cumsum(opened - closed)])
+    return open_after[np.searchsorted(days, period_ends, "right")]
+
+@timed("aggregate.backlog_over_time")
+def backlog_over_time(db, table, frequency="daily", filters=None):
+    """Get the number of open incidents or tickets at each period boundary
+
+    Each value is the count open at midnight starting the labelled day,
+    Monday or first of the month, so it is the backlog carried into that
+    period; the last row is the midnight after the latest event.
+    """
+    def load():
+        if table == "cyber_incidents":
+            daily = db.get_incident_backlog_days(filters)
+        else:
+            daily = db.get_ticket_backlog_days(filters)
+        if daily.empty:
+            return pd.DataFrame()
+
+        days = pd.to_datetime(daily["day"].to_numpy() * 86400, unit="s").to_numpy()
+        opened = daily["opened"].to_numpy(dtype="int64")
+        closed = daily["closed"].to_numpy(dtype="int64")
+
+        # Evaluate at each period boundary from the first to the last day
+        first = pd.Timestamp(int(daily["first_at"].min()), unit="s").normalize()
+        last = pd.Timestamp(int(daily["last_at"].max()), unit="s").normalize() + pd.Timedelta(days=1)
+        periods = pd.date_range(first, last, freq=FREQUENCIES[frequency])
+        if len(periods) == 0 or periods[-1] < last:
+            periods = periods.append(pd.DatetimeIndex([last]))
+        return pd.DataFrame({"open": backlog_curve(days, opened, closed, periods.to_numpy())},
+                            index=periods)
+
+    key = ("backlog", frequency, freeze(filters))
+    return _cached(db, table, key, load)
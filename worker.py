@@ -0,0 +1,296 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from catalog import refresh_profiles, sync_catalog
+from correlation import WINDOW_HOURS, refresh_correlations
+from ratelimit import prune_buckets
+from search import optimize_indexes
+
+# Background worker and job queue
+# Jobs are rows in the jobs table, so Streamlit sessions, the admin page
+# and any number of worker processes share one queue through SQLite. The
+# worker enqueues each task on its schedule, claims jobs one at a time and
+# records how long they took. Dashboards then only read what the jobs
+# precomputed (rollups, sketches, profiles, correlations, search indexes).
+# Run it next to the app: python worker.py
+
+# Scheduled tasks and how often each runs, in seconds
+SCHEDULE = {
+    "ingest": 60,
+    "profiles": 300,
+    "correlations": 300,
+    "optimize_search": 3600,
+    "rebuild_rollups": 24 * 3600,
+    "cleanup": 3600,
+}
+
+# A worker counts as alive if it checked in this recently
+HEARTBEAT_TIMEOUT = 30
+
+# How often a worker checks in, from its own thread so long jobs do not hide it
+HEARTBEAT_INTERVAL = 10
+
+# Finished jobs are kept this long for the admin page
+JOB_RETENTION_DAYS = 7
+
+# Running jobs older than this are assumed lost with a crashed worker
+STALE_JOB_SECONDS = 3600
+
+def ingest(db):
+    """Load new CSV rows (and fold resolved tickets into the sketches)"""
+    results = db.load_csv_data()
+    return {table: stats["rows"] for table, stats in results.items()}
+
+def profiles(db):
+    """Register datasets and profile any new or changed files"""
+    sync_catalog(db.conn)
+    return {"datasets": refresh_profiles(db.conn)}
+
+def reprofile(db):
+    """Recompute every dataset profile"""
+    sync_catalog(db.conn, force=True)
+    return {"datasets": db.reprofile_datasets()}
+
+def correlations(db):
+    """Recompute incident/ticket window joins whose tables changed"""
+    return {"refreshed": [hours for hours in WINDOW_HOURS if refresh_correlations(db.conn, hours)]}
+
+def optimize_search(db):
+    """Merge the full-text index segments"""
+    return {"indexes": optimize_indexes(db.conn)}
+
+def rebuild_rollups(db):
+    """Recompute the rollup tables from the raw rows"""
+    db.rebuild_rollups()
+    return {}
+
+def cleanup(db):
+    """Drop old finished jobs and login rate-limit buckets that have refilled"""
+    cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+    with db.conn:
+        deleted = db.conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+        ).rowcount
+    return {"deleted": deleted, "rate_limits_deleted": prune_buckets(db.conn)}
+
+TASKS = {
+    "ingest": ingest,
+    "profiles": profiles,
+    "reprofile": reprofile,
+    "correlations": correlations,
+    "optimize_search": optimize_search,
+    "rebuild_rollups": rebuild_rollups,
+    "cleanup": cleanup,
+}
+
+def _immediate(conn, work):
+    """Run work(conn) inside a BEGIN IMMEDIATE transaction"""
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        result = work(conn)
+        conn.execute("COMMIT")
+        return result
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = old_isolation
+
+def enqueue(conn, task):
+    """Queue a task unless it is already waiting; returns the job id or None"""
+    if task not in TASKS:
+        raise ValueError(f"Unknown task: {task}")
+    def add(conn):
+        if conn.execute(
+            "SELECT 1 FROM jobs WHERE status = 'queued' AND task = ?", (task,)
+        ).fetchone():
+            return None
+        return conn.execute(
+            "INSERT INTO jobs (task, enqueued_at) VALUES (?, ?)", (task, time.time())
+        ).lastrowid
+    return _immediate(conn, add)
+
+def claim_job(conn, worker):
+    """Mark the oldest queued job as running by this worker and return (id, task)"""
+    def claim(conn):
+        row = conn.execute(
+            "SELECT id, task FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker = ? WHERE id = ?",
+                (time.time(), worker, row[0])
+            )
+        return row
+    # The write lock is taken before reading, so two workers never claim the same job
+    return _immediate(conn, claim)
+
+def run_job(db, job_id, task):
+    """Run one claimed job and record its result or error"""
+    try:
+        result = TASKS[task](db)
+        status, result, error = "done", json.dumps(result), None
+    except Exception as e:
+        status, result, error = "failed", None, f"{type(e).__name__}: {e}"
+    with db.conn:
+        db.conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+            (status, time.time(), result, error, job_id)
+        )
+    return status
+
+def schedule_due(conn, now=None):
+    """Queue every scheduled task whose last job is older than its interval"""
+    now = now if now is not None else time.time()
+    last = dict(conn.execute("SELECT task, MAX(enqueued_at) FROM jobs GROUP BY task"))
+    queued = []
+    for task, interval in SCHEDULE.items():
+        if last.get(task) is None or now - last[task] >= interval:
+            if enqueue(conn, task) is not None:
+                queued.append(task)
+    return queued
+
+def heartbeat(conn, worker, started_at):
+    """Record that a worker is alive"""
+    with conn:
+        conn.execute('''
+            INSERT INTO workers (name, started_at, heartbeat_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+        ''', (worker, started_at, time.time()))
+
+def _heartbeat_loop(db_name, worker, started_at, stop):
+    """Check in every HEARTBEAT_INTERVAL seconds until stop is set"""
+    from db_manager import DatabaseManager
+
+    with DatabaseManager(db_name) as db:
+        while True:
+            try:
+                heartbeat(db.conn, worker, started_at)
+            except sqlite3.OperationalError:
+                # The database is busy; the next check-in is soon enough
+                pass
+            if stop.wait(HEARTBEAT_INTERVAL):
+                return
+
+def worker_alive(conn):
+    """Check whether any worker checked in within HEARTBEAT_TIMEOUT"""
+    return conn.execute(
+        "SELECT 1 FROM workers WHERE heartbeat_at >= ?", (time.time() - HEARTBEAT_TIMEOUT,)
+    ).fetchone() is not None
+
+def fail_stale_jobs(conn):
+    """Fail running jobs whose worker has gone away"""
+    now = time.time()
+    with conn:
+        return conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'worker lost' "
+            "WHERE status = 'running' AND started_at < ?",
+            (now, now - STALE_JOB_SECONDS)
+        ).rowcount
+
+def queue_stats(conn):
+    """Get backlog size, oldest queued age and the running jobs"""
+    now = time.time()
+    queued, oldest = conn.execute(
+        "SELECT COUNT(*), MIN(enqueued_at) FROM jobs WHERE status = 'queued'"
+    ).fetchone()
+    running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+    return {
+        "queued": queued,
+        "oldest_queued_seconds": now - oldest if oldest else 0.0,
+        "running": running,
+        "worker_alive": worker_alive(conn),
+    }
+
+def job_durations(conn):
+    """Get runs, failures and mean/p95/last duration per task"""
+    df = pd.read_sql(
+        "SELECT task, status, finished_at - started_at AS seconds FROM jobs "
+        "WHERE status IN ('done', 'failed') ORDER BY id",
+        conn
+    )
+    if df.empty:
+        return df
+    grouped = df.groupby("task")
+    return pd.DataFrame({
+        "runs": grouped.size(),
+        "failed": grouped["status"].apply(lambda status: int((status == "failed").sum())),
+        "mean_seconds": grouped["seconds"].mean(),
+        "p95_seconds": grouped["seconds"].quantile(0.95),
+        "last_seconds": grouped["seconds"].last(),
+    })
+
+def recent_jobs(conn, limit=50):
+    """Get the latest jobs with their wait and run times"""
+    df = pd.read_sql(
+        "SELECT id, task, status, worker, enqueued_at, started_at - enqueued_at AS wait_seconds, "
+        "finished_at - started_at AS run_seconds, result, error "
+        "FROM jobs ORDER BY id DESC LIMIT ?",
+        conn,
+        params=[int(limit)]
+    )
+    df["enqueued_at"] = pd.to_datetime(df["enqueued_at"], unit="s")
+    return df
+
+def _work(db, worker, poll_interval, once):
+    """Schedule, claim and run jobs (the loop of run_worker)"""
+    while True:
+        for task in schedule_due(db.conn):
+            print(f"Scheduled {task}")
+        job = claim_job(db.conn, worker)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        job_id, task = job
+        start = time.perf_counter()
+        status = run_job(db, job_id, task)
+        print(f"Job {job_id} {task}: {status} in {time.perf_counter() - start:.2f}s")
+
+def run_worker(db_name="multi_domain.db", poll_interval=2.0, once=False):
+    """Schedule and run jobs until interrupted (or until nothing is queued if once)"""
+    from db_manager import DatabaseManager
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    started_at = time.time()
+    with DatabaseManager(db_name) as db:
+        fail_stale_jobs(db.conn)
+        heartbeat(db.conn, worker, started_at)
+        # Checks in while jobs run, however long they take
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat_loop, args=(db_name, worker, started_at, stop),
+                                name="heartbeat", daemon=True)
+        beat.start()
+        print(f"Worker {worker} started")
+        try:
+            _work(db, worker, poll_interval, once)
+        finally:
+            stop.set()
+            beat.join()
+
+if __name__ == "__main__":
+    import sys
+
+    # python worker.py              run the scheduler and worker loop
+    # python worker.py once         run due and queued jobs, then exit (for cron)
+    # python worker.py enqueue TASK queue one task
+    args = sys.argv[1:]
+    if args[:1] == ["enqueue"] and len(args) == 2:
+        from db_manager import DatabaseManager
+        with DatabaseManager() as db:
+            job_id = enqueue(db.conn, args[1])
+        print(f"Queued {args[1]} as job {job_id}" if job_id else f"{args[1]} is already queued")
+    else:
+        try:
+            run_worker(once=args[:1] == ["once"])
+        except KeyboardInterrupt:
+            print("Worker stopped")